@@ -0,0 +1,291 @@
+"""
+Análisis y limpieza de código embed en una sola pasada con html.parser.
+
+Validar un embed solo exige mirar el `src` de sus iframes y scripts, y limpiar
+los de Canva y Google Slides solo exige quitar algunos elementos y reescribir
+un atributo. AnalizadorEmbed lo hace mientras tokeniza, sin construir árbol y
+sin importar BeautifulSoup.
+
+La limpieza tiene que devolver exactamente lo mismo que la versión anterior
+(BeautifulSoup con html.parser, que volvía a serializar el documento), así que
+se reproducen sus reglas de serialización:
+
+- atributos en orden alfabético, el último valor gana si se repiten, los
+  atributos sin valor salen como `x=""` y los de lista (class, rel...) con
+  los espacios normalizados;
+- &, < y > escapados en texto y atributos (no dentro de script/style), con
+  entidades y referencias numéricas ya resueltas;
+- los textos que solo tienen espacios se reducen a un salto de línea o un
+  espacio (salvo dentro de pre/textarea);
+- elementos vacíos como `<br/>` y cierre de lo que quede abierto al final.
+
+Lo que BeautifulSoup trata de forma peculiar y aquí no compensa reproducir
+(declaraciones, `<meta>`, enlaces de atribución anidados...) lanza
+NoReproducible y comunicaciones/utils.py recurre a BeautifulSoup.
+"""
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+ETIQUETAS_VACIAS = frozenset({
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr',
+    'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid',
+    'param', 'source', 'spacer', 'track', 'wbr',
+})
+# Atributos cuyo valor es una lista separada por espacios
+ATRIBUTOS_LISTA = {
+    '*': {'class', 'accesskey', 'dropzone'},
+    'a': {'rel', 'rev'},
+    'link': {'rel', 'rev'},
+    'td': {'headers'},
+    'th': {'headers'},
+    'form': {'accept-charset'},
+    'object': {'archive'},
+    'area': {'rel'},
+    'icon': {'sizes'},
+    'iframe': {'sandbox'},
+    'output': {'for'},
+}
+ETIQUETAS_CONSERVAN_ESPACIOS = frozenset({'pre', 'textarea'})
+ETIQUETAS_SIN_ESCAPAR = frozenset({'script', 'style'})
+ESPACIOS_ASCII = frozenset(' \n\t\x0c\r')
+
+ENTIDADES = {}
+for _nombre, _caracter in sorted(html5.items()):
+    ENTIDADES.setdefault(_nombre[:-1] if _nombre.endswith(';') else _nombre, _caracter)
+
+_ESCAPE = re.compile(r'[<>&]')
+_ESCAPES = {'<': '&lt;', '>': '&gt;', '&': '&amp;'}
+_NO_ESPACIOS = re.compile(r'\S+')
+_CONTENEDOR_CANVA = re.compile(r'position:\s*relative')
+_ENLACE_CANVA = re.compile(r'canva\.com')
+
+LIMPIEZA_CANVA = 'canva'
+LIMPIEZA_GOOGLE_SLIDES = 'google_slides'
+
+
+class NoReproducible(Exception):
+    """El marcado usa algo que la serialización de aquí no reproduce igual."""
+
+
+def _escapar(texto):
+    return _ESCAPE.sub(lambda m: _ESCAPES[m.group()], texto)
+
+
+def _atributo(etiqueta, nombre, valor):
+    if nombre in ATRIBUTOS_LISTA['*'] or nombre in ATRIBUTOS_LISTA.get(etiqueta, ()):
+        valor = ' '.join(_NO_ESPACIOS.findall(valor))
+    valor = _escapar(valor)
+    comillas = '"'
+    if '"' in valor:
+        if "'" in valor:
+            valor = valor.replace('"', '&quot;')
+        else:
+            comillas = "'"
+    return f'{nombre}={comillas}{valor}{comillas}'
+
+
+class _Elemento:
+    __slots__ = ('nombre', 'omitido', 'eliminado')
+
+    def __init__(self, nombre, omitido, eliminado):
+        self.nombre = nombre
+        self.omitido = omitido
+        self.eliminado = eliminado
+
+
+# Padre de los nodos de primer nivel
+_RAIZ = _Elemento('[document]', False, False)
+
+
+class AnalizadorEmbed(HTMLParser):
+    """
+    Recoge el `src` de cada iframe y script (en orden de aparición) y, si se
+    indica una limpieza, genera a la vez el HTML limpio en `html`:
+
+    - LIMPIEZA_CANVA: quita los márgenes en em del primer div con
+      `position: relative` y elimina los enlaces a canva.com que no estén
+      dentro de un iframe, junto con el texto que los sigue.
+    - LIMPIEZA_GOOGLE_SLIDES: elimina los scripts.
+    """
+
+    def __init__(self, limpieza=None):
+        super().__init__(convert_charrefs=False)
+        self.limpieza = limpieza
+        self.iframes = []
+        self.scripts = []
+        self._salida = []
+        self._pila = []
+        self._datos = []
+        # Etiquetas vacías ya cerradas cuyo cierre explícito hay que ignorar
+        self._cerradas = []
+        self._conservar_espacios = 0
+        self._contenedor_limpio = False
+        # Padre del último enlace eliminado mientras su siguiente hermano está por llegar
+        self._padre_eliminado = None
+
+    @classmethod
+    def analizar(cls, html_code, limpieza=None):
+        analizador = cls(limpieza)
+        analizador.feed(html_code)
+        analizador.close()
+        return analizador
+
+    @property
+    def html(self):
+        return ''.join(self._salida)
+
+    def close(self):
+        super().close()
+        self._fin_datos()
+        while self._pila:
+            self._desapilar()
+
+    # --- Nodos ---
+
+    def _padre(self):
+        return self._pila[-1] if self._pila else _RAIZ
+
+    def _es_hermano_eliminado(self, padre):
+        """True si el nodo que se crea sigue a un enlace eliminado (y lo consume)."""
+        if self._padre_eliminado is None:
+            return False
+        hermano = self._padre_eliminado is padre
+        self._padre_eliminado = None
+        return hermano
+
+    def _fin_datos(self, comentario=False):
+        if not self._datos:
+            return
+        texto = ''.join(self._datos)
+        self._datos = []
+        if not self._conservar_espacios and all(c in ESPACIOS_ASCII for c in texto):
+            texto = '\n' if '\n' in texto else ' '
+        padre = self._padre()
+        if self._es_hermano_eliminado(padre) or padre.omitido:
+            return
+        if comentario:
+            self._salida.append(f'<!--{texto}-->')
+        elif padre.nombre in ETIQUETAS_SIN_ESCAPAR:
+            self._salida.append(texto)
+        else:
+            self._salida.append(_escapar(texto))
+
+    def _abrir(self, etiqueta, attrs):
+        self._fin_datos()
+        if etiqueta == 'meta':
+            # BeautifulSoup reescribe el charset de <meta> al serializar
+            raise NoReproducible(etiqueta)
+        atributos = {}
+        for nombre, valor in attrs:
+            atributos[nombre] = '' if valor is None else valor
+
+        padre = self._padre()
+        self._es_hermano_eliminado(padre)
+        if etiqueta == 'iframe':
+            self.iframes.append(atributos.get('src', ''))
+        elif etiqueta == 'script':
+            self.scripts.append(atributos.get('src', ''))
+
+        eliminado = False
+        if self.limpieza == LIMPIEZA_CANVA:
+            if etiqueta == 'div' and not self._contenedor_limpio and _CONTENEDOR_CANVA.search(atributos.get('style', '')):
+                self._contenedor_limpio = True
+                estilo = re.sub(r'margin-top:\s*[\d.]+em;?', '', atributos['style'])
+                estilo = re.sub(r'margin-bottom:\s*[\d.]+em;?', '', estilo)
+                atributos['style'] = estilo.strip()
+            elif (
+                etiqueta == 'a' and _ENLACE_CANVA.search(atributos.get('href', ''))
+                and not any(elemento.nombre == 'iframe' for elemento in self._pila)
+            ):
+                if padre.omitido:
+                    raise NoReproducible('enlace de atribución anidado')
+                eliminado = True
+        elif self.limpieza == LIMPIEZA_GOOGLE_SLIDES and etiqueta == 'script':
+            eliminado = True
+
+        elemento = _Elemento(etiqueta, padre.omitido or eliminado, eliminado)
+        self._pila.append(elemento)
+        if etiqueta in ETIQUETAS_CONSERVAN_ESPACIOS:
+            self._conservar_espacios += 1
+        if not elemento.omitido:
+            partes = [etiqueta, *(_atributo(etiqueta, n, v) for n, v in sorted(atributos.items()))]
+            cierre = '/' if etiqueta in ETIQUETAS_VACIAS else ''
+            self._salida.append(f"<{' '.join(partes)}{cierre}>")
+
+    def _desapilar(self):
+        elemento = self._pila.pop()
+        if elemento.nombre in ETIQUETAS_CONSERVAN_ESPACIOS:
+            self._conservar_espacios -= 1
+        if not elemento.omitido and elemento.nombre not in ETIQUETAS_VACIAS:
+            self._salida.append(f'</{elemento.nombre}>')
+        if elemento.eliminado and self.limpieza == LIMPIEZA_CANVA:
+            self._padre_eliminado = self._padre()
+
+    def _cerrar(self, etiqueta):
+        self._fin_datos()
+        if not any(elemento.nombre == etiqueta for elemento in self._pila):
+            return
+        while self._pila[-1].nombre != etiqueta:
+            self._desapilar()
+        self._desapilar()
+
+    # --- Eventos de html.parser ---
+
+    def handle_starttag(self, tag, attrs):
+        self._abrir(tag, attrs)
+        if tag in ETIQUETAS_VACIAS:
+            self._cerrar(tag)
+            self._cerradas.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self._cerradas:
+            # <br>...<br/>: el segundo quedaría abierto y con contenido
+            raise NoReproducible(tag)
+        self._abrir(tag, attrs)
+        self._cerrar(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._cerradas:
+            self._cerradas.remove(tag)
+        else:
+            self._cerrar(tag)
+
+    def handle_data(self, data):
+        self._datos.append(data)
+
+    def handle_charref(self, name):
+        if name[0] in 'xX':
+            codigo = int(name.lstrip('xX'), 16)
+        else:
+            codigo = int(name)
+        caracter = None
+        if codigo < 256:
+            # Referencias a Windows-1252 (&#147; por “), como hace BeautifulSoup
+            try:
+                caracter = bytes([codigo]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not caracter:
+            try:
+                caracter = chr(codigo)
+            except (ValueError, OverflowError):
+                pass
+        self._datos.append(caracter or '\N{REPLACEMENT CHARACTER}')
+
+    def handle_entityref(self, name):
+        self._datos.append(ENTIDADES.get(name, f'&{name}'))
+
+    def handle_comment(self, data):
+        self._fin_datos()
+        self._datos.append(data)
+        self._fin_datos(comentario=True)
+
+    def handle_decl(self, decl):
+        raise NoReproducible('declaración')
+
+    def unknown_decl(self, data):
+        raise NoReproducible('declaración')
+
+    def handle_pi(self, data):
+        raise NoReproducible('instrucción de procesamiento')
@@ -0,0 +1,51 @@
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from imago.autoguardado import Autoguardable, registrar
+from .models import Publicacion, BloqueContenido
+from .utils import normalize_embed
+
+
+def es_administrativo(user):
+    return user.is_superuser or user.groups.filter(name='Administrativo').exists()
+
+
+class PublicacionAutoguardable(Autoguardable):
+    modelo = Publicacion
+
+    def tiene_permiso(self, user, publicacion):
+        return es_administrativo(user)
+
+    def limpiar_fecha_publicacion(self, publicacion, valor):
+        fecha = Publicacion._meta.get_field('fecha_publicacion').clean(valor, publicacion)
+        # El input datetime-local envía la fecha sin zona horaria
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        return fecha
+
+    def limpiar_etiquetas(self, publicacion, valor):
+        if not isinstance(valor, str):
+            raise ValidationError("Las etiquetas deben ser un texto separado por comas.")
+        return [etiqueta.strip() for etiqueta in valor.split(',') if etiqueta.strip()]
+
+
+class BloqueAutoguardable(Autoguardable):
+    modelo = BloqueContenido
+
+    def tiene_permiso(self, user, bloque):
+        return es_administrativo(user)
+
+    def limpiar_contenido_embed(self, bloque, valor):
+        if not valor:
+            return valor
+        embed = normalize_embed(valor)
+        if not embed.es_valido:
+            raise ValidationError(f"Código embed inválido: {embed.error}")
+        return embed.codigo_limpio
+
+    def despues_de_guardar(self, bloque, cambios):
+        Publicacion.invalidar_cuerpo(bloque.publicacion_id)
+
+
+registrar('publicacion', PublicacionAutoguardable)
+registrar('bloque', BloqueAutoguardable)
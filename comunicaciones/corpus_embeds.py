@@ -0,0 +1,116 @@
+"""
+Corpus de referencia de código embed.
+
+Lo usan el test de equivalencia (comunicaciones/tests.py) y
+`manage.py benchmark_embeds` para comprobar que el analizador en streaming
+(comunicaciones/analizador_embed.py) da exactamente el mismo resultado que
+BeautifulSoup y medir la diferencia. Cubre lo que se pega de verdad en los
+bloques (URLs y embeds de cada plataforma) y los casos de serialización
+delicados (entidades, comillas, espacios, etiquetas sin cerrar...).
+"""
+
+CANVA_EMBED = (
+    '<div style="position: relative; width: 100%; height: 0; padding-top: 56.2500%;\n'
+    ' padding-bottom: 0; box-shadow: 0 2px 8px 0 rgba(63,69,81,0.16); margin-top: 1.6em; margin-bottom: 0.9em;'
+    ' overflow: hidden;\n border-radius: 8px; will-change: transform;">\n'
+    '  <iframe loading="lazy" style="position: absolute; width: 100%; height: 100%; top: 0; left: 0; border: none;'
+    ' padding: 0;margin: 0;"\n'
+    '    src="https://www.canva.com/design/DAGabc123/view?embed" allowfullscreen="allowfullscreen" allow="fullscreen">\n'
+    '  </iframe>\n'
+    '</div>\n'
+    '<a href="https:&#x2F;&#x2F;www.canva.com&#x2F;design&#x2F;DAGabc123&#x2F;view?utm_content=DAGabc123&amp;'
+    'utm_campaign=designshare&amp;utm_medium=embeds&amp;utm_source=link" target="_blank" rel="noopener">'
+    'Presentación</a> de Ana García'
+)
+
+GOOGLE_SLIDES_EMBED = (
+    '<iframe src="https://docs.google.com/presentation/d/e/2PACX-1vQ/embed?start=false&loop=false&delayms=3000"'
+    ' frameborder="0" width="960" height="569" allowfullscreen="true" mozallowfullscreen="true"'
+    ' webkitallowfullscreen="true"></iframe>\n'
+    '<script src="https://docs.google.com/static/presentation/embed.js"></script>'
+)
+
+CORPUS_EMBEDS = [
+    # Vacíos, texto y URLs de cada plataforma
+    '',
+    '   ',
+    'hola mundo',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ?t=42',
+    'https://www.youtube.com/embed/dQw4w9WgXcQ',
+    'https://vimeo.com/76979871',
+    'https://www.canva.com/design/DAGabc123/view',
+    'https://www.canva.com/es_es/',
+    'https://docs.google.com/presentation/d/1AbC_dEf-123/edit#slide=id.p',
+    'https://drive.google.com/file/d/1AbC_dEf-123/view?usp=sharing',
+    'https://drive.google.com/open?id=1AbC_dEf-123',
+    'https://www.instagram.com/p/C1a2b3c4d5/',
+    'https://www.instagram.com/stories/alguien/',
+    'https://twitter.com/NASA/status/1234567890',
+    'https://x.com/NASA',
+    'https://www.ejemplo.org/pagina',
+    # Embeds tal como los dan las plataformas
+    CANVA_EMBED,
+    CANVA_EMBED.replace('\n', '\r\n'),
+    GOOGLE_SLIDES_EMBED,
+    '<iframe width="560" height="315" src="https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ?si=x&amp;start=10"'
+    ' title="YouTube video player" frameborder="0" allow="accelerometer; autoplay; clipboard-write;'
+    ' encrypted-media; gyroscope; picture-in-picture; web-share"'
+    ' referrerpolicy="strict-origin-when-cross-origin" allowfullscreen></iframe>',
+    '<iframe src="https://player.vimeo.com/video/76979871?h=8272103f6e" width="640" height="360" frameborder="0"'
+    ' allow="autoplay; fullscreen; picture-in-picture" allowfullscreen></iframe>'
+    '<p><a href="https://vimeo.com/76979871">The New Vimeo Player</a> from <a href="https://vimeo.com/staff">'
+    'Vimeo Staff</a> on <a href="https://vimeo.com">Vimeo</a>.</p>',
+    '<blockquote class="twitter-tweet"><p lang="es" dir="ltr">Hola &amp; adiós &#8212; prueba'
+    ' <a href="https://t.co/abc">pic.twitter.com/abc</a></p>&mdash; NASA (@NASA)'
+    ' <a href="https://twitter.com/NASA/status/1234567890?ref_src=twsrc%5Etfw">1 de enero de 2024</a></blockquote>'
+    ' <script async src="https://platform.twitter.com/widgets.js" charset="utf-8"></script>',
+    '<blockquote class="instagram-media" data-instgrm-captioned data-instgrm-permalink='
+    '"https://www.instagram.com/p/C1a2b3c4d5/?utm_source=ig_embed&amp;utm_campaign=loading"'
+    ' data-instgrm-version="14" style=" background:#FFF; border:0; margin: 1px; max-width:540px;">'
+    '<div style="padding:16px;"> <a href="https://www.instagram.com/p/C1a2b3c4d5/" target="_blank">'
+    'Ver esta publicación en Instagram</a></div></blockquote>'
+    ' <script async src="//www.instagram.com/embed.js"></script>',
+    '<iframe src="https://www.facebook.com/plugins/video.php?href=https%3A%2F%2Fwww.facebook.com%2Fx&show_text=0"'
+    ' width="560" height="314" style="border:none;overflow:hidden" scrolling="no" frameborder="0"'
+    ' allowfullscreen="true"></iframe>',
+    '<blockquote class="tiktok-embed" cite="https://www.tiktok.com/@x/video/1" data-video-id="1">'
+    '<section></section></blockquote> <script async src="https://www.tiktok.com/embed.js"></script>',
+    # Rechazos
+    '<iframe src="https://evil.example.com/x"></iframe>',
+    '<iframe width="100"></iframe>',
+    '<iframe src=""></iframe><iframe src="https://www.youtube.com/embed/x"></iframe>',
+    '<script src="https://evil.example.com/x.js"></script>',
+    '<p>sin embed</p>',
+    '<img src="https://www.youtube.com/x.png">',
+    # Se admite (como hasta ahora) un script sin src
+    '<script>alert(1)</script>',
+    # Variantes de Canva
+    '<div class="  canva   embed " style="position:relative;margin-top:2em;padding:0">'
+    '<iframe src="https://www.canva.com/design/X/view?embed"></iframe></div>'
+    '<a href="https://www.canva.com/design/X">Diseño</a>   con Canva<br>fin',
+    '<div style="position: relative; margin-bottom: .5em;"><div style="position: relative; margin-top: 3em;">'
+    '<iframe src="https://www.canva.com/design/X/view?embed"><a href="https://www.canva.com/x">dentro</a></iframe>'
+    '</div></div><a href="https://www.canva.com/x"><b>a</b></a><!-- atribución --><a href="https://www.canva.com/y">'
+    'b</a>',
+    '<iframe src="https://www.canva.com/design/X/view?embed"></iframe>'
+    '<a href="https://www.canva.com/x">sin cerrar<p>párrafo</p>',
+    '<iframe src="https://www.canva.com/design/X/view?embed" title=\'Dijo "hola"\' data-x="it\'s &quot;both&quot;">'
+    '</iframe>&copy; 2024 &nbsp;&#147;comillas&#148; &#x1F600; &bogus; & < > &amp;',
+    '<IFRAME SRC="https://www.canva.com/design/X/view?embed" ALLOWFULLSCREEN></IFRAME><BR/><img alt=x>'
+    '</img><hr/>',
+    '<iframe src="https://www.canva.com/design/X/view?embed"></iframe><pre>  espacios   \n  </pre>\n\n  \t'
+    '<textarea>  </textarea><style> p { color: red; } </style>',
+    '<iframe src="https://www.canva.com/design/X/view?embed"></iframe></div></span><p>sin abrir',
+    '<iframe src="https://www.canva.com/design/X/view?embed" sandbox="allow-scripts   allow-same-origin">'
+    '</iframe><a rel="  noopener   noreferrer " href="https://otro.com">otro</a>',
+    # Variantes de Google Slides
+    '<iframe src="https://docs.google.com/presentation/d/X/embed"></iframe><script>var a = 1 < 2 && 3 > 2;</script>'
+    ' tras el script',
+    '<div><iframe src="https://docs.google.com/presentation/d/X/embed" allowfullscreen></iframe>'
+    '<script src="https://docs.google.com/x.js">',
+    # Marcado que se resuelve con BeautifulSoup (declaraciones, meta)
+    '<!DOCTYPE html><iframe src="https://www.canva.com/design/X/view?embed"></iframe>',
+    '<meta charset="latin-1"><iframe src="https://docs.google.com/presentation/d/X/embed"></iframe>',
+    '<iframe src="https://www.canva.com/design/X/view?embed"></iframe><br><br/>texto',
+]
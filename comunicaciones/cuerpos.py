@@ -0,0 +1,54 @@
+"""
+Cuerpos de las publicaciones ya renderizados para el listado.
+
+El cuerpo de una publicación es la lista de sus bloques, cada uno con su
+plantilla de bloques_display/. En lugar de recorrerlos (y de resolver un
+`{% include %}` dinámico por bloque) en cada visita, el HTML completo se
+guarda en la caché con la clave (pk, version_cuerpo). Los cambios en los
+bloques (alta, borrado, imagen, orden y autoguardado) incrementan
+`version_cuerpo` con Publicacion.invalidar_cuerpo(), así que la clave antigua
+deja de usarse sin tener que borrarla.
+
+`adjuntar_cuerpos()` resuelve una página entera con un get_many y solo carga
+(con un único prefetch) los bloques de las publicaciones que no estaban en
+caché. Los borradores no se cachean: solo los ve el equipo mientras los edita.
+"""
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Publicacion
+
+TIEMPO_CACHE_CUERPO = 60 * 60 * 24
+
+
+def clave_cuerpo(publicacion):
+    return f'comunicaciones:cuerpo:{publicacion.pk}:{publicacion.version_cuerpo}'
+
+
+def renderizar_cuerpo(publicacion):
+    return render_to_string('comunicaciones/_publicacion_cuerpo.html', {'publicacion': publicacion})
+
+
+def adjuntar_cuerpos(publicaciones):
+    """Añade `cuerpo_html` a cada publicación de la página."""
+    publicaciones = list(publicaciones)
+    cacheables = [p for p in publicaciones if p.estado == Publicacion.ESTADO_PUBLICADO]
+    cacheados = cache.get_many([clave_cuerpo(p) for p in cacheables])
+
+    pendientes = [p for p in publicaciones if clave_cuerpo(p) not in cacheados]
+    prefetch_related_objects(pendientes, 'bloques')
+    nuevos = {}
+    for publicacion in publicaciones:
+        clave = clave_cuerpo(publicacion)
+        if clave in cacheados:
+            cuerpo = cacheados[clave]
+        else:
+            cuerpo = renderizar_cuerpo(publicacion)
+            if publicacion.estado == Publicacion.ESTADO_PUBLICADO:
+                nuevos[clave] = cuerpo
+        publicacion.cuerpo_html = mark_safe(cuerpo)
+    if nuevos:
+        cache.set_many(nuevos, TIEMPO_CACHE_CUERPO)
+    return publicaciones
@@ -0,0 +1,70 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comunicaciones.corpus_embeds import CORPUS_EMBEDS
+from comunicaciones.utils import (
+    LIMPIEZA_CANVA, LIMPIEZA_GOOGLE_SLIDES, _analizar, _analizar_beautifulsoup, _normalizar,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Comprueba que el analizador de embeds en streaming da el mismo resultado que "
+        "BeautifulSoup sobre el corpus de referencia y compara sus tiempos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=200,
+            help='Veces que se recorre el corpus con cada analizador (por defecto 200).',
+        )
+
+    def _resultados(self, analizar):
+        resultados = []
+        for codigo in CORPUS_EMBEDS:
+            resultados.append(_normalizar(codigo, analizar=analizar))
+            resultados.append(analizar(codigo, LIMPIEZA_CANVA).html)
+            resultados.append(analizar(codigo, LIMPIEZA_GOOGLE_SLIDES).html)
+        return resultados
+
+    def _cronometrar(self, analizar, repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            for codigo in CORPUS_EMBEDS:
+                _normalizar(codigo, analizar=analizar)
+        return time.perf_counter() - inicio
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        if repeticiones < 1:
+            raise CommandError('--repeticiones debe ser al menos 1.')
+
+        # Los avisos de validación del corpus ensuciarían la salida y los tiempos
+        logging.disable(logging.WARNING)
+        try:
+            self._comparar(repeticiones)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _comparar(self, repeticiones):
+        esperados = self._resultados(_analizar_beautifulsoup)
+        obtenidos = self._resultados(_analizar)
+        distintos = [
+            CORPUS_EMBEDS[i // 3] for i, (a, b) in enumerate(zip(esperados, obtenidos)) if a != b
+        ]
+        if distintos:
+            for codigo in dict.fromkeys(distintos):
+                self.stderr.write(f"  Distinto: {codigo[:80]!r}")
+            raise CommandError(f"{len(distintos)} resultado(s) distinto(s) de BeautifulSoup.")
+        self.stdout.write(f"  {len(esperados)} resultado(s) idénticos en {len(CORPUS_EMBEDS)} embeds.")
+
+        beautifulsoup = self._cronometrar(_analizar_beautifulsoup, repeticiones)
+        streaming = self._cronometrar(_analizar, repeticiones)
+        por_embed = 1e6 / (repeticiones * len(CORPUS_EMBEDS))
+        self.stdout.write(f"  BeautifulSoup: {beautifulsoup:.3f} s ({beautifulsoup * por_embed:.1f} µs/embed)")
+        self.stdout.write(f"  Streaming:     {streaming:.3f} s ({streaming * por_embed:.1f} µs/embed)")
+        self.stdout.write(self.style.SUCCESS(f"Streaming {beautifulsoup / streaming:.1f}x más rápido."))
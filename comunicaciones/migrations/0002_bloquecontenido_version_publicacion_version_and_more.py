@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunicaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloquecontenido',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='publicacion',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='bloquecontenido',
+            name='tamanio_imagen',
+            field=models.CharField(blank=True, choices=[('small', 'Pequeño (30%)'), ('medium', 'Mediano (50%)'), ('large', 'Grande (70%)'), ('full', 'Ancho completo')], default='medium', max_length=10, null=True),
+        ),
+    ]
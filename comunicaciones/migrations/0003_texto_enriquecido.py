@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+def rellenar_texto_enriquecido(apps, schema_editor):
+    from imago.texto_enriquecido import rellenar
+    rellenar(apps.get_model('comunicaciones', 'BloqueContenido'), ['contenido_texto'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunicaciones', '0002_bloquecontenido_version_publicacion_version_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloquecontenido',
+            name='contenido_texto_extracto',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='bloquecontenido',
+            name='contenido_texto_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='bloquecontenido',
+            name='contenido_texto_palabras',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rellenar_texto_enriquecido, migrations.RunPython.noop),
+    ]
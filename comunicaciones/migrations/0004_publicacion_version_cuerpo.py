@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunicaciones', '0003_texto_enriquecido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacion',
+            name='version_cuerpo',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
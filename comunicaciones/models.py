@@ -1,10 +1,13 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
 from django_ckeditor_5.fields import CKEditor5Field
 from django.utils import timezone
 from taggit.managers import TaggableManager
+from imago.autoguardado import VersionadoMixin
+from imago.texto_enriquecido import TextoEnriquecidoMixin
 
-class Publicacion(models.Model):
+class Publicacion(VersionadoMixin, models.Model):
     ESTADO_BORRADOR = 'borrador'
     ESTADO_PUBLICADO = 'publicado'
     ESTADO_CHOICES = [
@@ -36,6 +39,13 @@ class Publicacion(models.Model):
         blank=True
     )
 
+    CAMPOS_AUTOGUARDADO = ['titulo', 'estado', 'fecha_publicacion', 'etiquetas']
+
+    # Sello de versión del cuerpo (los bloques) ya renderizado. Forma parte de la
+    # clave de caché del listado (comunicaciones/cuerpos.py); cualquier cambio en
+    # los bloques lo incrementa con invalidar_cuerpo().
+    version_cuerpo = models.PositiveIntegerField(default=1, editable=False)
+
     class Meta:
         verbose_name = "Publicación"
         verbose_name_plural = "Publicaciones"
@@ -44,7 +54,12 @@ class Publicacion(models.Model):
     def __str__(self):
         return self.titulo
 
-class BloqueContenido(models.Model):
+    @classmethod
+    def invalidar_cuerpo(cls, publicacion_id):
+        """Descarta el cuerpo cacheado de la publicación (sin tocar `version` del autoguardado)."""
+        cls.objects.filter(pk=publicacion_id).update(version_cuerpo=F('version_cuerpo') + 1)
+
+class BloqueContenido(TextoEnriquecidoMixin, VersionadoMixin, models.Model):
     TIPO_BLOQUE = [
         ('texto', 'Texto Enriquecido'),
         ('imagen', 'Imagen'),
@@ -79,6 +94,23 @@ class BloqueContenido(models.Model):
     contenido_cita = models.TextField(blank=True, null=True, help_text="Texto de la cita.")
     autor_cita = models.CharField(max_length=100, blank=True, null=True, help_text="Autor de la cita (opcional).")
 
+    # Versiones precalculadas de `contenido_texto` (imago/texto_enriquecido.py)
+    contenido_texto_html = models.TextField(blank=True, default='', editable=False)
+    contenido_texto_extracto = models.CharField(max_length=300, blank=True, default='', editable=False)
+    contenido_texto_palabras = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_AUTOGUARDADO = [
+        'contenido_texto', 'contenido_embed', 'contenido_cita', 'autor_cita',
+        'tamanio_imagen', 'alineacion_imagen', 'caption_imagen',
+    ]
+    CAMPOS_TEXTO_ENRIQUECIDO = ['contenido_texto']
+
+    @classmethod
+    def texto_enriquecido_rellenado(cls, pks):
+        publicaciones = cls.objects.filter(pk__in=pks).values_list('publicacion_id', flat=True).order_by().distinct()
+        for publicacion_id in publicaciones:
+            Publicacion.invalidar_cuerpo(publicacion_id)
+
     class Meta:
         verbose_name = "Bloque de Contenido"
         verbose_name_plural = "Bloques de Contenido"
@@ -1,3 +1,19 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .analizador_embed import AnalizadorEmbed, NoReproducible
+from .corpus_embeds import CORPUS_EMBEDS
+from .utils import LIMPIEZA_CANVA, LIMPIEZA_GOOGLE_SLIDES, _analizar, _analizar_beautifulsoup, _normalizar
+
+
+class AnalizadorEmbedTests(SimpleTestCase):
+
+    def test_mismo_resultado_que_beautifulsoup(self):
+        for codigo in CORPUS_EMBEDS:
+            with self.subTest(codigo=codigo[:80]):
+                self.assertEqual(_normalizar(codigo), _normalizar(codigo, analizar=_analizar_beautifulsoup))
+                for limpieza in (None, LIMPIEZA_CANVA, LIMPIEZA_GOOGLE_SLIDES):
+                    self.assertEqual(_analizar(codigo, limpieza), _analizar_beautifulsoup(codigo, limpieza))
+
+    def test_declaraciones_no_reproducibles(self):
+        with self.assertRaises(NoReproducible):
+            AnalizadorEmbed.analizar('<!DOCTYPE html><iframe src="https://www.canva.com/x"></iframe>', LIMPIEZA_CANVA)
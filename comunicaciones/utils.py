@@ -1,15 +1,18 @@
 import re
+import hashlib
 import logging
+from functools import lru_cache
+from typing import NamedTuple
 from urllib.parse import urlparse, parse_qs
-from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+from django.core.cache import cache
 import warnings
 
+from imago.storage import LRUMetadatos
+from .analizador_embed import LIMPIEZA_CANVA, LIMPIEZA_GOOGLE_SLIDES, AnalizadorEmbed, NoReproducible
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-# Suprimir warnings de BeautifulSoup sobre URLs
-warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
-
 
 # ============================================
 # CONVERSIÓN DE URLs A EMBEDS
@@ -275,34 +278,110 @@ def convertir_twitter_url(url):
 # LIMPIEZA DE CÓDIGO EMBED
 # ============================================
 
+# El análisis normal es AnalizadorEmbed (comunicaciones/analizador_embed.py),
+# en streaming sobre html.parser. BeautifulSoup queda como respaldo para el
+# marcado que ese analizador no reproduce y como referencia del benchmark
+# (`manage.py benchmark_embeds`), por eso se importa solo cuando se usa.
+
+class AnalisisEmbed(NamedTuple):
+    """`src` de los iframes y scripts del embed y el HTML ya limpio."""
+    iframes: list
+    scripts: list
+    html: str
+
+
+@lru_cache(maxsize=None)
+def _clase_beautifulsoup():
+    from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+    # Suprimir warnings de BeautifulSoup sobre URLs
+    warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
+    return BeautifulSoup
+
+
+def _limpiar_soup_canva(soup):
+    """Limpieza de Canva sobre un árbol ya parseado (lo modifica)."""
+    # Encontrar el div contenedor con estilos inline
+    container_div = soup.find('div', style=re.compile(r'position:\s*relative'))
+    
+    if container_div:
+        style = container_div.get('style', '')
+        # Eliminar márgenes excesivos
+        style = re.sub(r'margin-top:\s*[\d.]+em;?', '', style)
+        style = re.sub(r'margin-bottom:\s*[\d.]+em;?', '', style)
+        container_div['style'] = style.strip()
+    
+    # Encontrar y eliminar enlaces de atribución
+    attribution_links = soup.find_all('a', href=re.compile(r'canva\.com'))
+    for link in attribution_links:
+        if link.find_parent('iframe') is None:
+            next_sibling = link.next_sibling
+            link.decompose()
+            if next_sibling and isinstance(next_sibling, str):
+                next_sibling.replace_with('')
+    
+    return str(soup)
+
+
+def _limpiar_soup_google_slides(soup):
+    """Limpieza de Google Slides sobre un árbol ya parseado (lo modifica)."""
+    # Google Slides a veces incluye scripts innecesarios
+    for script in soup.find_all('script'):
+        script.decompose()
+    
+    return str(soup)
+
+
+_LIMPIEZAS_SOUP = {
+    LIMPIEZA_CANVA: (_limpiar_soup_canva, 'embed de Canva'),
+    LIMPIEZA_GOOGLE_SLIDES: (_limpiar_soup_google_slides, 'Google Slides'),
+}
+
+
+def _analizar_beautifulsoup(html_code, limpieza=None):
+    """Lo mismo que _analizar() construyendo el árbol completo con BeautifulSoup."""
+    soup = _clase_beautifulsoup()(html_code, 'html.parser')
+    iframes = [iframe.get('src', '') for iframe in soup.find_all('iframe')]
+    scripts = [script.get('src', '') for script in soup.find_all('script')]
+    html = html_code
+    if limpieza:
+        limpiador, nombre = _LIMPIEZAS_SOUP[limpieza]
+        try:
+            html = limpiador(soup)
+        except Exception as e:
+            logger.error(f"Error al limpiar {nombre}: {e}")
+    return AnalisisEmbed(iframes, scripts, html)
+
+
+def _analizar(html_code, limpieza=None):
+    """
+    Iframes, scripts y (si se indica `limpieza`) HTML limpio de un embed en
+    una sola pasada. Si el analizador en streaming no puede garantizar el
+    mismo resultado que BeautifulSoup, se usa BeautifulSoup.
+    """
+    try:
+        analizador = AnalizadorEmbed.analizar(html_code, limpieza)
+    except Exception as e:
+        if not isinstance(e, NoReproducible):
+            logger.debug(f"Analizador de embeds en streaming falló ({e}); se usa BeautifulSoup")
+        return _analizar_beautifulsoup(html_code, limpieza)
+    return AnalisisEmbed(analizador.iframes, analizador.scripts, analizador.html if limpieza else html_code)
+
+
+def _tipo_limpieza(html_code):
+    if 'canva.com' in html_code:
+        return LIMPIEZA_CANVA
+    elif 'docs.google.com/presentation' in html_code:
+        return LIMPIEZA_GOOGLE_SLIDES
+    return None
+
+
 def limpiar_embed_canva(html_code):
     """Limpia el código HTML de Canva para optimizar su visualización."""
     if not html_code:
         return html_code
     
     try:
-        soup = BeautifulSoup(html_code, 'html.parser')
-        
-        # Encontrar el div contenedor con estilos inline
-        container_div = soup.find('div', style=re.compile(r'position:\s*relative'))
-        
-        if container_div:
-            style = container_div.get('style', '')
-            # Eliminar márgenes excesivos
-            style = re.sub(r'margin-top:\s*[\d.]+em;?', '', style)
-            style = re.sub(r'margin-bottom:\s*[\d.]+em;?', '', style)
-            container_div['style'] = style.strip()
-        
-        # Encontrar y eliminar enlaces de atribución
-        attribution_links = soup.find_all('a', href=re.compile(r'canva\.com'))
-        for link in attribution_links:
-            if link.find_parent('iframe') is None:
-                next_sibling = link.next_sibling
-                link.decompose()
-                if next_sibling and isinstance(next_sibling, str):
-                    next_sibling.replace_with('')
-        
-        return str(soup)
+        return _analizar(html_code, LIMPIEZA_CANVA).html
         
     except Exception as e:
         logger.error(f"Error al limpiar embed de Canva: {e}")
@@ -315,13 +394,7 @@ def limpiar_embed_google_slides(html_code):
         return html_code
     
     try:
-        soup = BeautifulSoup(html_code, 'html.parser')
-        
-        # Google Slides a veces incluye scripts innecesarios
-        for script in soup.find_all('script'):
-            script.decompose()
-        
-        return str(soup)
+        return _analizar(html_code, LIMPIEZA_GOOGLE_SLIDES).html
         
     except Exception as e:
         logger.error(f"Error al limpiar Google Slides: {e}")
@@ -352,95 +425,104 @@ def detectar_y_limpiar_embed(html_code):
 # VALIDACIÓN Y ANÁLISIS
 # ============================================
 
-def validar_embed_code(html_code):
-    """
-    Valida que el código embed sea seguro y válido.
-    También convierte URLs simples a código embed.
+# Lista de dominios permitidos (ampliada)
+DOMINIOS_PERMITIDOS = [
+    'youtube.com',
+    'youtube-nocookie.com',  # Para embeds de YouTube
+    'youtu.be',
+    'vimeo.com',
+    'player.vimeo.com',  # Para embeds de Vimeo
+    'canva.com',
+    'docs.google.com',
+    'drive.google.com',
+    'slides.com',
+    'prezi.com',
+    'slideshare.net',
+    'instagram.com',
+    'twitter.com',
+    'x.com',
+    'platform.twitter.com',  # Para script de Twitter
+    'facebook.com',
+    'tiktok.com',
+]
+
+
+def _validar(analisis):
+    """Mensaje de error de un embed analizado, o '' si es válido."""
+    if not analisis.iframes:
+        # Puede ser embed de redes sociales (script)
+        if not analisis.scripts:
+            logger.warning("No se encontró iframe ni script en el código embed")
+            return 'No se encontró ningún iframe o script válido'
+        # Validar que los scripts sean de dominios permitidos
+        for src in analisis.scripts:
+            if src and not any(dominio in src for dominio in DOMINIOS_PERMITIDOS):
+                logger.warning(f"Dominio no permitido en script: {src}")
+                return f'Dominio no permitido en script: {src}'
+        return ''
     
-    Returns:
-        Tuple (is_valid: bool, cleaned_code: str, error_message: str)
+    # Validar cada iframe
+    for src in analisis.iframes:
+        if not src:
+            logger.warning("Iframe sin atributo src")
+            return 'El iframe no tiene atributo src'
+        
+        # Verificar que el src sea de un dominio permitido
+        if not any(dominio in src for dominio in DOMINIOS_PERMITIDOS):
+            logger.warning(f"Dominio no permitido: {src}")
+            return f'Dominio no permitido: {src}'
+    return ''
+
+
+class EmbedNormalizado(NamedTuple):
+    """Resultado de normalize_embed(): análisis, veredicto y código limpio."""
+    info: dict
+    es_valido: bool
+    codigo_limpio: str
+    error: str
+
+
+def _normalizar(html_code, analizar=_analizar):
+    """
+    Análisis, conversión, validación y limpieza con una sola pasada sobre el
+    HTML. `analizar` permite comparar con _analizar_beautifulsoup().
     """
+    info = obtener_info_embed(html_code)
     if not html_code or not html_code.strip():
-        return False, '', 'El código embed está vacío'
+        return EmbedNormalizado(info, False, '', 'El código embed está vacío')
     
     html_code_original = html_code.strip()
     
     # PASO 1: Convertir URL a embed si es necesario
-    html_code_convertido = convertir_url_a_embed(html_code_original)
+    html_code = convertir_url_a_embed(html_code_original)
     
     # Si cambió, es porque se convirtió de URL a embed
-    if html_code_convertido != html_code_original:
-        info = obtener_info_embed(html_code_original)
+    if html_code != html_code_original:
         logger.info(f"🔄 URL de {info.get('plataforma', 'desconocida')} convertida a código embed")
     
-    # PASO 2: Ahora validar el código embed resultante
-    html_code = html_code_convertido
-    
-    # Lista de dominios permitidos (ampliada)
-    dominios_permitidos = [
-        'youtube.com',
-        'youtube-nocookie.com',  # Para embeds de YouTube
-        'youtu.be',
-        'vimeo.com',
-        'player.vimeo.com',  # Para embeds de Vimeo
-        'canva.com',
-        'docs.google.com',
-        'drive.google.com',
-        'slides.com',
-        'prezi.com',
-        'slideshare.net',
-        'instagram.com',
-        'twitter.com',
-        'x.com',
-        'platform.twitter.com',  # Para script de Twitter
-        'facebook.com',
-        'tiktok.com',
-    ]
-    
+    # PASO 2: Validar y limpiar el código embed resultante en la misma pasada
     try:
-        soup = BeautifulSoup(html_code, 'html.parser')
-        
-        # Buscar todos los iframes
-        iframes = soup.find_all('iframe')
-        
-        if not iframes:
-            # Puede ser embed de redes sociales (script)
-            scripts = soup.find_all('script')
-            if scripts:
-                # Validar que los scripts sean de dominios permitidos
-                for script in scripts:
-                    src = script.get('src', '')
-                    if src and not any(dominio in src for dominio in dominios_permitidos):
-                        logger.warning(f"Dominio no permitido en script: {src}")
-                        return False, '', f'Dominio no permitido en script: {src}'
-                
-                # Scripts válidos, limpiar y devolver
-                cleaned_code = detectar_y_limpiar_embed(html_code)
-                return True, cleaned_code, ''
-            else:
-                logger.warning("No se encontró iframe ni script en el código embed")
-                return False, '', 'No se encontró ningún iframe o script válido'
-        
-        # Validar cada iframe
-        for iframe in iframes:
-            src = iframe.get('src', '')
-            
-            if not src:
-                logger.warning("Iframe sin atributo src")
-                return False, '', 'El iframe no tiene atributo src'
-            
-            # Verificar que el src sea de un dominio permitido
-            if not any(dominio in src for dominio in dominios_permitidos):
-                logger.warning(f"Dominio no permitido: {src}")
-                return False, '', f'Dominio no permitido: {src}'
-        
-        # Si todo está bien, limpiar y devolver
-        cleaned_code = detectar_y_limpiar_embed(html_code)
-        return True, cleaned_code, ''
+        analisis = analizar(html_code, _tipo_limpieza(html_code))
+        error = _validar(analisis)
+        if error:
+            return EmbedNormalizado(info, False, '', error)
+        return EmbedNormalizado(info, True, analisis.html, '')
         
     except Exception as e:
         logger.error(f"Error al validar embed: {str(e)}")
-        return False, '', f'Error al validar el código: {str(e)}'
+        return EmbedNormalizado(info, False, '', f'Error al validar el código: {str(e)}')
+
+
+def validar_embed_code(html_code):
+    """
+    Valida que el código embed sea seguro y válido.
+    También convierte URLs simples a código embed.
+    
+    Returns:
+        Tuple (is_valid: bool, cleaned_code: str, error_message: str)
+    """
+    resultado = _normalizar(html_code)
+    return resultado.es_valido, resultado.codigo_limpio, resultado.error
 
 
 def obtener_info_embed(contenido):
@@ -504,4 +586,35 @@ def obtener_info_embed(contenido):
         'plataforma': None,
         'convertible': False,
         'mensaje': 'No es una URL ni código embed válido'
-    }
\ No newline at end of file
+    }
+
+
+# ============================================
+# NORMALIZACIÓN MEMOIZADA
+# ============================================
+
+# El resultado solo depende del contenido, así que se memoiza por su hash en un
+# LRU del proceso y en la caché compartida. Súbase la versión si cambian la
+# conversión, la limpieza o DOMINIOS_PERMITIDOS.
+VERSION_NORMALIZACION = 1
+TIEMPO_CACHE_EMBED = 60 * 60 * 24 * 7
+_normalizados = LRUMetadatos(max_entries=256, timeout=60 * 60)
+
+
+def normalize_embed(content):
+    """
+    Punto de entrada único para previsualizar y guardar embeds: devuelve un
+    EmbedNormalizado con la información de plataforma (obtener_info_embed),
+    el veredicto y el código limpio (validar_embed_code), parseando el HTML
+    una sola vez y reutilizando el resultado para el mismo contenido.
+    """
+    clave = f"embed:{VERSION_NORMALIZACION}:{hashlib.sha256((content or '').encode('utf-8')).hexdigest()}"
+    resultado = _normalizados.get(clave)
+    if resultado is None:
+        resultado = cache.get(clave)
+        if resultado is None:
+            resultado = _normalizar(content)
+            cache.set(clave, resultado, TIEMPO_CACHE_EMBED)
+        _normalizados.set(clave, resultado)
+    # Copia de `info` para que quien la modifique no altere lo memoizado
+    return resultado._replace(info=dict(resultado.info))
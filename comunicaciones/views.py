@@ -13,7 +13,8 @@ from django.db.models import Count
 
 from users.mixins import GroupRequiredMixin
 from .models import Publicacion, BloqueContenido
-from .utils import detectar_y_limpiar_embed, validar_embed_code, obtener_info_embed
+from .cuerpos import adjuntar_cuerpos
+from .utils import normalize_embed
 from . import forms
 
 logger = logging.getLogger(__name__)
@@ -25,7 +26,9 @@ class PublicacionListView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Los bloques no se precargan aquí: adjuntar_cuerpos() solo los pide
+        # para las publicaciones cuyo cuerpo no está en caché
+        queryset = super().get_queryset().select_related('autor').prefetch_related('etiquetas')
         user = self.request.user
         
         is_admin = user.is_authenticated and (user.is_superuser or user.groups.filter(name='Administrativo').exists())
@@ -51,6 +54,7 @@ class PublicacionListView(ListView):
         ).order_by('-num_publicaciones')[:15]
         context['etiqueta_activa'] = self.request.GET.get('etiqueta')
         context['now'] = timezone.now()
+        adjuntar_cuerpos(context['publicaciones'])
         
         return context
 
@@ -96,13 +100,13 @@ class PublicacionDeleteView(LoginRequiredMixin, GroupRequiredMixin, DeleteView):
     success_url = reverse_lazy('comunicaciones:lista_publicaciones')
 
 
-# --- Vista AJAX Todo-en-Uno ---
+# --- Reordenación de bloques (los campos se guardan con el autoguardado de imago) ---
 @login_required
 def editar_publicacion_ajax(request, pk):
     if not (request.user.is_superuser or request.user.groups.filter(name='Administrativo').exists()):
         return HttpResponseForbidden("No tienes permiso para realizar esta acción.")
     
-    publicacion = get_object_or_404(Publicacion, pk=pk)
+    get_object_or_404(Publicacion, pk=pk)
     
     if request.method == 'PUT':
         data = json.loads(request.body)
@@ -116,24 +120,12 @@ def editar_publicacion_ajax(request, pk):
 
             for index, bloque_id in enumerate(bloques_ids):
                 BloqueContenido.objects.filter(pk=bloque_id, publicacion_id=pk).update(orden=index)
+            Publicacion.invalidar_cuerpo(pk)
             
             logger.info(f"Bloques reordenados para publicación {pk}")
             return JsonResponse({'success': True, 'message': 'Orden guardado'})
 
-        # Si no, es una petición para guardar los campos de la publicación.
-        allowed_fields = ['titulo', 'estado', 'fecha_publicacion']
-        for field, value in data.items():
-            if field in allowed_fields:
-                setattr(publicacion, field, value)
-        
-        if 'etiquetas' in data:
-            tags_string = data.get('etiquetas', '')
-            # Creamos una lista limpia de etiquetas a partir del string
-            tag_list = [tag.strip() for tag in tags_string.split(',') if tag.strip()]
-            publicacion.etiquetas.set(tag_list)
-        publicacion.save()
-
-        return JsonResponse({'success': True, 'message': 'Publicación guardada'})
+        return JsonResponse({'success': False, 'error': 'Falta el orden de los bloques'}, status=400)
 
     return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
@@ -155,6 +147,7 @@ def gestionar_bloque_ajax(request, **kwargs):
             
         orden = publicacion.bloques.count()
         bloque = BloqueContenido.objects.create(publicacion=publicacion, tipo=tipo, orden=orden)
+        Publicacion.invalidar_cuerpo(publicacion.pk)
         
         logger.info(f"Bloque {bloque.pk} creado exitosamente")
         
@@ -168,94 +161,15 @@ def gestionar_bloque_ajax(request, **kwargs):
         
         return JsonResponse({'success': True, 'html': html, 'bloque_id': bloque.pk})
 
-    # ================== PUT: Actualizar contenido o reordenar ==================
-    if request.method == 'PUT':
-        data = json.loads(request.body)
-        
-        # Caso 1: Reordenar bloques
-        if 'orden' in data and 'pub_pk' in kwargs:
-            pub_pk = kwargs.get('pub_pk')
-            bloques_ids = [int(bid) for bid in data['orden']]
-            queryset = BloqueContenido.objects.filter(publicacion_id=pub_pk, id__in=bloques_ids)
-            
-            if queryset.count() != len(bloques_ids):
-                return JsonResponse({'success': False, 'error': 'IDs de bloque no válidos'}, status=400)
-
-            for index, bloque_id in enumerate(bloques_ids):
-                BloqueContenido.objects.filter(pk=bloque_id, publicacion_id=pub_pk).update(orden=index)
-            
-            logger.info(f"Bloques reordenados para publicación {pub_pk}")
-            return JsonResponse({'success': True, 'message': 'Orden guardado'})
-        
-        # Caso 2: Actualizar el título de la publicación
-        elif 'pub_pk' in kwargs and not 'bloque_pk' in kwargs:
-            pub_pk = kwargs.get('pub_pk')
-            publicacion = get_object_or_404(Publicacion, pk=pub_pk)
-            
-            allowed_fields = ['titulo', 'estado', 'fecha_publicacion', 'etiquetas']
-            
-            for field, value in data.items():
-                if field in allowed_fields:
-                    if field == 'etiquetas':
-                        # Taggit necesita un tratamiento especial
-                        publicacion.etiquetas.set(*[tag.strip() for tag in value.split(',')])
-                    else:
-                        setattr(publicacion, field, value)
-            
-            publicacion.save()
-            logger.info(f"Publicación {pub_pk} actualizada. Campos: {list(data.keys())}")
-            return JsonResponse({'success': True, 'message': 'Publicación guardada'})
-        
-        # Caso 3: Actualizar contenido de un bloque específico
-        elif 'bloque_pk' in kwargs:
-            bloque_pk = kwargs.get('bloque_pk')
-            bloque = get_object_or_404(BloqueContenido, pk=bloque_pk)
-            
-            logger.info(f"Actualizando bloque {bloque_pk}, tipo: {bloque.tipo}")
-            
-            # Campos permitidos según el tipo de bloque
-            allowed_fields = [
-                'contenido_texto', 'contenido_embed', 'contenido_cita', 'autor_cita',
-                'tamanio_imagen', 'alineacion_imagen', 'caption_imagen'
-            ]
-            
-            updated_fields = []
-            for field, value in data.items():
-                if field in allowed_fields and hasattr(bloque, field):
-                    
-                    # Aplicar limpieza de colores problemáticos para TODO contenido de texto
-                    if field == 'contenido_texto' and value:
-                        preview = value[:100] if value else 'None'
-                        logger.info(f"💾 Guardando contenido_texto para bloque {bloque_pk}: '{preview}...'")
-                    
-                    # También limpiar contenido_embed si contiene texto HTML
-                    elif field == 'contenido_embed' and value:
-                        # Primero validar el embed
-                        is_valid, cleaned_code, error_msg = validar_embed_code(value)
-                        
-                        if not is_valid:
-                            logger.warning(f"❌ Código embed inválido: {error_msg}")
-                            return JsonResponse({
-                                'success': False, 
-                                'error': f'Código embed inválido: {error_msg}'
-                            }, status=400)
-                        
-                        value = cleaned_code
-                        logger.info(f"✅ Código embed validado y limpiado para bloque {bloque_pk}")
-                    
-                    setattr(bloque, field, value)
-                    updated_fields.append(field)
-            
-            bloque.save()
-            logger.info(f"✅ Bloque {bloque_pk} guardado. Campos: {updated_fields}")
-            
-            return JsonResponse({'success': True, 'message': 'Contenido guardado'})
+    # El contenido de los bloques se guarda con el autoguardado versionado
+    # (imago/autoguardado.py, registrado en comunicaciones/autoguardado.py).
 
     # ================== DELETE: Borrar un bloque ==================
     if request.method == 'DELETE' and 'bloque_pk' in kwargs:
         bloque_pk = kwargs.get('bloque_pk')
         bloque = get_object_or_404(BloqueContenido, pk=bloque_pk)
         bloque.delete()
+        Publicacion.invalidar_cuerpo(bloque.publicacion_id)
         
         logger.info(f"Bloque {bloque_pk} eliminado")
         return JsonResponse({'success': True})
@@ -266,7 +180,9 @@ def gestionar_bloque_ajax(request, **kwargs):
         bloque = get_object_or_404(BloqueContenido, pk=bloque_pk)
         
         bloque.contenido_imagen = request.FILES['file']
-        bloque.save()
+        # Sin tocar la versión: el autoguardado del bloque sigue siendo válido
+        bloque.save(update_fields=['contenido_imagen'])
+        Publicacion.invalidar_cuerpo(bloque.publicacion_id)
         
         logger.info(f"Imagen subida para bloque {bloque_pk}")
 
@@ -323,26 +239,20 @@ def preview_embed_ajax(request):
                     'error': 'No se proporcionó contenido'
                 }, status=400)
             
-            # Obtener información del embed
-            info = obtener_info_embed(contenido)
-            
-            # Convertir y limpiar
-            embed_limpio = detectar_y_limpiar_embed(contenido)
-            
-            # Validar
-            is_valid, cleaned_code, error_msg = validar_embed_code(contenido)
+            # Información, validación y limpieza con un solo parseo (memoizado)
+            embed = normalize_embed(contenido)
             
-            if not is_valid:
+            if not embed.es_valido:
                 return JsonResponse({
                     'success': False,
-                    'error': error_msg,
-                    'info': info
+                    'error': embed.error,
+                    'info': embed.info
                 }, status=400)
             
             return JsonResponse({
                 'success': True,
-                'html': cleaned_code,
-                'info': info,
+                'html': embed.codigo_limpio,
+                'info': embed.info,
                 'message': 'Preview generado correctamente'
             })
             
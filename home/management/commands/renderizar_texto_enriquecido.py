@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from imago.texto_enriquecido import TextoEnriquecidoMixin, rellenar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el HTML saneado, el extracto y el número de palabras de los campos "
+        "de texto enriquecido (temas, respuestas, comentarios, documentos y bloques)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo cuenta las filas desactualizadas, sin guardar cambios.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de filas por cada lote y bulk_update (por defecto 500).',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for modelo in apps.get_models():
+            if not issubclass(modelo, TextoEnriquecidoMixin):
+                continue
+            filas = rellenar(
+                modelo, modelo.CAMPOS_TEXTO_ENRIQUECIDO,
+                batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+            total += filas
+            self.stdout.write(f"  {modelo._meta.label}: {filas} fila(s) desactualizada(s)")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{total} fila(s) desactualizada(s) (dry-run, sin cambios)."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Texto enriquecido recalculado en {total} fila(s)."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='homepageblock',
+            name='tipo_bloque',
+            field=models.CharField(choices=[('reflexion', 'Reflexión (Texto simple con título)'), ('texto_fondo', 'Texto con Imagen de Fondo (Estática)'), ('parallax', 'Sección con Efecto Parallax'), ('seccion_valoradas', 'Sección: Lecturas Mejor Valoradas'), ('seccion_recientes', 'Sección: Novedades'), ('seccion_foros', 'Sección: Foros Más Activos'), ('seccion_mas_leidas', 'Sección: Lecturas Más Leídas')], default='reflexion', help_text='Elige el diseño visual para este bloque de contenido.', max_length=30, verbose_name='Tipo de Bloque'),
+        ),
+    ]
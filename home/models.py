@@ -24,6 +24,7 @@ class HomePageBlock(models.Model):
         MEJOR_VALORADAS = 'seccion_valoradas', 'Sección: Lecturas Mejor Valoradas'
         RECIENTES = 'seccion_recientes', 'Sección: Novedades'
         FOROS_DESTACADOS = 'seccion_foros', 'Sección: Foros Más Activos'
+        MAS_LEIDAS = 'seccion_mas_leidas', 'Sección: Lecturas Más Leídas'
 
     class ContentPosition(models.TextChoices):
         LEFT = 'left', 'Izquierda'
@@ -0,0 +1,224 @@
+"""
+Autoguardado versionado de los formularios de edición (Documento, Tema,
+Publicación y sus bloques).
+
+El cliente (static/js/autoguardado.js) acumula los cambios de varios campos y
+los envía en un único PATCH a /autoguardado/<tipo>/<pk>/:
+
+    {"version": 7, "campos": {"titulo": "...", "descripcion": "..."}}
+
+Los campos se validan contra la lista blanca del modelo y los de columna se
+escriben con un solo UPDATE condicionado a la versión (control de concurrencia
+optimista). Si otra pestaña o usuario guardó antes, la respuesta es 409 con la
+versión y los valores actuales en lugar de sobrescribirlos en silencio.
+
+Los formularios completos de edición (FormularioVersionadoMixin) llevan en un
+campo oculto la versión con la que se abrieron y su save() hace el mismo UPDATE
+condicionado; el cliente mantiene ese campo al día con cada autoguardado.
+
+Cada app registra sus modelos con `registrar()` desde su AppConfig.ready().
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F
+
+from .texto_enriquecido import valores_texto_enriquecido
+
+
+class VersionadoMixin(models.Model):
+    """
+    Añade el campo `version` que usa el autoguardado. Cualquier guardado que
+    toque un campo de CAMPOS_AUTOGUARDADO (o un save() completo) incrementa la
+    versión, de modo que un autoguardado con una versión anterior no lo pisa.
+
+    El incremento se hace en el propio UPDATE (F('version') + 1). Si antes se
+    asigna `_version_esperada` (lo hace FormularioVersionadoMixin), el UPDATE
+    solo se aplica si la fila sigue en esa versión y, si no, lanza
+    ConflictoVersion.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    CAMPOS_AUTOGUARDADO = []
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        version = self.version
+        if update_fields is None or set(update_fields) & set(self.CAMPOS_AUTOGUARDADO):
+            if not self._state.adding:
+                self.version = F('version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = version
+            raise
+        if self.version is not version:
+            self.refresh_from_db(fields=['version'])
+
+    def _do_update(self, base_qs, using, pk_val, *args, **kwargs):
+        esperada = self.__dict__.pop('_version_esperada', None)
+        if esperada is None:
+            return super()._do_update(base_qs, using, pk_val, *args, **kwargs)
+        if super()._do_update(base_qs.filter(version=esperada), using, pk_val, *args, **kwargs):
+            return True
+        actual = base_qs.filter(pk=pk_val).values_list('version', flat=True).first()
+        if actual is None:
+            # La fila ya no existe: save() sigue como siempre
+            return False
+        raise ConflictoVersion(actual, {})
+
+
+class FormularioVersionadoMixin:
+    """
+    Para los ModelForm de modelos con VersionadoMixin. Añade el campo oculto
+    `version` con la versión con la que se abrió el formulario; al guardar, si
+    otra pestaña, usuario o autoguardado guardó después, save() lanza
+    ConflictoVersion en lugar de sobrescribir sus cambios.
+
+    Los formularios que no envían `version` (p. ej. la subida AJAX del banner)
+    guardan sin comprobarla.
+    """
+    MENSAJE_CONFLICTO = (
+        "Otra sesión modificó este contenido mientras lo editabas. "
+        "Recarga la página para ver sus cambios o vuelve a guardar para sobrescribirlos."
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['version'] = forms.IntegerField(widget=forms.HiddenInput, required=False, min_value=1)
+        if not self.instance._state.adding:
+            self.fields['version'].initial = self.instance.version
+
+    def save(self, commit=True):
+        version = self.cleaned_data.get('version')
+        if version is not None and not self.instance._state.adding:
+            self.instance._version_esperada = version
+        return super().save(commit)
+
+    def conflicto_version(self, conflicto):
+        """Marca el error y pasa a la versión actual: un segundo envío sobrescribe."""
+        self.add_error(None, self.MENSAJE_CONFLICTO)
+        self.data = self.data.copy()
+        self.data[self.add_prefix('version')] = conflicto.version
+
+
+class EdicionVersionadaMixin:
+    """Para las UpdateView con un FormularioVersionadoMixin: el conflicto se muestra en el formulario."""
+
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except ConflictoVersion as conflicto:
+            form.conflicto_version(conflicto)
+            return self.form_invalid(form)
+
+
+class Autoguardable:
+    """
+    Configuración del autoguardado de un modelo, al estilo de un ModelAdmin.
+
+    - `campos`: lista blanca (por defecto, CAMPOS_AUTOGUARDADO del modelo).
+    - `limpiar_<campo>(obj, valor)`: normalización propia de un campo; si no
+      existe se usa field.clean() del modelo. Lanza ValidationError si el valor
+      no es válido.
+    - `tiene_permiso(user, obj)`: obligatorio.
+    - `valores_extra(obj, cambios)`: expresiones adicionales para el UPDATE.
+    - `despues_de_guardar(obj, cambios)`: efectos secundarios (índices, cachés...).
+    """
+    modelo = None
+    campos = None
+
+    def __init__(self):
+        if self.campos is None:
+            self.campos = list(self.modelo.CAMPOS_AUTOGUARDADO)
+
+    def tiene_permiso(self, user, obj):
+        raise NotImplementedError
+
+    def valores_extra(self, obj, cambios):
+        return {}
+
+    def despues_de_guardar(self, obj, cambios):
+        pass
+
+    def limpiar(self, obj, nombre, valor):
+        limpiador = getattr(self, f'limpiar_{nombre}', None)
+        if limpiador is not None:
+            return limpiador(obj, valor)
+        campo = self.modelo._meta.get_field(nombre)
+        if campo.many_to_many:
+            return [campo.related_model._meta.pk.to_python(pk) for pk in (valor or [])]
+        if valor in (None, '') and campo.null:
+            valor = None
+        return campo.clean(valor, obj)
+
+    def aplicar_relacion(self, obj, nombre, valor):
+        getattr(obj, nombre).set(valor)
+
+
+class ConflictoVersion(Exception):
+    def __init__(self, version, valores):
+        super().__init__("El objeto fue modificado por otro guardado.")
+        self.version = version
+        self.valores = valores
+
+
+_registro = {}
+
+
+def registrar(tipo, configuracion):
+    """Registra la clase Autoguardable `configuracion` bajo el nombre `tipo` de la URL."""
+    _registro[tipo] = configuracion()
+
+
+def obtener(tipo):
+    return _registro.get(tipo)
+
+
+def autoguardar(configuracion, obj, version, campos):
+    """
+    Valida y guarda `campos` sobre `obj`. Devuelve la nueva versión.
+    Lanza ValidationError (con un diccionario campo -> mensajes) o ConflictoVersion.
+    """
+    desconocidos = sorted(set(campos) - set(configuracion.campos))
+    if desconocidos:
+        raise ValidationError({nombre: "Campo no permitido." for nombre in desconocidos})
+
+    columnas, relaciones, errores = {}, {}, {}
+    for nombre, valor in campos.items():
+        try:
+            limpio = configuracion.limpiar(obj, nombre, valor)
+        except ValidationError as e:
+            errores[nombre] = e.messages
+            continue
+        campo = configuracion.modelo._meta.get_field(nombre)
+        if campo.many_to_many:
+            relaciones[nombre] = limpio
+        else:
+            columnas[campo.attname] = limpio
+    if errores:
+        raise ValidationError(errores)
+
+    modelo = configuracion.modelo
+    # El UPDATE no pasa por save(): las versiones precalculadas del HTML van aparte
+    derivados = {}
+    for nombre in getattr(modelo, 'CAMPOS_TEXTO_ENRIQUECIDO', []):
+        if nombre in columnas:
+            derivados.update(valores_texto_enriquecido(nombre, columnas[nombre]))
+    with transaction.atomic():
+        actualizados = modelo._default_manager.filter(pk=obj.pk, version=version).update(
+            **columnas, **derivados, **configuracion.valores_extra(obj, list(campos)), version=F('version') + 1,
+        )
+        if not actualizados:
+            actual = modelo._default_manager.filter(pk=obj.pk).values('version', *columnas).first() or {}
+            raise ConflictoVersion(actual.pop('version', None), actual)
+        for nombre, valor in relaciones.items():
+            configuracion.aplicar_relacion(obj, nombre, valor)
+        configuracion.despues_de_guardar(obj, list(campos))
+    return version + 1
@@ -0,0 +1,209 @@
+"""
+Paginación por cursor (keyset) para listados largos.
+
+En lugar de OFFSET + COUNT(*), cada página se pide con un filtro sobre las
+columnas de ordenación del último elemento visto:
+
+    WHERE (date, pk) < (:date, :pk) ORDER BY date DESC, pk DESC LIMIT n + 1
+
+así que el coste no crece con el número de página y no hace falta contar el
+listado completo. El cursor viaja en la URL (?cursor=...) como un token firmado
+y opaco. Si hace falta un total aproximado se toma de las estadísticas del
+planificador de PostgreSQL (EXPLAIN), sin recorrer la tabla.
+
+Las páginas ofrecen la misma interfaz que usan las plantillas con Page
+(iteración, has_next, has_previous, has_other_pages...) y partials/pagination.html
+muestra para ellas la variante "Cargar más".
+"""
+import datetime
+import decimal
+import json
+import logging
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+SALT_CURSOR = 'imago.paginacion.cursor'
+
+
+def estimar_total(queryset):
+    """
+    Número de filas que el planificador de PostgreSQL estima para `queryset`.
+    Devuelve None en otros motores o si no se puede obtener.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"No se pudo estimar el total del listado: {e}")
+        return None
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, cursor_siguiente, cursor_anterior):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = cursor_siguiente
+        self.previous_cursor = cursor_anterior
+        self.es_cursor = True
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def __repr__(self):
+        return f'<CursorPage de {len(self.object_list)} elemento(s)>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Pagina `queryset` por las columnas de `ordering` (p. ej. ('-date', '-pk')).
+    La última columna debe ser única (normalmente la pk) para que el orden sea total.
+    """
+    def __init__(self, queryset, per_page, ordering, estimar=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = [
+            (campo.lstrip('-'), campo.startswith('-')) for campo in ordering
+        ]
+        self.estimar = estimar
+
+    @cached_property
+    def count(self):
+        """Total exacto. Solo se calcula si la plantilla lo usa."""
+        return self.queryset.count()
+
+    @cached_property
+    def total_estimado(self):
+        """Total aproximado según el planificador (None si no está activado o disponible)."""
+        return estimar_total(self.queryset) if self.estimar else None
+
+    def codificar(self, objeto, direccion):
+        valores = [getattr(objeto, campo) for campo, _ in self.ordering]
+        return signing.dumps([direccion, valores], salt=SALT_CURSOR, serializer=_SerializadorCursor, compress=True)
+
+    def decodificar(self, cursor):
+        """(dirección, valores) del token, o None si falta o no es válido."""
+        if not cursor:
+            return None
+        try:
+            direccion, valores = signing.loads(cursor, salt=SALT_CURSOR, serializer=_SerializadorCursor)
+            if direccion not in ('siguiente', 'anterior') or len(valores) != len(self.ordering):
+                return None
+            modelo = self.queryset.model
+            convertidos = []
+            for (campo, _), valor in zip(self.ordering, valores):
+                try:
+                    field = modelo._meta.get_field(campo)
+                except FieldDoesNotExist:
+                    # Anotaciones (p. ej. el rank de la búsqueda): el valor ya es numérico
+                    convertidos.append(valor)
+                else:
+                    convertidos.append(field.to_python(valor))
+            return direccion, convertidos
+        except (signing.BadSignature, ValidationError, ValueError, TypeError):
+            return None
+
+    def filtro(self, valores, hacia_atras=False):
+        """Q que selecciona las filas posteriores (o anteriores) a `valores` en el orden del paginador."""
+        # (a, b) < (x, y)  ==  a < x OR (a = x AND b < y), respetando el sentido de cada columna
+        condiciones = Q()
+        for i, (campo, descendente) in enumerate(self.ordering):
+            operador = 'lt' if descendente != hacia_atras else 'gt'
+            condicion = Q(**{f'{campo}__{operador}': valores[i]})
+            for j in range(i):
+                condicion &= Q(**{self.ordering[j][0]: valores[j]})
+            condiciones |= condicion
+        return condiciones
+
+    def _orden(self, invertido=False):
+        return [
+            f'{"-" if descendente != invertido else ""}{campo}'
+            for campo, descendente in self.ordering
+        ]
+
+    def get_page(self, cursor=None):
+        decodificado = self.decodificar(cursor)
+        queryset = self.queryset
+
+        if decodificado and decodificado[0] == 'anterior':
+            # Se recorre en orden inverso desde el cursor y luego se da la vuelta
+            filas = list(
+                queryset.filter(self.filtro(decodificado[1], hacia_atras=True))
+                .order_by(*self._orden(invertido=True))[:self.per_page + 1]
+            )
+            hay_mas_atras = len(filas) > self.per_page
+            filas = filas[:self.per_page]
+            filas.reverse()
+            siguiente = self.codificar(filas[-1], 'siguiente') if filas else None
+            anterior = self.codificar(filas[0], 'anterior') if filas and hay_mas_atras else None
+            return CursorPage(filas, self, siguiente, anterior)
+
+        if decodificado:
+            queryset = queryset.filter(self.filtro(decodificado[1]))
+        filas = list(queryset.order_by(*self._orden())[:self.per_page + 1])
+        hay_mas = len(filas) > self.per_page
+        filas = filas[:self.per_page]
+        siguiente = self.codificar(filas[-1], 'siguiente') if filas and hay_mas else None
+        anterior = self.codificar(filas[0], 'anterior') if filas and decodificado else None
+        return CursorPage(filas, self, siguiente, anterior)
+
+
+def _valor_json(valor):
+    # isoformat() conserva los microsegundos (DjangoJSONEncoder los recorta a
+    # milisegundos y el cursor dejaría de coincidir con la fila)
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    raise TypeError(f"Valor no serializable en el cursor: {valor!r}")
+
+
+class _SerializadorCursor:
+    """Serializador JSON para signing que admite fechas y decimales."""
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), default=_valor_json).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
+
+
+class CursorPaginationMixin:
+    """
+    Para ListView: sustituye la paginación por páginas numeradas por la de
+    cursor. La vista define `cursor_ordering` y, opcionalmente, `estimar_total`.
+    """
+    cursor_kwarg = 'cursor'
+    cursor_ordering = ('-pk',)
+    estimar_total = False
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(
+            queryset, page_size, self.get_cursor_ordering(), estimar=self.estimar_total,
+        )
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
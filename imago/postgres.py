@@ -0,0 +1,127 @@
+"""
+Utilidades para funciones exclusivas de PostgreSQL (índices GIN, búsqueda de
+texto completo...). El proyecto corre sobre PostgreSQL, pero las migraciones
+deben poder aplicarse también en una BD SQLite de pruebas.
+
+Algunas extensiones (pg_trgm) pueden no estar disponibles en todos los
+servidores: las operaciones que dependen de ellas se omiten con un aviso y el
+código recurre a una alternativa comprobando `extension_instalada()`.
+"""
+import html
+import logging
+import re
+from functools import lru_cache
+
+from django.contrib.postgres.operations import CreateExtension
+from django.contrib.postgres.search import SearchHeadline
+from django.db import connections, migrations
+from django.db.models import Func, TextField
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+logger = logging.getLogger(__name__)
+
+
+def es_postgresql(schema_editor):
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+class TextoPlano(Func):
+    """Quita las etiquetas HTML de un campo de CKEditor."""
+    function = 'REGEXP_REPLACE'
+    output_field = TextField()
+    template = "%(function)s(%(expressions)s, '<[^>]+>', ' ', 'g')"
+
+
+# Delimitadores de las coincidencias en los fragmentos: caracteres de uso
+# privado, para poder escapar el fragmento entero y convertir solo ellos en <mark>
+INICIO_RESALTADO = '\ue000'
+FIN_RESALTADO = '\ue001'
+_RESALTADO = re.compile(f'{INICIO_RESALTADO}([^{INICIO_RESALTADO}{FIN_RESALTADO}]*){FIN_RESALTADO}')
+
+
+class Fragmento(SearchHeadline):
+    """
+    ts_headline con las coincidencias entre INICIO_RESALTADO y FIN_RESALTADO.
+    El texto sale del contenido del usuario tal cual (TextoPlano no garantiza
+    que no quede marcado): se pinta con resaltar(), nunca con |safe.
+    """
+
+    def __init__(self, expression, query, **extra):
+        super().__init__(expression, query, start_sel=INICIO_RESALTADO, stop_sel=FIN_RESALTADO, **extra)
+
+
+def resaltar(fragmento):
+    """HTML de un Fragmento: todo el texto escapado y las coincidencias en <mark>."""
+    texto = escape(html.unescape(fragmento or ''))
+    texto = _RESALTADO.sub(r'<mark>\1</mark>', texto)
+    return mark_safe(texto.replace(INICIO_RESALTADO, '').replace(FIN_RESALTADO, ''))
+
+
+# Catálogo -> columna con el nombre de la extensión
+_CATALOGOS_EXTENSIONES = {
+    'pg_extension': 'extname',  # instaladas en la BD
+    'pg_available_extensions': 'name',  # disponibles en el servidor
+}
+
+
+def _extension_en(connection, nombre, catalogo):
+    columna = _CATALOGOS_EXTENSIONES[catalogo]
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {catalogo} WHERE {columna} = %s', [nombre])
+        return cursor.fetchone() is not None
+
+
+@lru_cache(maxsize=None)
+def extension_instalada(nombre, using='default'):
+    """Indica si la extensión `nombre` está instalada en la BD (se consulta una vez por proceso)."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    return _extension_en(connection, nombre, 'pg_extension')
+
+
+class CrearExtensionSiDisponible(CreateExtension):
+    """CreateExtension que no falla si el servidor no ofrece la extensión."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if es_postgresql(schema_editor) and not _extension_en(
+            schema_editor.connection, self.name, 'pg_available_extensions'
+        ):
+            logger.warning(f"La extensión {self.name} no está disponible; se omite.")
+            return
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+class AddIndexSoloPostgres(migrations.AddIndex):
+    """
+    AddIndex que solo crea el índice en PostgreSQL (y, si se indica
+    `extension`, solo si esa extensión está instalada). El estado del modelo se
+    actualiza siempre, así que makemigrations no detecta diferencias.
+    """
+
+    def __init__(self, model_name, index, extension=None):
+        super().__init__(model_name, index)
+        self.extension = extension
+
+    def deconstruct(self):
+        nombre, args, kwargs = super().deconstruct()
+        if self.extension:
+            kwargs['extension'] = self.extension
+        return nombre, args, kwargs
+
+    def _aplicable(self, schema_editor):
+        if not es_postgresql(schema_editor):
+            return False
+        if self.extension and not _extension_en(schema_editor.connection, self.extension, 'pg_extension'):
+            logger.warning(f"Sin la extensión {self.extension} no se crea el índice {self.index.name}.")
+            return False
+        return True
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self._aplicable(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self._aplicable(schema_editor):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
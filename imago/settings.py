@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'posts',
     'users.apps.UsersConfig',
     'comunicaciones.apps.ComunicacionesConfig',
@@ -160,6 +161,24 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# ====================
+# CACHÉ
+# ====================
+# Tiene que ser compartida por todos los workers de gunicorn e instancias de
+# Cloud Run: guarda invalidaciones (metadatos del storage, generación de las
+# facetas), la deduplicación de visitas y el estado de django-select2. Una
+# LocMemCache solo las vería el proceso que las escribe. Se usa la propia BD
+# (la tabla la crea la migración home 0003, o `manage.py createcachetable`).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'imago_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 50000)),
+        },
+    },
+}
+
 # Internationalization
 LANGUAGE_CODE = 'es-la'
 TIME_ZONE = 'America/Bogota'
@@ -175,6 +194,14 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 GS_BUCKET_NAME = os.getenv('GS_BUCKET_NAME')
 
+# Caché de metadatos (exists/size/url) del storage de media (imago.storage)
+STORAGE_METADATA_CACHE = {
+    "cache_alias": "default",
+    "timeout": int(os.getenv('STORAGE_METADATA_CACHE_TIMEOUT', 3600)),
+    "local_timeout": 60,
+    "max_entries": 1024,
+}
+
 print("="*60)
 print("CONFIGURACIÓN DE STORAGE")
 print("="*60)
@@ -186,7 +213,11 @@ if GS_BUCKET_NAME:
     # SOLO para archivos media usar Google Cloud Storage
     STORAGES = {
         "default": {
-            "BACKEND": "storages.backends.gcloud.GoogleCloudStorage",
+            "BACKEND": "imago.storage.CachedMetadataStorage",
+            "OPTIONS": {
+                "backend": "storages.backends.gcloud.GoogleCloudStorage",
+                **STORAGE_METADATA_CACHE,
+            },
         },
         "staticfiles": {
             "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -210,7 +241,11 @@ else:
     
     STORAGES = {
         "default": {
-            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "BACKEND": "imago.storage.CachedMetadataStorage",
+            "OPTIONS": {
+                "backend": "django.core.files.storage.FileSystemStorage",
+                **STORAGE_METADATA_CACHE,
+            },
         },
         "staticfiles": {
             "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -220,6 +255,15 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# ENTREGA DE ADJUNTOS EN ALMACENAMIENTO LOCAL (lecturas.descargas)
+# 'stream': Django envía el archivo por bloques, con soporte de Range y caché.
+# 'x-accel-redirect' (nginx) / 'x-sendfile' (Apache, lighttpd): el proxy hace la transferencia.
+ATTACHMENT_DELIVERY = os.getenv('ATTACHMENT_DELIVERY', 'stream')
+# Location interna de nginx que apunta a MEDIA_ROOT (solo para x-accel-redirect)
+ATTACHMENT_ACCEL_PREFIX = os.getenv('ATTACHMENT_ACCEL_PREFIX', '/protected-media/')
+# max-age para URLs sin versión; las URLs con ?v=<versión> se cachean un año
+ATTACHMENT_CACHE_MAX_AGE = int(os.getenv('ATTACHMENT_CACHE_MAX_AGE', 86400))
+
 # CONFIGURACIÓN DE STATIC FILES (SIEMPRE REQUERIDA)
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
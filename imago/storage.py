@@ -0,0 +1,199 @@
+"""
+Storage con caché de metadatos.
+
+Envuelve al backend real (GoogleCloudStorage, FileSystemStorage...) y guarda
+exists/size/url de cada nombre en un LRU acotado en memoria del proceso y en la
+caché compartida de Django, para no repetir llamadas de red en cada vista o
+plantilla. Las entradas se invalidan al guardar o borrar a través del storage.
+
+`cache_alias` tiene que apuntar a una caché compartida entre procesos (la
+DatabaseCache de settings.CACHES): con una LocMemCache la invalidación solo
+llegaría al proceso que guarda o borra. Aun así, el LRU de cada proceso puede
+servir metadatos desfasados durante `local_timeout` segundos.
+
+Se configura en settings.STORAGES:
+
+    "default": {
+        "BACKEND": "imago.storage.CachedMetadataStorage",
+        "OPTIONS": {
+            "backend": "storages.backends.gcloud.GoogleCloudStorage",
+            "options": {},              # kwargs para el backend real
+            "cache_alias": "default",   # caché compartida entre procesos
+            "timeout": 3600,            # segundos en la caché compartida
+            "local_timeout": 60,        # segundos en el LRU del proceso
+            "max_entries": 1024,        # tamaño máximo del LRU
+        },
+    }
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Marca para distinguir "no está en caché" de un valor guardado (p. ej. False)
+_AUSENTE = object()
+
+
+class LRUMetadatos:
+    """LRU acotado y seguro entre hilos de {nombre: (caduca_en, metadatos)}."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, nombre):
+        with self._lock:
+            entrada = self._datos.get(nombre)
+            if entrada is None:
+                return None
+            caduca_en, metadatos = entrada
+            if caduca_en < time.monotonic():
+                del self._datos[nombre]
+                return None
+            self._datos.move_to_end(nombre)
+            return metadatos
+
+    def set(self, nombre, metadatos):
+        with self._lock:
+            self._datos[nombre] = (time.monotonic() + self.timeout, metadatos)
+            self._datos.move_to_end(nombre)
+            while len(self._datos) > self.max_entries:
+                self._datos.popitem(last=False)
+
+    def delete(self, nombre):
+        with self._lock:
+            self._datos.pop(nombre, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+@deconstructible(path='imago.storage.CachedMetadataStorage')
+class CachedMetadataStorage(Storage):
+    """Delegador hacia el backend real con caché de exists/size/url."""
+
+    PREFIJO_CACHE = 'storage-meta'
+
+    def __init__(self, backend='django.core.files.storage.FileSystemStorage', options=None,
+                 cache_alias='default', timeout=3600, local_timeout=60, max_entries=1024):
+        self.backend = import_string(backend)(**(options or {}))
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.local = LRUMetadatos(max_entries, local_timeout)
+
+    def __getattr__(self, atributo):
+        # Atributos propios del backend (bucket, location, base_url...)
+        if atributo == 'backend':
+            raise AttributeError(atributo)
+        return getattr(self.backend, atributo)
+
+    # --- Caché ---
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _clave(self, nombre):
+        huella = hashlib.md5(nombre.encode()).hexdigest()
+        return f'{self.PREFIJO_CACHE}:{type(self.backend).__name__}:{huella}'
+
+    def _metadatos(self, nombre):
+        metadatos = self.local.get(nombre)
+        if metadatos is None:
+            try:
+                metadatos = self.cache.get(self._clave(nombre))
+            except Exception as e:
+                logger.warning(f"No se pudo leer la caché de metadatos de '{nombre}': {e}")
+                metadatos = None
+            metadatos = dict(metadatos or {})
+            self.local.set(nombre, metadatos)
+        return metadatos
+
+    def _obtener(self, nombre, campo, calcular):
+        metadatos = self._metadatos(nombre)
+        valor = metadatos.get(campo, _AUSENTE)
+        if valor is not _AUSENTE:
+            return valor
+        valor = calcular()
+        metadatos = dict(metadatos, **{campo: valor})
+        self.local.set(nombre, metadatos)
+        try:
+            self.cache.set(self._clave(nombre), metadatos, self.timeout)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché de metadatos de '{nombre}': {e}")
+        return valor
+
+    def invalidar(self, nombre):
+        """Olvida los metadatos guardados de `nombre` en ambos niveles."""
+        self.local.delete(nombre)
+        try:
+            self.cache.delete(self._clave(nombre))
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché de metadatos de '{nombre}': {e}")
+
+    # --- Operaciones con caché ---
+
+    def exists(self, name):
+        return self._obtener(name, 'exists', lambda: self.backend.exists(name))
+
+    def size(self, name):
+        return self._obtener(name, 'size', lambda: self.backend.size(name))
+
+    def url(self, name):
+        # Las URLs firmadas caducan: solo se cachean las URLs públicas
+        if getattr(self.backend, 'querystring_auth', False):
+            return self.backend.url(name)
+        return self._obtener(name, 'url', lambda: self.backend.url(name))
+
+    def save(self, name, content, max_length=None):
+        nombre = self.backend.save(name, content, max_length=max_length)
+        self.invalidar(nombre)
+        return nombre
+
+    def delete(self, name):
+        self.backend.delete(name)
+        self.invalidar(name)
+
+    # --- Delegación directa ---
+
+    def open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def get_available_name(self, name, max_length=None):
+        # Sin caché: un exists() desfasado podría sobrescribir otro archivo
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def get_alternative_name(self, file_root, file_ext):
+        return self.backend.get_alternative_name(file_root, file_ext)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
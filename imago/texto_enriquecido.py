@@ -0,0 +1,174 @@
+"""
+Versiones precalculadas del HTML de CKEditor.
+
+Los campos de texto enriquecido (contenido de temas, respuestas y comentarios,
+descripción de los documentos, bloques de texto de las publicaciones) se
+guardan tal cual los envía el editor. Al guardar, TextoEnriquecidoMixin
+rellena además tres columnas hermanas de cada campo de
+CAMPOS_TEXTO_ENRIQUECIDO:
+
+- `<campo>_html`: el HTML saneado con una lista blanca (nh3), que es lo que
+  pintan las plantillas;
+- `<campo>_extracto`: el principio del texto plano, para tarjetas y listados;
+- `<campo>_palabras`: el número de palabras.
+
+Así el saneado y el recorte se hacen una vez por escritura y no en cada
+render. El autoguardado (imago/autoguardado.py) y la importación, que escriben
+sin pasar por save(), llaman a `valores_texto_enriquecido()` o a
+`renderizar_texto_enriquecido()`. Las filas anteriores se rellenan con
+`manage.py renderizar_texto_enriquecido`.
+"""
+import html
+import re
+
+import nh3
+from django.db import models
+
+LONGITUD_EXTRACTO = 300
+
+# Lo que puede producir CKEditor 5 con las barras de herramientas de
+# CKEDITOR_5_CONFIGS (formato, fuentes, alineación, enlaces, listas, citas,
+# imágenes, tablas y medios incrustados)
+ETIQUETAS_PERMITIDAS = {
+    'p', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'code', 'hr',
+    'strong', 'b', 'em', 'i', 'u', 's', 'del', 'sub', 'sup', 'span', 'mark',
+    'a', 'ul', 'ol', 'li',
+    'figure', 'figcaption', 'img', 'oembed',
+    'table', 'colgroup', 'col', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption',
+}
+ATRIBUTOS_PERMITIDOS = {
+    '*': {'style'},
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'width', 'height', 'srcset', 'sizes', 'loading'},
+    'figure': {'class'},
+    'span': {'class'},
+    'oembed': {'url'},
+    'ol': {'start', 'reversed'},
+    'col': {'span'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'td': {'colspan', 'rowspan'},
+}
+ESTILOS_PERMITIDOS = {
+    'color', 'background-color', 'font-family', 'font-size', 'text-align',
+    'width', 'height', 'float', 'border', 'border-color', 'border-style', 'border-width', 'padding',
+}
+ESQUEMAS_URL = {'http', 'https', 'mailto', 'tel'}
+
+_ETIQUETA = re.compile(r'<[^>]+>')
+_ESPACIOS = re.compile(r'\s+')
+
+
+def sanear(html_original):
+    """HTML de CKEditor reducido a la lista blanca (scripts, eventos y URLs javascript: fuera)."""
+    if not html_original:
+        return ''
+    return nh3.clean(
+        html_original,
+        tags=ETIQUETAS_PERMITIDAS,
+        attributes=ATRIBUTOS_PERMITIDOS,
+        url_schemes=ESQUEMAS_URL,
+        filter_style_properties=ESTILOS_PERMITIDOS,
+        link_rel='noopener noreferrer',
+    )
+
+
+def texto_plano(html_saneado):
+    """Texto sin etiquetas ni entidades, con los espacios normalizados."""
+    return _ESPACIOS.sub(' ', html.unescape(_ETIQUETA.sub(' ', html_saneado or ''))).strip()
+
+
+def extracto(texto, longitud=LONGITUD_EXTRACTO):
+    """Principio de `texto` cortado en un límite de palabra."""
+    if len(texto) <= longitud:
+        return texto
+    corte = texto[:longitud - 1]
+    if ' ' in corte:
+        corte = corte.rsplit(' ', 1)[0]
+    return corte.rstrip(' .,;:') + '…'
+
+
+def renderizar(html_original):
+    """(HTML saneado, extracto, número de palabras) de un campo de CKEditor."""
+    saneado = sanear(html_original)
+    texto = texto_plano(saneado)
+    return saneado, extracto(texto), len(texto.split())
+
+
+def campos_derivados(campo):
+    return [f'{campo}_html', f'{campo}_extracto', f'{campo}_palabras']
+
+
+def valores_texto_enriquecido(campo, html_original):
+    """Diccionario columna -> valor con las versiones precalculadas de `campo`."""
+    return dict(zip(campos_derivados(campo), renderizar(html_original)))
+
+
+def rellenar(modelo, campos, batch_size=500, dry_run=False):
+    """
+    Recalcula por lotes de `batch_size` (recorridos por pk) las columnas
+    precalculadas de `campos` y guarda con bulk_update solo las filas que
+    cambian. Devuelve cuántas estaban desactualizadas. Sirve también con los
+    modelos históricos de las migraciones.
+
+    bulk_update() no pasa por save(): tras cada lote se llama a
+    `texto_enriquecido_rellenado(pks)` del modelo, si lo tiene, para que
+    descarte sus cachés de render (los modelos históricos no lo tienen).
+    """
+    derivados = [nombre for campo in campos for nombre in campos_derivados(campo)]
+    rellenado = getattr(modelo, 'texto_enriquecido_rellenado', None)
+    queryset = modelo._default_manager.order_by('pk').only('pk', *campos, *derivados)
+    desactualizadas, ultimo = 0, None
+    while True:
+        lote = list((queryset if ultimo is None else queryset.filter(pk__gt=ultimo))[:batch_size])
+        if not lote:
+            return desactualizadas
+        cambiadas = []
+        for obj in lote:
+            valores = {}
+            for campo in campos:
+                valores.update(valores_texto_enriquecido(campo, getattr(obj, campo)))
+            if any(getattr(obj, nombre) != valor for nombre, valor in valores.items()):
+                for nombre, valor in valores.items():
+                    setattr(obj, nombre, valor)
+                cambiadas.append(obj)
+        desactualizadas += len(cambiadas)
+        if cambiadas and not dry_run:
+            modelo._default_manager.bulk_update(cambiadas, derivados)
+            if rellenado is not None:
+                rellenado([obj.pk for obj in cambiadas])
+        ultimo = lote[-1].pk
+
+
+class TextoEnriquecidoMixin(models.Model):
+    """
+    Recalcula las columnas `<campo>_html`, `_extracto` y `_palabras` de cada
+    campo de CAMPOS_TEXTO_ENRIQUECIDO en cada save() que lo incluya. El modelo
+    declara esas columnas (editable=False).
+    """
+    CAMPOS_TEXTO_ENRIQUECIDO = []
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def texto_enriquecido_rellenado(cls, pks):
+        """Lo llama rellenar() tras reescribir las columnas precalculadas de `pks`."""
+
+    def renderizar_texto_enriquecido(self, campos=None):
+        """Rellena en memoria las columnas precalculadas; devuelve sus nombres."""
+        actualizados = []
+        for campo in self.CAMPOS_TEXTO_ENRIQUECIDO if campos is None else campos:
+            for nombre, valor in valores_texto_enriquecido(campo, getattr(self, campo)).items():
+                setattr(self, nombre, valor)
+                actualizados.append(nombre)
+        return actualizados
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.renderizar_texto_enriquecido()
+        else:
+            campos = [campo for campo in self.CAMPOS_TEXTO_ENRIQUECIDO if campo in update_fields]
+            if campos:
+                kwargs['update_fields'] = {*update_fields, *self.renderizar_texto_enriquecido(campos)}
+        super().save(*args, **kwargs)
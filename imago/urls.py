@@ -26,6 +26,7 @@ from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home_view, name='home'),
+    path('autoguardado/<str:tipo>/<int:pk>/', views.autoguardar_view, name='autoguardar'),
     path('about/', include('comunicaciones.urls')),
     path('posts/', include('posts.urls')),
     path('users/', include('users.urls')),
@@ -1,8 +1,16 @@
-from django.shortcuts import render
-from django.db.models import Avg, Count
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.shortcuts import render, get_object_or_404
+from django.views.decorators.http import require_http_methods
+from django.db.models import ExpressionWrapper, F, FloatField
+from lecturas import visitas
 from lecturas.models import Documento
 from posts.models import Categoria
 from home.models import HomePageBlock, HeroConfiguration
+from . import autoguardado
 
 def home_view(request):
     try:
@@ -10,23 +18,69 @@ def home_view(request):
     except HeroConfiguration.DoesNotExist:
         hero_config = None
 
-    mejor_valoradas = Documento.objects.annotate(
-        avg_rating=Avg('calificaciones__puntuacion')
-    ).filter(
-        avg_rating__isnull=False
-    ).order_by('-avg_rating')[:8]
-    recientes = Documento.objects.order_by('-date')[:8]
-    foros_destacados = Categoria.objects.annotate(
-        num_temas=Count('temas')
-    ).order_by('-num_temas')[:4]
-    bloques_home = HomePageBlock.objects.filter(activo=True).order_by('orden')
+    # El promedio se calcula con los agregados almacenados en Documento, sin JOIN a calificaciones
+    mejor_valoradas = Documento.objects.filter(
+        total_calificaciones__gt=0
+    ).annotate(
+        avg_rating=ExpressionWrapper(
+            F('suma_calificaciones') * 1.0 / F('total_calificaciones'),
+            output_field=FloatField()
+        )
+    ).select_related('autor_principal', 'author').order_by('-avg_rating')[:8]
+    recientes = Documento.objects.select_related('autor_principal', 'author').order_by('-date')[:8]
+    # Contador almacenado en Categoria (posts/contadores.py), sin agregar los temas
+    foros_destacados = Categoria.objects.order_by('-num_temas', 'nombre')[:4]
+    bloques_home = list(HomePageBlock.objects.filter(activo=True).order_by('orden'))
+    # Ranking de los últimos 30 días a partir de los contadores diarios (cacheado)
+    mas_leidas = []
+    if any(bloque.tipo_bloque == HomePageBlock.BlockType.MAS_LEIDAS for bloque in bloques_home):
+        mas_leidas = visitas.mas_leidas()
 
     context = {
         'hero_config': hero_config,
         'mejor_valoradas': mejor_valoradas,
         'recientes': recientes,
         'foros_destacados': foros_destacados,
+        'mas_leidas': mas_leidas,
         'bloques_home': bloques_home,
     }
     
-    return render(request, 'home.html', context)
\ No newline at end of file
+    return render(request, 'home.html', context)
+
+@login_required
+@require_http_methods(['PATCH'])
+def autoguardar_view(request, tipo, pk):
+    """
+    Endpoint único de autoguardado (ver imago/autoguardado.py).
+    Respuestas: 200 con la nueva versión, 400 si algún campo no es válido o no
+    está permitido, 403 sin permiso y 409 si la versión enviada está desfasada.
+    """
+    configuracion = autoguardado.obtener(tipo)
+    if configuracion is None:
+        raise Http404("Tipo de autoguardado desconocido.")
+    obj = get_object_or_404(configuracion.modelo, pk=pk)
+    if not configuracion.tiene_permiso(request.user, obj):
+        return JsonResponse({'success': False, 'error': 'No tienes permiso para editar este contenido.'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        version = int(data['version'])
+        campos = data['campos']
+        if not isinstance(campos, dict) or not campos:
+            raise ValueError
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'error': 'Datos inválidos.'}, status=400)
+
+    try:
+        nueva_version = autoguardado.autoguardar(configuracion, obj, version, campos)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': 'Hay campos no válidos.', 'errores': e.message_dict}, status=400)
+    except autoguardado.ConflictoVersion as e:
+        return JsonResponse({
+            'success': False,
+            'error': 'Este contenido se modificó desde otra ventana. Recarga la página para ver los cambios.',
+            'version': e.version,
+            'valores': e.valores,
+        }, status=409)
+
+    return JsonResponse({'success': True, 'version': nueva_version, 'guardados': list(campos)})
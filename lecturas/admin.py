@@ -1,5 +1,14 @@
-from django.contrib import admin
-from .models import Documento, Genero, Autor
+import tempfile
+import zipfile
+
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import ImportarLecturasForm
+from .importacion import ErrorManifiesto, importar_lecturas, leer_manifiesto
+from .models import Documento, Genero, Autor, Calificacion, TextoAdjunto
 
 # Register your models here.
 @admin.register(Genero)
@@ -14,6 +23,78 @@ class AutorAdmin(admin.ModelAdmin):
 
 @admin.register(Documento)
 class DocumentoAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'idioma', 'grado', 'autor_principal', 'nivel_dificultad', 'author', 'date')
+    list_display = ('titulo', 'idioma', 'grado', 'autor_principal', 'nivel_dificultad', 'author', 'date', 'calificacion_promedio', 'total_calificaciones')
     list_filter = ('grado', 'idioma', 'nivel_dificultad', 'generos', 'autor_principal')
-    search_fields = ('titulo', 'descripcion', 'autor_principal__nombre')
\ No newline at end of file
+    search_fields = ('titulo', 'descripcion', 'autor_principal__nombre')
+    readonly_fields = Documento.CAMPOS_CALIFICACION
+    change_list_template = 'admin/lecturas/documento/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path(
+                'importar/',
+                self.admin_site.admin_view(self.importar_view),
+                name='lecturas_documento_importar',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def importar_view(self, request):
+        """Importación masiva desde un manifiesto y un ZIP (ver lecturas/importacion.py)."""
+        if not self.has_add_permission(request):
+            return redirect('admin:lecturas_documento_changelist')
+
+        form = ImportarLecturasForm(request.POST or None, request.FILES or None)
+        resumen, dry_run = None, False
+        if request.method == 'POST' and form.is_valid():
+            manifiesto = form.cleaned_data['manifiesto']
+            dry_run = form.cleaned_data['dry_run']
+            try:
+                filas = leer_manifiesto(manifiesto.name, manifiesto.read())
+                with tempfile.TemporaryDirectory(prefix='importacion-') as directorio:
+                    if form.cleaned_data['archivos']:
+                        with zipfile.ZipFile(form.cleaned_data['archivos']) as archivo_zip:
+                            archivo_zip.extractall(directorio)
+                    resumen = importar_lecturas(
+                        filas, directorio, request.user, dry_run=dry_run,
+                    )
+            except (ErrorManifiesto, zipfile.BadZipFile) as e:
+                form.add_error(None, str(e))
+            else:
+                if not dry_run and resumen['creados']:
+                    self.message_user(
+                        request, f"Se importaron {resumen['creados']} lectura(s).", messages.SUCCESS,
+                    )
+                    if not resumen['errores']:
+                        return redirect('admin:lecturas_documento_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar lecturas',
+            'form': form,
+            'resumen': resumen,
+            'dry_run': dry_run,
+        }
+        return TemplateResponse(request, 'admin/lecturas/documento/importar.html', context)
+
+@admin.register(Calificacion)
+class CalificacionAdmin(admin.ModelAdmin):
+    """
+    Las ediciones y borrados desde aquí pasan por las señales de Calificacion,
+    que mantienen actualizados los agregados del documento.
+    """
+    list_display = ('documento', 'usuario', 'puntuacion', 'fecha_creacion')
+    list_filter = ('puntuacion',)
+    search_fields = ('documento__titulo', 'usuario__username')
+    raw_id_fields = ('documento', 'usuario')
+
+
+@admin.register(TextoAdjunto)
+class TextoAdjuntoAdmin(admin.ModelAdmin):
+    """Solo consulta: el contenido lo genera lecturas/extraccion.py."""
+    list_display = ('documento', 'origen', 'estado', 'num_paginas', 'fecha_extraccion')
+    list_filter = ('estado',)
+    search_fields = ('documento__titulo', 'origen')
+    exclude = ('paginas',)
+    readonly_fields = ('documento', 'origen', 'estado', 'num_paginas', 'error', 'texto', 'fecha_extraccion')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LecturasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lecturas'
+
+    def ready(self):
+        import lecturas.signals
+        import lecturas.autoguardado
@@ -0,0 +1,84 @@
+"""
+Autocompletado de autores y géneros para los selectores del formulario de
+lecturas (Select2), en lugar de enviar las tablas completas a la página.
+
+La búsqueda se hace sobre `nombre_normalizado` (minúsculas y sin tildes), de
+modo que "garcia" encuentra "García":
+
+- coincidencias por prefijo, con un índice B-tree varchar_pattern_ops;
+- subcadenas y parecidos (erratas) con trigramas de pg_trgm y su índice GIN,
+  si la extensión está instalada; si no, basta con un icontains. El parecido
+  se filtra con el operador `%` (umbral pg_trgm.similarity_threshold, 0.3 por
+  defecto), que sí puede usar el índice, y TrigramSimilarity solo ordena.
+
+Los resultados se ordenan por prefijo, parecido y longitud, y la respuesta
+JSON se cachea brevemente. Cualquier alta o cambio de un autor o género
+invalida la caché de su tipo (ver lecturas/signals.py).
+"""
+import hashlib
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+from imago.postgres import extension_instalada
+from .models import Autor, Genero, normalizar_nombre
+
+MODELOS = {
+    'autor': Autor,
+    'genero': Genero,
+}
+LIMITE_RESULTADOS = 10
+TIEMPO_CACHE = 60 * 10
+
+
+def buscar(tipo, termino, limite=LIMITE_RESULTADOS):
+    """Lista de (pk, nombre) de `tipo` ('autor' o 'genero') más parecidos a `termino`."""
+    modelo = MODELOS[tipo]
+    termino = normalizar_nombre(termino)
+    if not termino:
+        return []
+
+    queryset = modelo.objects.annotate(
+        prefijo=Case(
+            When(nombre_normalizado__startswith=termino, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+    coincide = Q(nombre_normalizado__startswith=termino) | Q(nombre_normalizado__contains=termino)
+    orden = ['-prefijo']
+    if extension_instalada('pg_trgm', queryset.db):
+        # `similarity() >= x` no usa el índice GIN y obligaría a recorrer la
+        # tabla entera; con `%` el planificador combina ambos índices
+        queryset = queryset.annotate(similitud=TrigramSimilarity('nombre_normalizado', termino))
+        coincide |= Q(nombre_normalizado__trigram_similar=termino)
+        orden.append('-similitud')
+    orden += [Length('nombre_normalizado').asc(), 'nombre']
+    return list(queryset.filter(coincide).order_by(*orden).values_list('pk', 'nombre')[:limite])
+
+
+def _clave_generacion(tipo):
+    return f'lecturas:autocompletado:{tipo}:generacion'
+
+
+def resultados(tipo, termino, limite=LIMITE_RESULTADOS):
+    """Respuesta en el formato de Select2 ({'results': [...], 'more': False}), cacheada."""
+    generacion = cache.get_or_set(_clave_generacion(tipo), 1, None)
+    resumen = hashlib.md5(normalizar_nombre(termino).encode('utf-8')).hexdigest()
+    clave = f'lecturas:autocompletado:{tipo}:{generacion}:{limite}:{resumen}'
+    datos = cache.get(clave)
+    if datos is None:
+        datos = {
+            'results': [{'id': pk, 'text': nombre} for pk, nombre in buscar(tipo, termino, limite)],
+            'more': False,
+        }
+        cache.set(clave, datos, TIEMPO_CACHE)
+    return datos
+
+
+def invalidar(tipo):
+    """Descarta las respuestas cacheadas de `tipo` cambiando su número de generación."""
+    clave = _clave_generacion(tipo)
+    cache.set(clave, cache.get_or_set(clave, 1, None) + 1, None)
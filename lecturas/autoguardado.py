@@ -0,0 +1,59 @@
+from django.core.exceptions import ValidationError
+from django.db.models import F
+
+from imago.autoguardado import Autoguardable, registrar
+from .busqueda import actualizar_vector_busqueda
+from . import facetas
+from .models import Documento, Autor, Genero
+
+
+class DocumentoAutoguardable(Autoguardable):
+    modelo = Documento
+
+    def tiene_permiso(self, user, documento):
+        # Mismo criterio que UserIsAuthorMixin en DocumentoUpdateView
+        return (
+            documento.author_id == user.pk
+            or user.is_superuser
+            or user.groups.filter(name='Administrativo').exists()
+        )
+
+    def limpiar_autor_principal(self, documento, valor):
+        # Select2 con etiquetas: un valor no numérico es un autor nuevo
+        if not valor:
+            return None
+        if isinstance(valor, str) and not valor.isdigit():
+            return Autor.objects.get_or_create(nombre=valor.strip())[0].pk
+        if not Autor.objects.filter(pk=valor).exists():
+            raise ValidationError("El autor seleccionado no existe.")
+        return int(valor)
+
+    def limpiar_generos(self, documento, valor):
+        if not isinstance(valor, list):
+            raise ValidationError("Se esperaba una lista de géneros.")
+        pks = []
+        for item in valor:
+            if item and isinstance(item, str) and not item.isdigit():
+                pks.append(Genero.objects.get_or_create(nombre=item.strip())[0].pk)
+            elif item:
+                pks.append(int(item))
+        return pks
+
+    def valores_extra(self, documento, cambios):
+        # Equivalente a lo que hace Documento.save() con el contenido renderizado
+        if set(cambios) & set(Documento.CAMPOS_CONTENIDO):
+            return {'version_contenido': F('version_contenido') + 1}
+        return {}
+
+    def despues_de_guardar(self, documento, cambios):
+        # El UPDATE no dispara post_save: los géneros ya reindexan con m2m_changed
+        if set(cambios) & set(Documento.CAMPOS_BUSQUEDA):
+            actualizar_vector_busqueda([documento.pk])
+        if set(cambios) & set(facetas.CAMPOS_FACETA):
+            # `documento` conserva las columnas anteriores al UPDATE (los
+            # cambios de géneros ya llegan por m2m_changed)
+            anterior = facetas.celda_desde(documento)
+            facetas.ajustar([(anterior, facetas.celda_documento(documento.pk)[:3] + anterior[3:])])
+
+
+registrar('documento', DocumentoAutoguardable)
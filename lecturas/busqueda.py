@@ -0,0 +1,143 @@
+"""
+Búsqueda de texto completo del catálogo de lecturas.
+
+En PostgreSQL cada Documento guarda un `search_vector` (tsvector) con pesos
+título (A) > autor (B) > géneros (C) > descripción y texto del adjunto (D),
+usando la configuración 'spanish' o 'english' según su idioma. En otros motores
+(p. ej. SQLite en las pruebas) se recurre a la búsqueda con icontains de siempre.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce, Left
+
+from imago.postgres import Fragmento, TextoPlano
+
+CONFIGURACIONES_IDIOMA = {
+    'es': 'spanish',
+    'en': 'english',
+}
+CONFIGURACION_POR_DEFECTO = 'spanish'
+# Caracteres del texto extraído del adjunto que entran en el índice
+# (un tsvector no puede superar 1 MB)
+LIMITE_TEXTO_ADJUNTO = 200000
+
+
+def busqueda_disponible(using='default'):
+    """Indica si la BD soporta la búsqueda de texto completo de PostgreSQL."""
+    return connections[using].vendor == 'postgresql'
+
+
+def configuracion_idioma():
+    """Expresión que elige la configuración de texto completo según `idioma`."""
+    return Case(
+        *[When(idioma=codigo, then=Value(config)) for codigo, config in CONFIGURACIONES_IDIOMA.items()],
+        default=Value(CONFIGURACION_POR_DEFECTO),
+    )
+
+
+def expresion_vector_busqueda(documento_model):
+    """
+    Construye el tsvector ponderado de un Documento sin JOINs en el UPDATE:
+    el autor y los géneros se obtienen con subconsultas correlacionadas.
+    Recibe el modelo para poder usarse también desde las migraciones.
+    """
+    autor_model = documento_model._meta.get_field('autor_principal').related_model
+    generos_field = documento_model._meta.get_field('generos')
+    genero_model = generos_field.related_model
+
+    config = configuracion_idioma()
+    autor = Subquery(
+        autor_model.objects.filter(pk=OuterRef('autor_principal_id')).values('nombre')[:1]
+    )
+    generos = Subquery(
+        genero_model.objects.filter(documentos=OuterRef('pk'))
+        .values('documentos')
+        .annotate(nombres=StringAgg('nombre', delimiter=' '))
+        .values('nombres')[:1]
+    )
+    fuentes = [
+        ('titulo', 'A'),
+        (autor, 'B'),
+        (generos, 'C'),
+        (TextoPlano('descripcion'), 'D'),
+    ]
+    try:
+        texto_adjunto_model = documento_model._meta.get_field('texto_adjunto').related_model
+    except FieldDoesNotExist:
+        # Modelo histórico de una migración anterior a TextoAdjunto
+        texto_adjunto_model = None
+    if texto_adjunto_model is not None:
+        texto_adjunto = Subquery(
+            texto_adjunto_model.objects.filter(documento=OuterRef('pk'), estado='listo')
+            .values(inicio=Left('texto', LIMITE_TEXTO_ADJUNTO))[:1]
+        )
+        fuentes.append((texto_adjunto, 'D'))
+    vector = None
+    for fuente, peso in fuentes:
+        parcial = SearchVector(
+            Coalesce(fuente, Value(''), output_field=TextField()), weight=peso, config=config
+        )
+        vector = parcial if vector is None else vector + parcial
+    return vector
+
+
+def actualizar_vector_busqueda(documento_ids=None, documento_model=None):
+    """
+    Recalcula el search_vector de los documentos indicados (o de todos si
+    documento_ids es None) con un único UPDATE. No hace nada fuera de PostgreSQL.
+    """
+    if documento_model is None:
+        from .models import Documento as documento_model
+    if not busqueda_disponible(documento_model.objects.db):
+        return 0
+    queryset = documento_model.objects.all()
+    if documento_ids is not None:
+        queryset = queryset.filter(pk__in=list(documento_ids))
+    return queryset.update(search_vector=expresion_vector_busqueda(documento_model))
+
+
+def buscar_documentos(queryset, texto):
+    """
+    Filtra y ordena `queryset` por relevancia para `texto`.
+
+    En PostgreSQL anota `rank` y `fragmento` (se pinta con el filtro
+    `resaltado`) y usa el índice GIN de search_vector. En otros motores
+    aplica el filtro icontains clásico.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return queryset
+
+    if not busqueda_disponible(queryset.db):
+        return queryset.filter(
+            Q(titulo__icontains=texto) |
+            Q(autor_principal__nombre__icontains=texto) |
+            Q(generos__nombre__icontains=texto)
+        ).distinct()
+
+    # Combinamos ambas configuraciones en un tsquery constante para que
+    # PostgreSQL pueda usar el índice GIN sobre search_vector.
+    query = None
+    for config in dict.fromkeys(CONFIGURACIONES_IDIOMA.values()):
+        parcial = SearchQuery(texto, config=config, search_type='websearch')
+        query = parcial if query is None else query | parcial
+
+    # El fragmento sale de la descripción saneada sin etiquetas y se escapa
+    # al pintarlo (filtro `resaltado`), que solo añade las marcas <mark>.
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(
+            # ts_rank devuelve real; como double precision el valor vuelve exacto
+            # desde la BD y sirve de clave en la paginación por cursor
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+            fragmento=Fragmento(
+                TextoPlano('descripcion_html'), query,
+                config=configuracion_idioma(),
+                max_words=30, min_words=15,
+            ),
+        )
+        .order_by('-rank', '-date')
+    )
@@ -0,0 +1,95 @@
+"""
+Escritura de calificaciones en una sola sentencia.
+
+`calificar()` guarda la puntuación de un usuario y ajusta los agregados
+desnormalizados del documento (suma, total e histograma de estrellas) con un
+único INSERT ... ON CONFLICT DO UPDATE encadenado al UPDATE del documento, que
+devuelve los agregados ya actualizados:
+
+    WITH anterior AS (SELECT puntuacion ...),
+         guardada AS (INSERT ... ON CONFLICT (documento_id, usuario_id) DO UPDATE ... RETURNING puntuacion)
+    UPDATE documento SET suma = suma + nueva - anterior, ... RETURNING suma, total, estrellas_1..5
+
+Antes se bloquea la fila del documento (SELECT ... FOR UPDATE) dentro de la
+misma transacción: así dos votos simultáneos del mismo usuario no pueden leer
+ambos la misma puntuación "anterior", y la sentencia principal parte de una
+instantánea que ya incluye los votos confirmados por quien tenía el bloqueo.
+
+Esta ruta no pasa por el ORM, de modo que no envía las señales de
+Calificacion (que hacen el mismo ajuste con Documento.ajustar_calificaciones
+para el admin y el resto de escrituras). Fuera de PostgreSQL se usa el ORM.
+"""
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Calificacion, Documento
+
+ESTRELLAS = range(1, 6)
+
+
+def _sql_calificar():
+    calificacion = Calificacion._meta.db_table
+    documento = Documento._meta.db_table
+    estrellas = ',\n            '.join(
+        f'estrellas_{n} = d.estrellas_{n}'
+        f' + (guardada.puntuacion = {n})::int'
+        f' - COALESCE(anterior.puntuacion = {n}, false)::int'
+        for n in ESTRELLAS
+    )
+    return f"""
+        WITH anterior AS (
+            SELECT puntuacion FROM {calificacion}
+            WHERE documento_id = %(documento)s AND usuario_id = %(usuario)s
+        ), guardada AS (
+            INSERT INTO {calificacion} (documento_id, usuario_id, puntuacion, fecha_creacion)
+            VALUES (%(documento)s, %(usuario)s, %(puntuacion)s, %(ahora)s)
+            ON CONFLICT (documento_id, usuario_id) DO UPDATE SET puntuacion = EXCLUDED.puntuacion
+            RETURNING puntuacion
+        )
+        UPDATE {documento} AS d SET
+            suma_calificaciones = d.suma_calificaciones + guardada.puntuacion - COALESCE(anterior.puntuacion, 0),
+            total_calificaciones = d.total_calificaciones + (anterior.puntuacion IS NULL)::int,
+            {estrellas}
+        FROM guardada LEFT JOIN anterior ON true
+        WHERE d.id = %(documento)s
+        RETURNING {', '.join(f'd.{campo}' for campo in Documento.CAMPOS_CALIFICACION)}
+    """
+
+
+def calificar(documento_id, usuario, puntuacion, using='default'):
+    """
+    Guarda (o cambia) la puntuación de `usuario` sobre el documento y devuelve
+    un Documento sin guardar con los agregados actualizados (solo esos campos),
+    o None si el documento no existe.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor != 'postgresql':
+            return _calificar_orm(documento_id, usuario, puntuacion, using)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT 1 FROM {Documento._meta.db_table} WHERE id = %s FOR UPDATE',
+                [documento_id],
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(_sql_calificar(), {
+                'documento': documento_id,
+                'usuario': usuario.pk,
+                'puntuacion': puntuacion,
+                'ahora': timezone.now(),
+            })
+            agregados = cursor.fetchone()
+    return Documento(pk=documento_id, **dict(zip(Documento.CAMPOS_CALIFICACION, agregados)))
+
+
+def _calificar_orm(documento_id, usuario, puntuacion, using):
+    if not Documento.objects.using(using).select_for_update().filter(pk=documento_id).exists():
+        return None
+    # update_or_create dispara las señales que ajustan los agregados del documento
+    Calificacion.objects.using(using).update_or_create(
+        documento_id=documento_id,
+        usuario=usuario,
+        defaults={'puntuacion': puntuacion},
+    )
+    return Documento.objects.using(using).only(*Documento.CAMPOS_CALIFICACION).get(pk=documento_id)
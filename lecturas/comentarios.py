@@ -0,0 +1,49 @@
+"""
+Carga de hilos de comentarios sin consultas N+1.
+
+Cada Comentario guarda su comentario `raiz`, así que una página de comentarios
+principales y todas sus respuestas (a cualquier profundidad) se obtienen con
+una única consulta. El árbol se arma en memoria y se deja en la caché de
+prefetch de `hijos`, de modo que `comentario.hijos.all` y `comentario.hijos.count`
+en las plantillas no vuelven a consultar la BD.
+"""
+from django.db.models import Q
+
+from .models import Comentario
+
+
+def adjuntar_hijos(comentario, hijos):
+    """Guarda `hijos` como resultado ya precargado de `comentario.hijos.all()`."""
+    queryset = comentario.hijos.all()
+    queryset._result_cache = list(hijos)
+    queryset._prefetch_done = True
+    if not hasattr(comentario, '_prefetched_objects_cache'):
+        comentario._prefetched_objects_cache = {}
+    comentario._prefetched_objects_cache['hijos'] = queryset
+    comentario.num_hijos = len(hijos)
+
+
+def cargar_arbol_comentarios(raices):
+    """
+    Recibe los comentarios principales de la página actual (del más reciente al
+    más antiguo) y devuelve la lista de esas raíces, con sus descendientes,
+    autores y perfiles cargados en una sola consulta.
+    """
+    ids_raiz = [raiz.pk for raiz in raices]
+    nodos = list(
+        Comentario.objects
+        .filter(Q(pk__in=ids_raiz) | Q(raiz__in=ids_raiz))
+        .select_related('autor__profile')
+        .order_by('fecha_creacion', 'pk')
+    )
+
+    hijos_por_padre = {}
+    for nodo in nodos:
+        if nodo.parent_id is not None:
+            hijos_por_padre.setdefault(nodo.parent_id, []).append(nodo)
+    for nodo in nodos:
+        adjuntar_hijos(nodo, hijos_por_padre.get(nodo.pk, []))
+
+    principales = [nodo for nodo in nodos if nodo.parent_id is None]
+    principales.reverse()
+    return principales
@@ -0,0 +1,153 @@
+"""
+Entrega de archivos adjuntos desde almacenamiento local.
+
+- Modo 'stream' (por defecto): el archivo se envía por bloques con FileResponse,
+  con soporte de peticiones Range (206), ETag/Last-Modified y peticiones
+  condicionales (304), sin cargarlo entero en la memoria del worker.
+- Modos 'x-accel-redirect' / 'x-sendfile': Django solo comprueba permisos y
+  cabeceras y delega la transferencia al proxy (nginx, Apache...).
+
+Se configura con los settings ATTACHMENT_DELIVERY, ATTACHMENT_ACCEL_PREFIX y
+ATTACHMENT_CACHE_MAX_AGE.
+"""
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+MODO_STREAM = 'stream'
+MODO_X_ACCEL = 'x-accel-redirect'
+MODO_X_SENDFILE = 'x-sendfile'
+
+TAMANIO_BLOQUE = 64 * 1024
+RANGO_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def calcular_etag(stat):
+    """ETag a partir de la fecha de modificación y el tamaño, como hace nginx."""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parsear_rango(cabecera, tamanio):
+    """
+    Interpreta una cabecera Range de un único intervalo.
+    Devuelve (inicio, fin) inclusivos, None si la cabecera no aplica
+    (ausente, con varios intervalos o mal formada) o lanza ValueError si
+    el intervalo no se puede satisfacer.
+    """
+    if not cabecera:
+        return None
+    match = RANGO_RE.match(cabecera.strip())
+    if not match:
+        return None
+    inicio, fin = match.groups()
+    if not inicio and not fin:
+        return None
+    if tamanio == 0:
+        raise ValueError("Archivo vacío")
+    if not inicio:
+        # Sufijo: los últimos N bytes
+        longitud = int(fin)
+        if longitud == 0:
+            raise ValueError("Rango vacío")
+        return max(tamanio - longitud, 0), tamanio - 1
+    inicio = int(inicio)
+    fin = int(fin) if fin else tamanio - 1
+    if inicio >= tamanio or fin < inicio:
+        raise ValueError("Rango fuera del archivo")
+    return inicio, min(fin, tamanio - 1)
+
+
+def _rango_vigente(request, etag, last_modified):
+    """Aplica If-Range: si el archivo cambió, se ignora el Range y se envía completo."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _leer_intervalo(archivo, inicio, longitud):
+    try:
+        archivo.seek(inicio)
+        pendiente = longitud
+        while pendiente > 0:
+            bloque = archivo.read(min(TAMANIO_BLOQUE, pendiente))
+            if not bloque:
+                break
+            pendiente -= len(bloque)
+            yield bloque
+    finally:
+        archivo.close()
+
+
+def _poner_cabeceras(response, etag, last_modified, nombre_descarga, versionada):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Frame-Options'] = 'SAMEORIGIN'
+    if nombre_descarga:
+        response['Content-Disposition'] = f'inline; filename="{nombre_descarga}"'
+    max_age = getattr(settings, 'ATTACHMENT_CACHE_MAX_AGE', 86400)
+    if versionada:
+        # La URL incluye la versión del adjunto: si cambia el archivo, cambia la URL
+        patch_cache_control(response, public=True, max_age=365 * 86400, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def servir_archivo_local(request, ruta, nombre_almacenado, content_type, versionada=False):
+    """
+    Devuelve la respuesta para el archivo local `ruta` (ruta absoluta) cuyo
+    nombre en el storage es `nombre_almacenado`. Lanza FileNotFoundError si
+    el archivo no existe.
+    """
+    stat = os.stat(ruta)
+    etag = calcular_etag(stat)
+    last_modified = int(stat.st_mtime)
+    nombre_descarga = os.path.basename(nombre_almacenado)
+
+    # If-None-Match / If-Modified-Since -> 304 (o 412 con If-Match/If-Unmodified-Since)
+    condicional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if condicional is not None:
+        return _poner_cabeceras(condicional, etag, last_modified, None, versionada)
+
+    modo = getattr(settings, 'ATTACHMENT_DELIVERY', MODO_STREAM)
+    if modo == MODO_X_ACCEL:
+        prefijo = getattr(settings, 'ATTACHMENT_ACCEL_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefijo.rstrip('/') + '/' + quote(nombre_almacenado)
+        return _poner_cabeceras(response, etag, last_modified, nombre_descarga, versionada)
+    if modo == MODO_X_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = ruta
+        return _poner_cabeceras(response, etag, last_modified, nombre_descarga, versionada)
+
+    rango = None
+    if request.method == 'GET' and _rango_vigente(request, etag, last_modified):
+        try:
+            rango = parsear_rango(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return _poner_cabeceras(response, etag, last_modified, None, versionada)
+
+    archivo = open(ruta, 'rb')
+    if rango is None:
+        # FileResponse usa wsgi.file_wrapper (sendfile en gunicorn) cuando está disponible
+        response = FileResponse(archivo, content_type=content_type)
+    else:
+        inicio, fin = rango
+        longitud = fin - inicio + 1
+        response = StreamingHttpResponse(
+            _leer_intervalo(archivo, inicio, longitud), status=206, content_type=content_type
+        )
+        response['Content-Length'] = str(longitud)
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{stat.st_size}'
+    return _poner_cabeceras(response, etag, last_modified, nombre_descarga, versionada)
@@ -0,0 +1,230 @@
+"""
+Extracción del texto de los adjuntos de Documento (.pdf, .docx, .epub, .txt).
+
+Tras guardar un documento con un adjunto nuevo se extrae, en segundo plano,
+el texto plano (que alimenta el search_vector del catálogo) y una versión HTML
+ligera dividida en páginas para el modo lector. El resultado se guarda en
+TextoAdjunto. Para los adjuntos ya existentes: `manage.py extraer_texto_adjuntos`.
+
+El soporte de PDF requiere el paquete opcional `pypdf`.
+"""
+import logging
+import posixpath
+import re
+import zipfile
+from html import escape
+from io import BytesIO
+from xml.etree import ElementTree
+
+from django.db import transaction
+
+from .tareas import en_segundo_plano
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pragma: no cover - dependencia opcional
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+# Tamaño aproximado (en caracteres de texto) de cada página del modo lector
+CARACTERES_POR_PAGINA = 6000
+
+NS_WORD = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+BLOQUES_EPUB = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li', 'blockquote', 'pre']
+
+
+class FormatoNoSoportado(Exception):
+    pass
+
+
+def _bloque(etiqueta, texto):
+    """(html, texto) de un bloque; el texto siempre se escapa."""
+    return f'<{etiqueta}>{escape(texto)}</{etiqueta}>', texto
+
+
+def paginar(bloques, limite=CARACTERES_POR_PAGINA):
+    """Agrupa bloques (html, texto) en páginas de unos `limite` caracteres sin partir bloques."""
+    paginas, actual, longitud = [], [], 0
+    for html, texto in bloques:
+        if actual and longitud + len(texto) > limite:
+            paginas.append(''.join(actual))
+            actual, longitud = [], 0
+        actual.append(html)
+        longitud += len(texto)
+    if actual:
+        paginas.append(''.join(actual))
+    return paginas
+
+
+def _parrafos(texto):
+    """Divide texto plano en párrafos por líneas en blanco, uniendo los saltos de línea internos."""
+    for parrafo in re.split(r'\n\s*\n', texto):
+        parrafo = ' '.join(parrafo.split())
+        if parrafo:
+            yield _bloque('p', parrafo)
+
+
+def extraer_pdf(datos):
+    if PdfReader is None:
+        raise FormatoNoSoportado("Falta el paquete pypdf para leer PDF.")
+    lector = PdfReader(BytesIO(datos))
+    textos, paginas = [], []
+    # Se respeta la paginación original del PDF
+    for pagina in lector.pages:
+        bloques = list(_parrafos(pagina.extract_text() or ''))
+        if bloques:
+            paginas.append(''.join(html for html, _ in bloques))
+            textos.extend(texto for _, texto in bloques)
+    return textos, paginas
+
+
+def extraer_docx(datos):
+    with zipfile.ZipFile(BytesIO(datos)) as archivo:
+        raiz = ElementTree.fromstring(archivo.read('word/document.xml'))
+    bloques = []
+    for parrafo in raiz.iter(f'{NS_WORD}p'):
+        partes = []
+        for nodo in parrafo.iter():
+            if nodo.tag == f'{NS_WORD}t':
+                partes.append(nodo.text or '')
+            elif nodo.tag in (f'{NS_WORD}tab', f'{NS_WORD}br'):
+                partes.append(' ')
+        texto = ' '.join(''.join(partes).split())
+        if not texto:
+            continue
+        estilo = parrafo.find(f'{NS_WORD}pPr/{NS_WORD}pStyle')
+        estilo = (estilo.get(f'{NS_WORD}val', '') if estilo is not None else '').lower()
+        # Word usa 'Heading1' en inglés y 'Ttulo1' en español
+        if estilo.startswith(('heading', 'ttulo', 'titulo', 'title')):
+            nivel = estilo[-1:]
+            bloques.append(_bloque('h3' if nivel.isdigit() and nivel != '1' else 'h2', texto))
+        else:
+            bloques.append(_bloque('p', texto))
+    return [texto for _, texto in bloques], paginar(bloques)
+
+
+def _capitulos_epub(archivo):
+    """Rutas de los XHTML del EPUB en el orden de lectura (spine)."""
+    contenedor = ElementTree.fromstring(archivo.read('META-INF/container.xml'))
+    rootfile = next(nodo for nodo in contenedor.iter() if nodo.tag.endswith('rootfile'))
+    ruta_opf = rootfile.get('full-path')
+    opf = ElementTree.fromstring(archivo.read(ruta_opf))
+    base = posixpath.dirname(ruta_opf)
+    manifiesto = {
+        nodo.get('id'): posixpath.normpath(posixpath.join(base, nodo.get('href')))
+        for nodo in opf.iter() if nodo.tag.endswith('}item')
+    }
+    return [
+        manifiesto[nodo.get('idref')]
+        for nodo in opf.iter() if nodo.tag.endswith('}itemref') and nodo.get('idref') in manifiesto
+    ]
+
+
+def extraer_epub(datos):
+    # Solo se importa aquí: cargar bs4 al arrancar cada worker no compensa
+    from bs4 import BeautifulSoup
+
+    textos, paginas = [], []
+    with zipfile.ZipFile(BytesIO(datos)) as archivo:
+        for ruta in _capitulos_epub(archivo):
+            soup = BeautifulSoup(archivo.read(ruta), 'html.parser')
+            bloques = []
+            for elemento in soup.find_all(BLOQUES_EPUB):
+                # Los bloques anidados ya se incluyen en el texto de su contenedor
+                if elemento.find_parent(BLOQUES_EPUB):
+                    continue
+                texto = elemento.get_text(' ', strip=True)
+                if not texto:
+                    continue
+                if elemento.name in ('h1', 'h2'):
+                    bloques.append(_bloque('h2', texto))
+                elif elemento.name.startswith('h'):
+                    bloques.append(_bloque('h3', texto))
+                else:
+                    bloques.append(_bloque('p', texto))
+            # Cada capítulo empieza en una página nueva
+            paginas.extend(paginar(bloques))
+            textos.extend(texto for _, texto in bloques)
+    return textos, paginas
+
+
+def extraer_txt(datos):
+    try:
+        texto = datos.decode('utf-8')
+    except UnicodeDecodeError:
+        texto = datos.decode('latin-1')
+    bloques = list(_parrafos(texto))
+    return [texto for _, texto in bloques], paginar(bloques)
+
+
+EXTRACTORES = {
+    '.pdf': extraer_pdf,
+    '.docx': extraer_docx,
+    '.epub': extraer_epub,
+    '.txt': extraer_txt,
+}
+
+
+def extraer(nombre, datos):
+    """Devuelve (texto plano, lista de páginas HTML) del archivo `nombre`."""
+    extension = posixpath.splitext(nombre)[1].lower()
+    extractor = EXTRACTORES.get(extension)
+    if extractor is None:
+        raise FormatoNoSoportado(f"Formato {extension or 'desconocido'} no soportado.")
+    textos, paginas = extractor(datos)
+    return '\n\n'.join(textos), paginas
+
+
+def extraer_texto_documento(documento_id, forzar=False):
+    """
+    Extrae y guarda el texto del adjunto actual del documento. No hace nada si
+    ya se extrajo para ese mismo archivo (salvo con forzar=True) y descarta el
+    resultado si mientras tanto se subió otro adjunto.
+    """
+    from .busqueda import actualizar_vector_busqueda
+    from .models import Documento, TextoAdjunto
+
+    documento = Documento.objects.filter(pk=documento_id).only('adjunto').first()
+    if documento is None:
+        return
+    nombre = documento.adjunto.name or ''
+    if not nombre:
+        if TextoAdjunto.objects.filter(documento_id=documento_id).delete()[0]:
+            actualizar_vector_busqueda([documento_id])
+        return
+    origen = TextoAdjunto.objects.filter(documento_id=documento_id).values_list('origen', flat=True).first()
+    if origen == nombre and not forzar:
+        return
+
+    valores = {'origen': nombre, 'texto': '', 'paginas': [], 'error': ''}
+    try:
+        with documento.adjunto.open('rb') as archivo:
+            datos = archivo.read()
+        valores['texto'], valores['paginas'] = extraer(nombre, datos)
+        valores['estado'] = TextoAdjunto.ESTADO_LISTO
+    except FormatoNoSoportado as e:
+        valores['estado'] = TextoAdjunto.ESTADO_NO_SOPORTADO
+        valores['error'] = str(e)
+    except Exception as e:
+        logger.exception(f"Error extrayendo el texto del adjunto {nombre}")
+        valores['estado'] = TextoAdjunto.ESTADO_ERROR
+        valores['error'] = str(e)[:255]
+    valores['num_paginas'] = len(valores['paginas'])
+
+    with transaction.atomic():
+        if not Documento.objects.select_for_update().filter(pk=documento_id, adjunto=nombre).exists():
+            return
+        TextoAdjunto.objects.update_or_create(documento_id=documento_id, defaults=valores)
+    actualizar_vector_busqueda([documento_id])
+    logger.info(
+        f"Texto del adjunto {nombre} extraído: {valores['estado']}, {valores['num_paginas']} página(s)"
+    )
+
+
+def programar_extraccion(documento, update_fields=None):
+    """Encola la extracción tras el commit si el guardado pudo cambiar el adjunto."""
+    if update_fields is not None and 'adjunto' not in update_fields:
+        return
+    documento_id = documento.pk
+    transaction.on_commit(lambda: en_segundo_plano(extraer_texto_documento, documento_id))
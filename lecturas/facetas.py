@@ -0,0 +1,199 @@
+"""
+Conteo de lecturas por facetas (idioma, grado, nivel de dificultad y género)
+para la barra lateral de la biblioteca.
+
+En lugar de un COUNT por cada opción, se calcula un "cubo" con una sola
+consulta agrupada: cuántos documentos hay para cada combinación
+
+    (idioma, grado, nivel_dificultad, (ids de géneros ordenados))
+
+Cada documento cae en exactamente una celda, así que cualquier conteo
+(por idioma, por idioma y grado, por género con otros filtros...) se obtiene
+sumando celdas en Python sin volver a la BD.
+
+Los cubos (el del catálogo completo y, poco tiempo, los de cada búsqueda) se
+guardan en la caché compartida bajo una generación. Las señales de Documento
+(save/delete y m2m_changed de `generos`) comparan la celda anterior del
+documento con la nueva y, si cambia, al confirmar la transacción sustituyen la
+generación por una nueva: el siguiente que pida el cubo lo recalcula con la
+consulta agrupada. La generación se reemplaza por un valor aleatorio en lugar
+de incrementarse, así que dos cambios simultáneos en procesos distintos no se
+pisan, y nadie modifica un cubo ya guardado.
+"""
+import hashlib
+import logging
+import uuid
+from collections import Counter
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef
+
+from .models import Documento
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONES = ('idioma', 'grado', 'nivel_dificultad', 'genero')
+# Columnas de Documento que determinan su celda (los géneros van aparte)
+CAMPOS_FACETA = ['idioma', 'grado', 'nivel_dificultad']
+
+CLAVE_GENERACION = 'lecturas:facetas:generacion'
+# El cubo completo se recalcula de vez en cuando por si algún cambio se
+# escapó de las señales (update() masivos, SQL a mano...)
+TIEMPO_CACHE_CUBO = 60 * 60 * 6
+TIEMPO_CACHE_BUSQUEDA = 60 * 5
+
+
+def calcular_cubo(queryset=None):
+    """
+    Devuelve un dict {(idioma, grado, nivel_dificultad, generos): total} para
+    los documentos de `queryset` (todo el catálogo por defecto).
+    """
+    documentos = Documento.objects.all()
+    if queryset is not None:
+        documentos = documentos.filter(pk__in=queryset.order_by().values('pk'))
+
+    if connections[documentos.db].vendor != 'postgresql':
+        # Sin arrays: una fila por documento y género, agrupadas en Python
+        generos_por_documento, columnas = {}, {}
+        for pk, idioma, grado, nivel, genero in documentos.values_list(
+            'pk', *CAMPOS_FACETA, 'generos',
+        ):
+            columnas[pk] = (idioma, grado, nivel)
+            generos = generos_por_documento.setdefault(pk, [])
+            if genero is not None:
+                generos.append(genero)
+        return dict(Counter(
+            columnas[pk] + (tuple(sorted(generos)),) for pk, generos in generos_por_documento.items()
+        ))
+
+    through = Documento.generos.through
+    filas = (
+        documentos
+        .annotate(ids_generos=ArraySubquery(
+            through.objects.filter(documento_id=OuterRef('pk')).order_by('genero_id').values('genero_id')
+        ))
+        .order_by()
+        .values(*CAMPOS_FACETA, 'ids_generos')
+        .annotate(total=Count('pk'))
+    )
+    return {
+        (fila['idioma'], fila['grado'], fila['nivel_dificultad'], tuple(fila['ids_generos'])): fila['total']
+        for fila in filas
+    }
+
+
+def _nueva_generacion():
+    return uuid.uuid4().hex
+
+
+def _generacion():
+    return cache.get_or_set(CLAVE_GENERACION, _nueva_generacion, None)
+
+
+def obtener_cubo(queryset=None, clave=None):
+    """
+    Cubo del catálogo completo (cacheado) o, si se pasa `queryset`, de esos
+    documentos; `clave` identifica la consulta (p. ej. el texto buscado) en la caché.
+    """
+    if queryset is None:
+        # La generación se lee antes de consultar: si cambia mientras tanto, el
+        # cubo queda guardado bajo la anterior y nadie lo vuelve a leer
+        clave_cache = f'lecturas:facetas:cubo:{_generacion()}'
+        cubo = cache.get(clave_cache)
+        if cubo is None:
+            cubo = calcular_cubo()
+            cache.set(clave_cache, cubo, TIEMPO_CACHE_CUBO)
+        return cubo
+
+    if clave is None:
+        return calcular_cubo(queryset)
+    resumen = hashlib.md5(str(clave).encode('utf-8')).hexdigest()
+    clave_cache = f'lecturas:facetas:busqueda:{_generacion()}:{resumen}'
+    cubo = cache.get(clave_cache)
+    if cubo is None:
+        cubo = calcular_cubo(queryset)
+        cache.set(clave_cache, cubo, TIEMPO_CACHE_BUSQUEDA)
+    return cubo
+
+
+class Facetas:
+    """
+    Consultas sobre un cubo. Los filtros usan los nombres de DIMENSIONES
+    (`genero` es el pk del género); los que valen None se ignoran.
+    """
+    def __init__(self, cubo):
+        self.cubo = cubo
+
+    def _celdas(self, excluir=(), **filtros):
+        filtros = {
+            dimension: valor for dimension, valor in filtros.items()
+            if valor not in (None, '') and dimension not in excluir
+        }
+        genero = filtros.pop('genero', None)
+        for celda, total in self.cubo.items():
+            valores = dict(zip(CAMPOS_FACETA, celda))
+            if any(str(valores[dimension]) != str(valor) for dimension, valor in filtros.items()):
+                continue
+            if genero is not None and int(genero) not in celda[3]:
+                continue
+            yield celda, total
+
+    def total(self, **filtros):
+        return sum(total for _, total in self._celdas(**filtros))
+
+    def contar(self, dimension, **filtros):
+        """
+        {valor: documentos} de `dimension` aplicando el resto de filtros (el de
+        la propia dimensión se ignora para poder mostrar las alternativas).
+        """
+        conteos = Counter()
+        for celda, total in self._celdas(excluir=(dimension,), **filtros):
+            if dimension == 'genero':
+                for genero in celda[3]:
+                    conteos[genero] += total
+            else:
+                conteos[celda[CAMPOS_FACETA.index(dimension)]] += total
+        return dict(conteos)
+
+    def contar_pares(self, primera, segunda, **filtros):
+        """{(valor de `primera`, valor de `segunda`): documentos}, sin géneros."""
+        conteos = Counter()
+        i, j = CAMPOS_FACETA.index(primera), CAMPOS_FACETA.index(segunda)
+        for celda, total in self._celdas(excluir=(primera, segunda), **filtros):
+            conteos[(celda[i], celda[j])] += total
+        return dict(conteos)
+
+
+def celda_documento(pk):
+    """Celda actual del documento `pk` según la BD, o None si no existe."""
+    columnas = Documento.objects.filter(pk=pk).values_list(*CAMPOS_FACETA).first()
+    if columnas is None:
+        return None
+    generos = Documento.generos.through.objects.filter(documento_id=pk).order_by('genero_id')
+    return tuple(columnas) + (tuple(generos.values_list('genero_id', flat=True)),)
+
+
+def celda_desde(documento, generos=()):
+    return tuple(getattr(documento, campo) for campo in CAMPOS_FACETA) + (tuple(sorted(generos)),)
+
+
+def ajustar(cambios):
+    """
+    Recibe una lista de (celda anterior, celda nueva) de documentos modificados
+    (None si el documento no existía o dejó de existir) e invalida los cubos si
+    alguno cambió de celda. Se hace al confirmar la transacción para no
+    invalidar por cambios que luego se deshacen.
+    """
+    if any(anterior != nueva for anterior, nueva in cambios):
+        invalidar()
+
+
+def invalidar():
+    """Descarta los cubos cacheados en todos los procesos (cambia la generación)."""
+    def aplicar():
+        cache.set(CLAVE_GENERACION, _nueva_generacion(), None)
+        logger.debug("Facetas de lecturas invalidadas")
+
+    transaction.on_commit(aplicar)
@@ -1,14 +1,18 @@
 import os
 from django import forms
 from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 from django_select2.forms import ModelSelect2Widget, ModelSelect2TagWidget, Select2TagMixin
 from django.utils.safestring import mark_safe
+from imago.autoguardado import FormularioVersionadoMixin
 from users.forms import validate_file
 from . import models
 
 class AutorUnicoTagWidget(Select2TagMixin, ModelSelect2Widget):
     search_fields = ['nombre__icontains']
     queryset = models.Autor.objects.all()
+    # Búsqueda indexada y sin tildes (lecturas/autocompletado.py)
+    data_url = reverse_lazy('lecturas:autocompletar', kwargs={'tipo': 'autor'})
     def value_from_datadict(self, data, files, name):
         value = data.get(name)
         if not value: return None
@@ -28,6 +32,7 @@ class AutorUnicoTagWidget(Select2TagMixin, ModelSelect2Widget):
 class GeneroTagWidget(ModelSelect2TagWidget):
     queryset = models.Genero.objects.all()
     search_fields = ['nombre__icontains']
+    data_url = reverse_lazy('lecturas:autocompletar', kwargs={'tipo': 'genero'})
     def value_from_datadict(self, data, files, name):
         values = super().value_from_datadict(data, files, name)
         final_values = []
@@ -37,7 +42,7 @@ class GeneroTagWidget(ModelSelect2TagWidget):
                 genero, _ = models.Genero.objects.get_or_create(nombre=value)
                 final_values.append(genero.pk)
         return final_values
-class DocumentoForm(forms.ModelForm):
+class DocumentoForm(FormularioVersionadoMixin, forms.ModelForm):
     class Meta:
         model = models.Documento
         fields = [
@@ -140,4 +145,36 @@ class ComentarioEditForm(forms.ModelForm):
                 raise ValidationError(
                     "Tipo de imagen no válida. Solo se permiten: JPG, JPEG, PNG, WEBP (máx. 3MB)."
                 )
-        return imagen
\ No newline at end of file
+        return imagen
+
+class ImportarLecturasForm(forms.Form):
+    """Formulario de la importación masiva del admin (ver lecturas/importacion.py)."""
+    manifiesto = forms.FileField(
+        label="Manifiesto",
+        help_text="CSV o JSON con una fila por lectura: clave, titulo, idioma, grado, "
+                  "nivel_dificultad, descripcion, autor, generos, adjunto, imagen.",
+        widget=forms.FileInput(attrs={'accept': '.csv,.json'}),
+    )
+    archivos = forms.FileField(
+        label="Archivos (ZIP)",
+        required=False,
+        help_text="ZIP con los adjuntos e imágenes; las rutas del manifiesto son relativas a su raíz.",
+        widget=forms.FileInput(attrs={'accept': '.zip'}),
+    )
+    dry_run = forms.BooleanField(
+        label="Solo validar (no crear nada)",
+        required=False,
+        initial=True,
+    )
+
+    def clean_manifiesto(self):
+        manifiesto = self.cleaned_data.get('manifiesto')
+        if manifiesto and os.path.splitext(manifiesto.name)[1].lower() not in ('.csv', '.json'):
+            raise ValidationError("El manifiesto debe ser un archivo .csv o .json")
+        return manifiesto
+
+    def clean_archivos(self):
+        archivos = self.cleaned_data.get('archivos')
+        if archivos and os.path.splitext(archivos.name)[1].lower() != '.zip':
+            raise ValidationError("Los archivos deben subirse en un .zip")
+        return archivos
@@ -0,0 +1,131 @@
+"""
+Derivados responsive (AVIF/WebP a varios anchos) de las imágenes subidas.
+
+Las imágenes de Documento.imagen y Comentario.imagen_comentario se convierten
+con Pillow en un hilo aparte, después del commit de la transacción, para no
+alargar la petición de subida. El resultado se guarda en el campo
+`imagen_derivados` del modelo:
+
+    {
+        "origen": "uploads/.../portada.jpg",
+        "formatos": {
+            "avif": [{"ancho": 320, "nombre": "...", "url": "..."}, ...],
+            "webp": [...],
+        },
+    }
+
+Las plantillas generan el `srcset` con el filtro `fuentes_srcset` de
+lecturas_extras. Para las imágenes ya existentes: `manage.py generar_derivados_imagenes`.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from .tareas import en_segundo_plano
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = (320, 640, 960)
+# Orden de preferencia en <picture>: el navegador usa la primera que soporte
+FORMATOS = [
+    formato for formato, disponible in (('avif', features.check('avif')), ('webp', features.check('webp')))
+    if disponible
+]
+CALIDAD = {'avif': 55, 'webp': 75}
+
+# Campo de imagen de cada modelo que tiene derivados
+CAMPOS_IMAGEN = {
+    'lecturas.Documento': 'imagen',
+    'lecturas.Comentario': 'imagen_comentario',
+}
+
+def ruta_derivado(nombre, ancho, formato):
+    """uploads/.../images/portada.jpg -> uploads/.../images/derivados/portada-320w.webp"""
+    carpeta, archivo = posixpath.split(nombre)
+    raiz = posixpath.splitext(archivo)[0]
+    return posixpath.join(carpeta, 'derivados', f'{raiz}-{ancho}w.{formato}')
+
+
+def generar_derivados(storage, nombre):
+    """
+    Genera y guarda en `storage` los derivados de la imagen `nombre`.
+    Devuelve el diccionario que se almacena en `imagen_derivados`.
+    """
+    with storage.open(nombre, 'rb') as archivo:
+        imagen = Image.open(archivo)
+        imagen.load()
+    imagen = ImageOps.exif_transpose(imagen)
+    tiene_alfa = imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info)
+    imagen = imagen.convert('RGBA' if tiene_alfa else 'RGB')
+
+    # Nunca se amplía: los anchos mayores que el original se sustituyen por él
+    anchos = sorted({min(ancho, imagen.width) for ancho in ANCHOS})
+    formatos = {}
+    for formato in FORMATOS:
+        entradas = []
+        for ancho in anchos:
+            alto = max(1, round(imagen.height * ancho / imagen.width))
+            reducida = imagen if ancho == imagen.width else imagen.resize((ancho, alto), Image.LANCZOS)
+            buffer = BytesIO()
+            reducida.save(buffer, format=formato.upper(), quality=CALIDAD[formato])
+            guardado = storage.save(ruta_derivado(nombre, ancho, formato), ContentFile(buffer.getvalue()))
+            entradas.append({'ancho': ancho, 'nombre': guardado, 'url': storage.url(guardado)})
+        formatos[formato] = entradas
+    return {'origen': nombre, 'formatos': formatos}
+
+
+def eliminar_derivados(storage, derivados):
+    for entradas in (derivados or {}).get('formatos', {}).values():
+        for entrada in entradas:
+            try:
+                storage.delete(entrada['nombre'])
+            except Exception as e:
+                logger.warning(f"No se pudo borrar el derivado {entrada['nombre']}: {e}")
+
+
+def procesar_imagen(modelo_label, pk, forzar=False):
+    """
+    Genera los derivados de la imagen actual del objeto y sustituye los anteriores.
+    Si mientras tanto se subió otra imagen, descarta el trabajo hecho.
+    Con forzar=True los regenera aunque ya existan para esa imagen.
+    """
+    modelo = apps.get_model(modelo_label)
+    campo = CAMPOS_IMAGEN[modelo_label]
+    objeto = modelo.objects.filter(pk=pk).only(campo, 'imagen_derivados').first()
+    if objeto is None:
+        return
+    archivo = getattr(objeto, campo)
+    nombre = archivo.name or ''
+    anteriores = objeto.imagen_derivados or {}
+    if anteriores.get('origen', '') == nombre and not forzar:
+        return
+
+    derivados = generar_derivados(archivo.storage, nombre) if nombre else {}
+    actualizados = modelo.objects.filter(pk=pk, **{campo: nombre}).update(imagen_derivados=derivados)
+    if actualizados:
+        eliminar_derivados(archivo.storage, anteriores)
+    else:
+        eliminar_derivados(archivo.storage, derivados)
+
+
+def programar_derivados(instancia):
+    """Encola la generación de derivados cuando la imagen cambió. Se llama desde post_save."""
+    modelo_label = instancia._meta.label
+    nombre = getattr(instancia, CAMPOS_IMAGEN[modelo_label]).name or ''
+    if (instancia.imagen_derivados or {}).get('origen', '') == nombre:
+        return
+    transaction.on_commit(lambda: en_segundo_plano(procesar_imagen, modelo_label, instancia.pk))
+
+
+def programar_borrado_derivados(instancia):
+    """Borra los derivados de un objeto eliminado. Se llama desde post_delete."""
+    derivados = instancia.imagen_derivados
+    if not derivados:
+        return
+    storage = getattr(instancia, CAMPOS_IMAGEN[instancia._meta.label]).storage
+    transaction.on_commit(lambda: en_segundo_plano(eliminar_derivados, storage, derivados))
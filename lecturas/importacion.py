@@ -0,0 +1,344 @@
+"""
+Importación masiva de lecturas a partir de un manifiesto (CSV o JSON) y una
+carpeta con los archivos que referencia.
+
+Cada fila del manifiesto describe un Documento:
+
+    clave, titulo, idioma, grado, nivel_dificultad, descripcion, autor, generos, adjunto, imagen
+
+- `clave` identifica la fila para poder reanudar una importación interrumpida
+  (si falta se usa la ruta del adjunto o el título).
+- `generos` admite una lista JSON o un texto separado por ';' o '|'.
+- `adjunto` e `imagen` son rutas relativas a la carpeta de archivos.
+
+Los autores y géneros se resuelven con una caché en memoria (una consulta al
+empezar y un bulk_create para los nuevos), los documentos y sus géneros se
+insertan con bulk_create por lotes y los archivos se suben con un pool de hilos
+acotado. Lo usan `manage.py importar_lecturas` y la vista de importación del admin.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils.text import slugify
+
+from users.forms import validate_file
+from . import autocompletado, facetas
+from .busqueda import actualizar_vector_busqueda
+from .extraccion import extraer_texto_documento
+from .imagenes import procesar_imagen
+from .models import Documento, Autor, Genero, ELEGIR_GRADO, ELEGIR_IDIOMA, normalizar_nombre
+from .tareas import en_segundo_plano
+
+logger = logging.getLogger(__name__)
+
+# Mismas restricciones que DocumentoForm
+EXTENSIONES_ADJUNTO = ['.pdf', '.doc', '.docx', '.epub']
+EXTENSIONES_IMAGEN = ['.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif']
+MAX_MB_ADJUNTO = 8
+MAX_MB_IMAGEN = 3
+
+HILOS_SUBIDA = 4
+TAMANIO_LOTE = 100
+
+
+class ErrorManifiesto(Exception):
+    pass
+
+
+def leer_manifiesto(nombre, datos):
+    """Devuelve la lista de filas (diccionarios) de un manifiesto .csv o .json."""
+    extension = os.path.splitext(nombre)[1].lower()
+    try:
+        texto = datos.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = datos.decode('latin-1')
+
+    if extension == '.json':
+        try:
+            contenido = json.loads(texto)
+        except json.JSONDecodeError as e:
+            raise ErrorManifiesto(f"JSON inválido: {e}")
+        filas = contenido.get('documentos') if isinstance(contenido, dict) else contenido
+        if not isinstance(filas, list) or not all(isinstance(fila, dict) for fila in filas):
+            raise ErrorManifiesto("El JSON debe ser una lista de objetos o {\"documentos\": [...]}.")
+        return filas
+
+    if extension == '.csv':
+        io_string = io.StringIO(texto)
+        try:
+            dialect = csv.Sniffer().sniff(io_string.readline(), delimiters=',;')
+        except csv.Error:
+            dialect = csv.excel
+        io_string.seek(0)
+        return [
+            {clave.strip(): (valor or '').strip() for clave, valor in fila.items() if clave}
+            for fila in csv.DictReader(io_string, dialect=dialect)
+        ]
+
+    raise ErrorManifiesto(f"Formato de manifiesto no soportado: {extension or 'desconocido'}")
+
+
+def clave_fila(fila):
+    return str(fila.get('clave') or fila.get('adjunto') or fila.get('titulo') or '').strip()
+
+
+def lista_generos(valor):
+    if isinstance(valor, list):
+        nombres = valor
+    else:
+        nombres = str(valor or '').replace('|', ';').split(';')
+    return [str(nombre).strip() for nombre in nombres if str(nombre).strip()]
+
+
+class CacheNombres:
+    """
+    Resuelve nombres de Autor/Genero a pks con una sola consulta inicial.
+    Los nombres que no existen se acumulan y se crean juntos con `crear_pendientes()`.
+    """
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.pks = {}
+        self.pendientes = {}
+        for pk, nombre in modelo.objects.values_list('pk', 'nombre').order_by('pk'):
+            self.pks.setdefault(self.normalizar(nombre), pk)
+
+    def normalizar(self, nombre):
+        # Los géneros tienen slug único: dos nombres con el mismo slug son el mismo género
+        if self.modelo is Genero:
+            return slugify(nombre)
+        return ' '.join(nombre.split()).casefold()
+
+    def registrar(self, nombre):
+        clave = self.normalizar(nombre)
+        if clave and clave not in self.pks:
+            self.pendientes.setdefault(clave, ' '.join(nombre.split()))
+
+    def crear_pendientes(self):
+        if not self.pendientes:
+            return 0
+        # bulk_create no llama a save(): el nombre normalizado se rellena aquí
+        if self.modelo is Genero:
+            nuevos = [
+                Genero(nombre=nombre, slug=clave, nombre_normalizado=normalizar_nombre(nombre))
+                for clave, nombre in self.pendientes.items()
+            ]
+        else:
+            nuevos = [
+                Autor(nombre=nombre, nombre_normalizado=normalizar_nombre(nombre))
+                for nombre in self.pendientes.values()
+            ]
+        creados = self.modelo.objects.bulk_create(nuevos)
+        autocompletado.invalidar('genero' if self.modelo is Genero else 'autor')
+        for clave, objeto in zip(self.pendientes, creados):
+            self.pks[clave] = objeto.pk
+        self.pendientes = {}
+        return len(creados)
+
+    def pk(self, nombre):
+        return self.pks.get(self.normalizar(nombre))
+
+
+def _ruta_archivo(directorio, relativa):
+    """Ruta absoluta de un archivo del manifiesto, sin permitir salir de `directorio`."""
+    base = os.path.realpath(directorio)
+    ruta = os.path.realpath(os.path.join(base, relativa))
+    if os.path.commonpath([base, ruta]) != base:
+        raise ValidationError(f"Ruta fuera de la carpeta de archivos: {relativa}")
+    if not os.path.isfile(ruta):
+        raise ValidationError(f"No existe el archivo: {relativa}")
+    return ruta
+
+
+def _validar_archivo(ruta, extensiones, max_mb):
+    with open(ruta, 'rb') as archivo:
+        validate_file(File(archivo, name=os.path.basename(ruta)), extensiones, max_mb)
+
+
+def validar_fila(fila, directorio):
+    """
+    Normaliza una fila del manifiesto. Devuelve un diccionario con los valores
+    del documento o lanza ValidationError con la lista de problemas.
+    """
+    errores = []
+    titulo = str(fila.get('titulo') or '').strip()
+    if not titulo:
+        errores.append("Falta el título.")
+    elif len(titulo) > Documento._meta.get_field('titulo').max_length:
+        errores.append("El título es demasiado largo.")
+
+    idioma = str(fila.get('idioma') or 'es').strip().lower()
+    if idioma not in dict(ELEGIR_IDIOMA):
+        errores.append(f"Idioma no válido: {idioma}")
+    grado = str(fila.get('grado') or '').strip().lower()
+    if grado not in dict(ELEGIR_GRADO):
+        errores.append(f"Grado no válido: {grado or '(vacío)'}")
+    nivel = str(fila.get('nivel_dificultad') or 'intermedio').strip().lower()
+    if nivel not in dict(Documento.NIVEL_DIFICULTAD):
+        errores.append(f"Nivel de dificultad no válido: {nivel}")
+
+    archivos = {}
+    for campo, extensiones, max_mb in (
+        ('adjunto', EXTENSIONES_ADJUNTO, MAX_MB_ADJUNTO),
+        ('imagen', EXTENSIONES_IMAGEN, MAX_MB_IMAGEN),
+    ):
+        relativa = str(fila.get(campo) or '').strip()
+        if not relativa:
+            continue
+        try:
+            archivos[campo] = _ruta_archivo(directorio, relativa)
+            _validar_archivo(archivos[campo], extensiones, max_mb)
+        except ValidationError as e:
+            errores.extend(f"{campo}: {mensaje}" for mensaje in e.messages)
+
+    if errores:
+        raise ValidationError(errores)
+    return {
+        'clave': clave_fila(fila),
+        'titulo': titulo,
+        'idioma': idioma,
+        'grado': grado,
+        'nivel_dificultad': nivel,
+        'descripcion': str(fila.get('descripcion') or ''),
+        'autor': ' '.join(str(fila.get('autor') or '').split()),
+        'generos': lista_generos(fila.get('generos')),
+        'archivos': archivos,
+    }
+
+
+def _subir(documento, campo, ruta):
+    """Guarda el archivo en el storage con la misma ruta que usaría el formulario."""
+    field = Documento._meta.get_field(campo)
+    nombre = field.generate_filename(documento, os.path.basename(ruta))
+    with open(ruta, 'rb') as archivo:
+        return field.storage.save(nombre, File(archivo), max_length=field.max_length)
+
+
+def _borrar_subidos(subidos):
+    for campo, nombre in subidos:
+        try:
+            Documento._meta.get_field(campo).storage.delete(nombre)
+        except Exception as e:
+            logger.warning(f"No se pudo borrar {nombre} tras un error de importación: {e}")
+
+
+def _importar_lote(lote, usuario, autores, generos, ejecutor):
+    documentos = [
+        Documento(
+            titulo=fila['titulo'],
+            idioma=fila['idioma'],
+            grado=fila['grado'],
+            nivel_dificultad=fila['nivel_dificultad'],
+            descripcion=fila['descripcion'],
+            author=usuario,
+            autor_principal_id=autores.pk(fila['autor']) if fila['autor'] else None,
+        )
+        for fila in lote
+    ]
+    # bulk_create no llama a save(): HTML saneado, extracto y palabras se calculan aquí
+    for documento in documentos:
+        documento.renderizar_texto_enriquecido()
+
+    # Subida en paralelo; si algo falla se borra lo ya subido del lote
+    subidas = {
+        ejecutor.submit(_subir, documento, campo, ruta): (documento, campo)
+        for documento, fila in zip(documentos, lote)
+        for campo, ruta in fila['archivos'].items()
+    }
+    subidos, error = [], None
+    for futuro, (documento, campo) in subidas.items():
+        try:
+            nombre = futuro.result()
+        except Exception as e:
+            error = error or e
+            continue
+        setattr(documento, campo, nombre)
+        subidos.append((campo, nombre))
+    if error is not None:
+        _borrar_subidos(subidos)
+        raise error
+
+    try:
+        with transaction.atomic():
+            Documento.objects.bulk_create(documentos)
+            Documento.generos.through.objects.bulk_create([
+                Documento.generos.through(documento_id=documento.pk, genero_id=generos.pk(nombre))
+                for documento, fila in zip(documentos, lote)
+                for nombre in fila['generos'] if generos.pk(nombre)
+            ], ignore_conflicts=True)
+            # bulk_create no dispara post_save ni m2m_changed
+            actualizar_vector_busqueda([documento.pk for documento in documentos])
+            facetas.ajustar([
+                (None, facetas.celda_desde(documento, {generos.pk(nombre) for nombre in fila['generos']} - {None}))
+                for documento, fila in zip(documentos, lote)
+            ])
+    except Exception:
+        _borrar_subidos(subidos)
+        raise
+
+    for documento in documentos:
+        if documento.adjunto:
+            en_segundo_plano(extraer_texto_documento, documento.pk)
+        if documento.imagen:
+            en_segundo_plano(procesar_imagen, 'lecturas.Documento', documento.pk)
+    return documentos
+
+
+def importar_lecturas(filas, directorio, usuario, importados=None, dry_run=False,
+                      hilos=HILOS_SUBIDA, tamanio_lote=TAMANIO_LOTE, al_terminar_lote=None):
+    """
+    Importa las filas del manifiesto. `importados` es el diccionario clave -> pk
+    de una ejecución anterior (las filas con esas claves se omiten) y se
+    actualiza tras cada lote, momento en el que se llama a `al_terminar_lote(importados)`.
+
+    Devuelve un resumen {'creados', 'omitidos', 'errores', 'autores', 'generos'},
+    donde 'errores' es una lista de (número de fila, mensajes).
+    """
+    importados = {} if importados is None else importados
+    resumen = {'creados': 0, 'omitidos': 0, 'errores': [], 'autores': 0, 'generos': 0}
+
+    validas, claves = [], set()
+    for numero, fila in enumerate(filas, start=1):
+        clave = clave_fila(fila)
+        if clave in importados:
+            resumen['omitidos'] += 1
+            continue
+        if clave in claves:
+            resumen['errores'].append((numero, [f"Clave repetida en el manifiesto: {clave}"]))
+            continue
+        try:
+            validas.append(validar_fila(fila, directorio))
+            claves.add(clave)
+        except ValidationError as e:
+            resumen['errores'].append((numero, e.messages))
+
+    autores, generos = CacheNombres(Autor), CacheNombres(Genero)
+    for fila in validas:
+        if fila['autor']:
+            autores.registrar(fila['autor'])
+        for nombre in fila['generos']:
+            generos.registrar(nombre)
+    resumen['autores'], resumen['generos'] = len(autores.pendientes), len(generos.pendientes)
+    if dry_run:
+        resumen['creados'] = len(validas)
+        return resumen
+
+    autores.crear_pendientes()
+    generos.crear_pendientes()
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='importacion') as ejecutor:
+        for inicio in range(0, len(validas), tamanio_lote):
+            lote = validas[inicio:inicio + tamanio_lote]
+            documentos = _importar_lote(lote, usuario, autores, generos, ejecutor)
+            for fila, documento in zip(lote, documentos):
+                importados[fila['clave']] = documento.pk
+            resumen['creados'] += len(documentos)
+            if al_terminar_lote:
+                al_terminar_lote(importados)
+    logger.info(f"Importación de lecturas: {resumen['creados']} creada(s), {resumen['omitidos']} omitida(s)")
+    return resumen
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from lecturas.recomendaciones import TAMANIO_BLOQUE, VECINOS, calcular_recomendaciones, guardar_recomendaciones
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula las lecturas similares de cada documento (coseno ítem-ítem sobre las "
+        "calificaciones, con géneros y grado como respaldo) y las guarda para el detalle. "
+        "Pensado para ejecutarse periódicamente, p. ej. cada noche desde cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vecinos', type=int, default=VECINOS, help='Lecturas similares por documento.')
+        parser.add_argument(
+            '--bloque',
+            type=int,
+            default=TAMANIO_BLOQUE,
+            help='Documentos por bloque al calcular las similitudes (limita la memoria).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcula y resume los resultados sin guardarlos.',
+        )
+
+    def handle(self, *args, **options):
+        recomendaciones, resumen = calcular_recomendaciones(
+            vecinos=max(1, options['vecinos']),
+            tamanio_bloque=max(1, options['bloque']),
+        )
+        mensaje = (
+            f"{len(recomendaciones)} recomendación(es) para {resumen['documentos']} documento(s): "
+            f"{resumen['calificaciones']} por calificaciones, {resumen['contenido']} por contenido; "
+            f"{resumen['sin_vecinos']} documento(s) sin vecinos."
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"[dry-run] {mensaje}"))
+            return
+        guardar_recomendaciones(recomendaciones)
+        self.stdout.write(self.style.SUCCESS(mensaje))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from lecturas.extraccion import extraer_texto_documento
+from lecturas.models import Documento, TextoAdjunto
+
+
+class Command(BaseCommand):
+    help = (
+        "Extrae el texto y la versión paginada para el modo lector de los adjuntos "
+        "que aún no la tienen (o de todos con --force)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Vuelve a extraer también los adjuntos ya procesados.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo cuenta los adjuntos pendientes, sin extraer nada.',
+        )
+
+    def handle(self, *args, **options):
+        extraidos = dict(TextoAdjunto.objects.values_list('documento_id', 'origen'))
+        pendientes = [
+            pk for pk, nombre in
+            Documento.objects.exclude(adjunto='').exclude(adjunto__isnull=True)
+            .values_list('pk', 'adjunto').iterator(chunk_size=2000)
+            if options['force'] or extraidos.get(pk) != nombre
+        ]
+        self.stdout.write(f"{len(pendientes)} adjunto(s) pendiente(s)")
+        if options['dry_run']:
+            return
+
+        for pk in pendientes:
+            extraer_texto_documento(pk, forzar=options['force'])
+
+        resumen = dict.fromkeys(dict(TextoAdjunto.ESTADOS), 0)
+        for estado in TextoAdjunto.objects.filter(documento_id__in=pendientes).values_list('estado', flat=True):
+            resumen[estado] += 1
+        self.stdout.write(self.style.SUCCESS(
+            "Extracción terminada: " + ", ".join(f"{estado}: {total}" for estado, total in resumen.items())
+        ))
@@ -0,0 +1,58 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from lecturas.imagenes import CAMPOS_IMAGEN, FORMATOS, procesar_imagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las versiones AVIF/WebP a varios anchos de las imágenes de documentos "
+        "y comentarios que aún no las tienen (o de todas con --force)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo',
+            choices=['documento', 'comentario'],
+            help='Procesa solo las imágenes de este modelo.',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenera también los derivados que ya existen.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo cuenta las imágenes pendientes, sin generar nada.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Formatos disponibles: {', '.join(FORMATOS) or 'ninguno'}")
+        for modelo_label, campo in CAMPOS_IMAGEN.items():
+            modelo = apps.get_model(modelo_label)
+            if options['modelo'] and modelo._meta.model_name != options['modelo']:
+                continue
+
+            queryset = modelo.objects.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+            pendientes = [
+                (pk, nombre) for pk, nombre, derivados in
+                queryset.values_list('pk', campo, 'imagen_derivados').iterator(chunk_size=2000)
+                if options['force'] or (derivados or {}).get('origen') != nombre
+            ]
+            self.stdout.write(f"{modelo_label}: {len(pendientes)} imagen(es) pendiente(s)")
+            if options['dry_run']:
+                continue
+
+            errores = 0
+            for pk, nombre in pendientes:
+                try:
+                    procesar_imagen(modelo_label, pk, forzar=options['force'])
+                except Exception as e:
+                    errores += 1
+                    self.stderr.write(f"  {modelo_label} {pk} ({nombre}): {e}")
+
+            estilo = self.style.WARNING if errores else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f"{modelo_label}: {len(pendientes) - errores} procesada(s), {errores} con errores."
+            ))
@@ -0,0 +1,92 @@
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from lecturas.importacion import (
+    HILOS_SUBIDA, TAMANIO_LOTE, ErrorManifiesto, importar_lecturas, leer_manifiesto,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa lecturas en bloque desde un manifiesto CSV/JSON y una carpeta con "
+        "los adjuntos e imágenes. El progreso se guarda tras cada lote, así que si "
+        "se interrumpe basta con volver a ejecutarlo para continuar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifiesto', help='Ruta del manifiesto (.csv o .json).')
+        parser.add_argument(
+            '--archivos',
+            help='Carpeta con los archivos del manifiesto (por defecto, la del manifiesto).',
+        )
+        parser.add_argument(
+            '--usuario',
+            required=True,
+            help='Nombre de usuario que figurará como autor de la subida.',
+        )
+        parser.add_argument(
+            '--progreso',
+            help='Archivo de progreso (por defecto, <manifiesto>.progreso.json).',
+        )
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Ignora el progreso guardado y vuelve a importar todas las filas.',
+        )
+        parser.add_argument('--hilos', type=int, default=HILOS_SUBIDA, help='Subidas de archivos en paralelo.')
+        parser.add_argument('--lote', type=int, default=TAMANIO_LOTE, help='Documentos por lote.')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida el manifiesto y los archivos sin crear nada.',
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['manifiesto']
+        try:
+            with open(ruta, 'rb') as archivo:
+                filas = leer_manifiesto(ruta, archivo.read())
+        except (OSError, ErrorManifiesto) as e:
+            raise CommandError(f"No se pudo leer el manifiesto: {e}")
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        directorio = options['archivos'] or os.path.dirname(os.path.abspath(ruta))
+        ruta_progreso = options['progreso'] or f"{ruta}.progreso.json"
+        importados = {}
+        if os.path.exists(ruta_progreso) and not options['reiniciar']:
+            with open(ruta_progreso, encoding='utf-8') as archivo:
+                importados = json.load(archivo).get('importados', {})
+            self.stdout.write(f"Reanudando: {len(importados)} fila(s) ya importada(s) según {ruta_progreso}")
+
+        def guardar_progreso(importados):
+            # Se escribe a un temporal y se renombra para no dejar el archivo a medias
+            temporal = f"{ruta_progreso}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump({'manifiesto': os.path.abspath(ruta), 'importados': importados}, archivo)
+            os.replace(temporal, ruta_progreso)
+            self.stdout.write(f"  {len(importados)} fila(s) importada(s)")
+
+        resumen = importar_lecturas(
+            filas, directorio, usuario,
+            importados=importados,
+            dry_run=options['dry_run'],
+            hilos=max(1, options['hilos']),
+            tamanio_lote=max(1, options['lote']),
+            al_terminar_lote=guardar_progreso,
+        )
+
+        for numero, mensajes in resumen['errores']:
+            self.stderr.write(f"  Fila {numero}: {' '.join(mensajes)}")
+        prefijo = "[dry-run] Se crearían" if options['dry_run'] else "Creadas"
+        estilo = self.style.WARNING if resumen['errores'] else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{prefijo} {resumen['creados']} lectura(s), {resumen['autores']} autor(es) y "
+            f"{resumen['generos']} género(s) nuevos; {resumen['omitidos']} ya importada(s), "
+            f"{len(resumen['errores'])} fila(s) con errores."
+        ))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from lecturas.models import Documento, Calificacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la suma, el total y el histograma de estrellas almacenados en cada "
+        "Documento a partir de la tabla de Calificaciones, y corrige las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa de los documentos desajustados, sin guardar cambios.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de documentos por cada bulk_update (por defecto 500).',
+        )
+
+    def handle(self, *args, **options):
+        campos = Documento.CAMPOS_CALIFICACION
+
+        # Una sola consulta agrupada con todos los agregados por documento
+        agregados = Calificacion.objects.values('documento_id').annotate(
+            suma_calificaciones=Sum('puntuacion'),
+            total_calificaciones=Count('id'),
+            **{
+                f'estrellas_{n}': Count('id', filter=Q(puntuacion=n))
+                for n in range(1, 6)
+            },
+        )
+        esperados = {fila.pop('documento_id'): fila for fila in agregados}
+        vacio = dict.fromkeys(campos, 0)
+
+        desajustados = []
+        for documento in Documento.objects.only('pk', *campos).iterator(chunk_size=2000):
+            esperado = esperados.get(documento.pk, vacio)
+            if any(getattr(documento, campo) != esperado[campo] for campo in campos):
+                for campo in campos:
+                    setattr(documento, campo, esperado[campo])
+                desajustados.append(documento)
+
+        if options['dry_run']:
+            for documento in desajustados:
+                self.stdout.write(f"  Documento {documento.pk}: desajustado")
+            self.stdout.write(self.style.WARNING(
+                f"{len(desajustados)} documento(s) con agregados desajustados (dry-run, sin cambios)."
+            ))
+            return
+
+        with transaction.atomic():
+            Documento.objects.bulk_update(desajustados, campos, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Agregados de calificaciones reconciliados: {len(desajustados)} documento(s) corregido(s)."
+        ))
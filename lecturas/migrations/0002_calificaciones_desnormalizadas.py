@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='estrellas_1',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Votos de 1 estrella'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='estrellas_2',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Votos de 2 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='estrellas_3',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Votos de 3 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='estrellas_4',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Votos de 4 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='estrellas_5',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Votos de 5 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='suma_calificaciones',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='total_calificaciones',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='documento',
+            name='grado',
+            field=models.CharField(choices=[('general', 'General'), ('primero', 'Primero'), ('segundo', 'Segundo'), ('tercero', 'Tercero'), ('cuarto', 'Cuarto'), ('quinto', 'Quinto'), ('sexto', 'Sexto'), ('septimo', 'Séptimo'), ('octavo', 'Octavo'), ('noveno', 'Noveno'), ('decimo', 'Décimo'), ('once', 'Once'), ('docentes', 'Profesores'), ('directivos', 'Directivos')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:23
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import imago.postgres
+from django.conf import settings
+from django.db import migrations
+
+
+def poblar_search_vector(apps, schema_editor):
+    from lecturas.busqueda import actualizar_vector_busqueda
+    Documento = apps.get_model('lecturas', 'Documento')
+    actualizar_vector_busqueda(documento_model=Documento)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0002_calificaciones_desnormalizadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        imago.postgres.AddIndexSoloPostgres(
+            model_name='documento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='documento_search_vector_gin'),
+        ),
+        migrations.RunPython(poblar_search_vector, migrations.RunPython.noop),
+    ]
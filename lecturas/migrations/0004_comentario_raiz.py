@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_raiz(apps, schema_editor):
+    Comentario = apps.get_model('lecturas', 'Comentario')
+    padres = dict(Comentario.objects.values_list('pk', 'parent_id'))
+
+    def buscar_raiz(pk):
+        while padres[pk] is not None:
+            pk = padres[pk]
+        return pk
+
+    respuestas = []
+    for comentario in Comentario.objects.filter(parent__isnull=False).only('pk'):
+        comentario.raiz_id = buscar_raiz(comentario.pk)
+        respuestas.append(comentario)
+    Comentario.objects.bulk_update(respuestas, ['raiz'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0003_documento_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='raiz',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='descendientes', to='lecturas.comentario'),
+        ),
+        migrations.RunPython(poblar_raiz, migrations.RunPython.noop),
+    ]
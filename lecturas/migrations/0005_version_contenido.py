@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0004_comentario_raiz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='version_contenido',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0005_version_contenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='imagen_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='imagen_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0006_imagen_derivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextoAdjunto',
+            fields=[
+                ('documento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='texto_adjunto', serialize=False, to='lecturas.documento')),
+                ('origen', models.CharField(max_length=255)),
+                ('estado', models.CharField(choices=[('listo', 'Listo'), ('no_soportado', 'Formato no soportado'), ('error', 'Error')], max_length=15)),
+                ('texto', models.TextField(blank=True)),
+                ('paginas', models.JSONField(blank=True, default=list)),
+                ('num_paginas', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('fecha_extraccion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Texto de adjunto',
+                'verbose_name_plural': 'Textos de adjuntos',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0008_documento_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['documento', 'fecha_creacion', 'id'], name='comentario_doc_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['date', 'id'], name='documento_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:48
+
+import django.contrib.postgres.indexes
+import imago.postgres
+from django.db import migrations, models
+
+
+def poblar_nombre_normalizado(apps, schema_editor):
+    from lecturas.models import normalizar_nombre
+    for nombre_modelo in ('Autor', 'Genero'):
+        modelo = apps.get_model('lecturas', nombre_modelo)
+        objetos = list(modelo.objects.only('pk', 'nombre'))
+        for objeto in objetos:
+            objeto.nombre_normalizado = normalizar_nombre(objeto.nombre)
+        modelo.objects.bulk_update(objetos, ['nombre_normalizado'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0009_comentario_comentario_doc_fecha_idx_and_more'),
+    ]
+
+    operations = [
+        imago.postgres.CrearExtensionSiDisponible('pg_trgm'),
+        migrations.AddField(
+            model_name='autor',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='genero',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(poblar_nombre_normalizado, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='autor',
+            index=models.Index(fields=['nombre_normalizado'], name='autor_nombre_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        imago.postgres.AddIndexSoloPostgres(
+            model_name='autor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nombre_normalizado'], name='autor_nombre_trgm_idx', opclasses=['gin_trgm_ops']),
+            extension='pg_trgm',
+        ),
+        migrations.AddIndex(
+            model_name='genero',
+            index=models.Index(fields=['nombre_normalizado'], name='genero_nombre_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        imago.postgres.AddIndexSoloPostgres(
+            model_name='genero',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nombre_normalizado'], name='genero_nombre_trgm_idx', opclasses=['gin_trgm_ops']),
+            extension='pg_trgm',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0010_autocompletado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('vistas', models.PositiveIntegerField(default=0, verbose_name='Vistas del detalle')),
+                ('descargas', models.PositiveIntegerField(default=0, verbose_name='Aperturas del adjunto')),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitas_diarias', to='lecturas.documento')),
+            ],
+            options={
+                'verbose_name': 'Visitas diarias',
+                'verbose_name_plural': 'Visitas diarias',
+                'indexes': [models.Index(fields=['fecha', 'documento'], name='visita_fecha_documento_idx')],
+                'constraints': [models.UniqueConstraint(fields=('documento', 'fecha'), name='visita_diaria_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0011_visitas_diarias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('puntuacion', models.FloatField()),
+                ('origen', models.CharField(choices=[('calificaciones', 'Calificaciones de los usuarios'), ('contenido', 'Géneros y grado')], max_length=15)),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recomendaciones', to='lecturas.documento')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recomendado_en', to='lecturas.documento')),
+            ],
+            options={
+                'verbose_name': 'Documento similar',
+                'verbose_name_plural': 'Documentos similares',
+                'ordering': ['documento', 'posicion'],
+                'constraints': [models.UniqueConstraint(fields=('documento', 'posicion'), name='documento_similar_posicion_unica')],
+            },
+        ),
+    ]
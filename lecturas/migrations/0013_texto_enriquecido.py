@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+def rellenar_texto_enriquecido(apps, schema_editor):
+    from imago.texto_enriquecido import rellenar
+    rellenar(apps.get_model('lecturas', 'Documento'), ['descripcion'])
+    rellenar(apps.get_model('lecturas', 'Comentario'), ['contenido'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0012_documento_similar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='contenido_extracto',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='comentario',
+            name='contenido_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='comentario',
+            name='contenido_palabras',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='descripcion_extracto',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='descripcion_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='descripcion_palabras',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rellenar_texto_enriquecido, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturas', '0013_texto_enriquecido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitanteDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(max_length=10)),
+                ('visitante', models.CharField(max_length=32)),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lecturas.documento')),
+            ],
+            options={
+                'verbose_name': 'Visitante diario',
+                'verbose_name_plural': 'Visitantes diarios',
+                'indexes': [models.Index(fields=['fecha'], name='visitante_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('documento', 'fecha', 'tipo', 'visitante'), name='visitante_diario_unico')],
+            },
+        ),
+    ]
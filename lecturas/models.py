@@ -1,8 +1,16 @@
+import hashlib
+import unicodedata
+from collections import defaultdict
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django_ckeditor_5.fields import CKEditor5Field
 from django.core.validators import MinValueValidator, MaxValueValidator
+from imago.autoguardado import VersionadoMixin
+from imago.texto_enriquecido import TextoEnriquecidoMixin
 
 # Create your models here.
 def ruta_de_subida(instance, filename):
@@ -79,9 +87,29 @@ ELEGIR_IDIOMA = [
         ('en', 'Inglés') 
 ]
 
+def normalizar_nombre(texto):
+    """Minúsculas y sin tildes ni espacios repetidos, para el autocompletado."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+def indices_autocompletado(prefijo):
+    """Índices de `nombre_normalizado`: B-tree para prefijos y GIN de trigramas."""
+    return [
+        models.Index(fields=['nombre_normalizado'], name=f'{prefijo}_nombre_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        GinIndex(fields=['nombre_normalizado'], name=f'{prefijo}_nombre_trgm_idx', opclasses=['gin_trgm_ops']),
+    ]
+
+
 class Genero(models.Model):
     nombre = models.CharField(max_length=100, unique=True, verbose_name="Nombre del Género")
     slug = models.SlugField(unique=True, help_text="Versión amigable para URL, se genera automáticamente.")
+    # Nombre sin tildes en minúsculas, para el autocompletado (ver lecturas/autocompletado.py)
+    nombre_normalizado = models.CharField(max_length=100, blank=True, editable=False)
+
+    class Meta:
+        indexes = indices_autocompletado('genero')
 
     def __str__(self):
         return self.nombre
@@ -90,23 +118,34 @@ class Genero(models.Model):
         if not self.slug:
             from django.utils.text import slugify
             self.slug = slugify(self.nombre)
+        self.nombre_normalizado = normalizar_nombre(self.nombre)
         super().save(*args, **kwargs)
 
 class Autor(models.Model):
     nombre = models.CharField(max_length=200, verbose_name="Nombre del Autor")
     biografia = models.TextField(blank=True, verbose_name="Biografía")
+    nombre_normalizado = models.CharField(max_length=200, blank=True, editable=False)
+
+    class Meta:
+        indexes = indices_autocompletado('autor')
 
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizar_nombre(self.nombre)
+        super().save(*args, **kwargs)
+
 
-class Documento(models.Model):
+class Documento(TextoEnriquecidoMixin, VersionadoMixin, models.Model):
     idioma = models.CharField(max_length=2, choices=ELEGIR_IDIOMA, default='es')
     titulo = models.CharField(max_length=200)
     grado = models.CharField(max_length=10, choices=ELEGIR_GRADO)
     descripcion = CKEditor5Field(config_name='default', blank=True)
     adjunto = models.FileField(upload_to=ruta_de_subida, blank=True, null=True)
     imagen = models.ImageField(upload_to=ruta_imagenes, blank=True, null=True)
+    # Versiones AVIF/WebP de `imagen` a varios anchos (ver lecturas/imagenes.py)
+    imagen_derivados = models.JSONField(default=dict, blank=True, editable=False)
     date = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, default=None)
 
@@ -120,38 +159,195 @@ class Documento(models.Model):
     ]
     nivel_dificultad = models.CharField(max_length=15, choices=NIVEL_DIFICULTAD, default='intermedio', verbose_name="Nivel de Dificultad")
 
+    # Agregados de calificaciones desnormalizados. Se mantienen desde las señales
+    # de Calificacion y se reconstruyen con `manage.py recalcular_calificaciones`.
+    suma_calificaciones = models.PositiveIntegerField(default=0, editable=False)
+    total_calificaciones = models.PositiveIntegerField(default=0, editable=False)
+    estrellas_1 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Votos de 1 estrella")
+    estrellas_2 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Votos de 2 estrellas")
+    estrellas_3 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Votos de 3 estrellas")
+    estrellas_4 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Votos de 4 estrellas")
+    estrellas_5 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Votos de 5 estrellas")
+
+    CAMPOS_CALIFICACION = [
+        'suma_calificaciones', 'total_calificaciones',
+        'estrellas_1', 'estrellas_2', 'estrellas_3', 'estrellas_4', 'estrellas_5',
+    ]
+
+    # tsvector ponderado para la búsqueda del catálogo (ver lecturas/busqueda.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Campos que alimentan search_vector; si un guardado no toca ninguno no se recalcula
+    CAMPOS_BUSQUEDA = ['titulo', 'idioma', 'descripcion', 'autor_principal']
+
+    # Sello de versión del contenido renderizado (descripción + visor del adjunto).
+    # Forma parte de la clave de caché de render_content_with_attachment.
+    version_contenido = models.PositiveIntegerField(default=1, editable=False)
+    CAMPOS_CONTENIDO = ['titulo', 'descripcion', 'adjunto']
+
+    # Versiones precalculadas de `descripcion` (imago/texto_enriquecido.py)
+    descripcion_html = models.TextField(blank=True, default='', editable=False)
+    descripcion_extracto = models.CharField(max_length=300, blank=True, default='', editable=False)
+    descripcion_palabras = models.PositiveIntegerField(default=0, editable=False)
+    CAMPOS_TEXTO_ENRIQUECIDO = ['descripcion']
+
+    # Campos que admite el autoguardado del formulario (ver imago/autoguardado.py)
+    CAMPOS_AUTOGUARDADO = [
+        'titulo', 'idioma', 'grado', 'autor_principal', 'generos', 'nivel_dificultad', 'descripcion',
+    ]
+
     @property
     def calificacion_promedio(self):
-        # Usamos .aggregate() para obtener el promedio directamente de la BD
-        from django.db.models import Avg
-        promedio = self.calificaciones.aggregate(Avg('puntuacion'))['puntuacion__avg']
-        return round(promedio, 1) if promedio is not None else 0
+        # Se calcula a partir de los agregados almacenados, sin consultar la BD
+        if not self.total_calificaciones:
+            return 0
+        return round(self.suma_calificaciones / self.total_calificaciones, 1)
 
     @property
     def num_calificaciones(self):
-        return self.calificaciones.count()
+        return self.total_calificaciones
+
+    @property
+    def version_adjunto(self):
+        """
+        Huella corta del adjunto actual, usada para versionar la URL de serve_file.
+        Incluye version_contenido, que save() incrementa al cambiar el adjunto:
+        el nombre solo no basta, porque se reutiliza al volver a subir un archivo
+        con el mismo nombre una vez borrado el anterior.
+        """
+        if not self.adjunto:
+            return ''
+        return hashlib.md5(f'{self.version_contenido}:{self.adjunto.name}'.encode()).hexdigest()[:12]
+
+    @property
+    def histograma_calificaciones(self):
+        """
+        Devuelve una lista de (estrellas, votos, porcentaje) de 5 a 1 estrellas.
+        """
+        total = self.total_calificaciones
+        histograma = []
+        for estrellas in range(5, 0, -1):
+            votos = getattr(self, f'estrellas_{estrellas}')
+            porcentaje = round(votos * 100 / total) if total else 0
+            histograma.append((estrellas, votos, porcentaje))
+        return histograma
+
+    @classmethod
+    def ajustar_calificaciones(cls, documento_id, anterior=None, nueva=None):
+        """
+        Aplica de forma atómica (con expresiones F) el cambio de una calificación
+        sobre los agregados almacenados del documento.
+        - anterior=None: la calificación es nueva.
+        - nueva=None: la calificación se ha borrado.
+        """
+        if anterior == nueva:
+            return
+        deltas = defaultdict(int)
+        if anterior is not None:
+            deltas['suma_calificaciones'] -= anterior
+            deltas['total_calificaciones'] -= 1
+            deltas[f'estrellas_{anterior}'] -= 1
+        if nueva is not None:
+            deltas['suma_calificaciones'] += nueva
+            deltas['total_calificaciones'] += 1
+            deltas[f'estrellas_{nueva}'] += 1
+        cambios = {campo: F(campo) + delta for campo, delta in deltas.items() if delta}
+        if cambios:
+            cls.objects.filter(pk=documento_id).update(**cambios)
+
+    @classmethod
+    def texto_enriquecido_rellenado(cls, pks):
+        # Cambia la clave del HTML cacheado del detalle (clave_contenido)
+        cls.objects.filter(pk__in=pks).update(version_contenido=F('version_contenido') + 1)
+
+    def save(self, *args, **kwargs):
+        # Cualquier cambio en el contenido invalida el HTML cacheado del detalle
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.CAMPOS_CONTENIDO):
+            if self.pk:
+                self.version_contenido = (self.version_contenido or 0) + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version_contenido'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='documento_search_vector_gin'),
+            # Paginación por cursor del catálogo (imago/paginacion.py)
+            models.Index(fields=['date', 'id'], name='documento_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"({self.get_idioma_display()}) {self.titulo}"
     
 
-class Comentario(models.Model):
+class Comentario(TextoEnriquecidoMixin, models.Model):
     documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='comentarios')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='hijos')
+    # Comentario principal del hilo (vacío en los principales). Permite cargar un hilo
+    # completo con una sola consulta; ver lecturas/comentarios.py.
+    raiz = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='descendientes')
     autor = models.ForeignKey(User, on_delete=models.CASCADE)
     contenido = CKEditor5Field(config_name='comments', verbose_name="Comentarios")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     adjunto_comentario = models.FileField(upload_to=ruta_subida_comentario, blank=True, null=True)
     imagen_comentario = models.ImageField(upload_to=ruta_imagenes_comentario, blank=True, null=True)
+    imagen_derivados = models.JSONField(default=dict, blank=True, editable=False)
+    # Versiones precalculadas de `contenido` (imago/texto_enriquecido.py)
+    contenido_html = models.TextField(blank=True, default='', editable=False)
+    contenido_extracto = models.CharField(max_length=300, blank=True, default='', editable=False)
+    contenido_palabras = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_TEXTO_ENRIQUECIDO = ['contenido']
 
     class Meta:
         verbose_name = "Comentario"
         verbose_name_plural = "Comentarios"
         ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['documento', 'fecha_creacion', 'id'], name='comentario_doc_fecha_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.parent_id and not self.raiz_id:
+            self.raiz_id = self.parent.raiz_id or self.parent_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'Comentario de {self.autor.username} en {self.documento.titulo}'
     
+class TextoAdjunto(models.Model):
+    """
+    Texto plano y versión HTML paginada extraídos del adjunto de un Documento
+    (ver lecturas/extraccion.py). Se guarda aparte para no cargar el texto
+    completo en los listados.
+    """
+    ESTADO_LISTO = 'listo'
+    ESTADO_NO_SOPORTADO = 'no_soportado'
+    ESTADO_ERROR = 'error'
+    ESTADOS = [
+        (ESTADO_LISTO, 'Listo'),
+        (ESTADO_NO_SOPORTADO, 'Formato no soportado'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    documento = models.OneToOneField(Documento, on_delete=models.CASCADE, primary_key=True, related_name='texto_adjunto')
+    # Nombre del adjunto del que se extrajo; si no coincide con el actual, está desactualizado
+    origen = models.CharField(max_length=255)
+    estado = models.CharField(max_length=15, choices=ESTADOS)
+    texto = models.TextField(blank=True)
+    paginas = models.JSONField(default=list, blank=True)
+    num_paginas = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    fecha_extraccion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Texto de adjunto"
+        verbose_name_plural = "Textos de adjuntos"
+
+    def __str__(self):
+        return f'Texto de {self.origen} ({self.get_estado_display()})'
+
+
 class Calificacion(models.Model):
     documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='calificaciones')
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calificaciones')
@@ -166,5 +362,96 @@ class Calificacion(models.Model):
         verbose_name = "Calificación"
         verbose_name_plural = "Calificaciones"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guardamos la puntuación leída de la BD para que las señales puedan
+        # calcular la diferencia al actualizar los agregados del documento.
+        instance = super().from_db(db, field_names, values)
+        instance._puntuacion_guardada = dict(zip(field_names, values)).get('puntuacion')
+        return instance
+
+    def __str__(self):
+        return f'{self.usuario.username} calificó "{self.documento.titulo}" con {self.puntuacion} estrellas'
+
+class VisitaDiaria(models.Model):
+    """
+    Contadores por documento y día. Se escriben en lotes desde el búfer de
+    lecturas/visitas.py, no una fila por visita.
+    """
+    documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='visitas_diarias')
+    fecha = models.DateField()
+    vistas = models.PositiveIntegerField(default=0, verbose_name="Vistas del detalle")
+    descargas = models.PositiveIntegerField(default=0, verbose_name="Aperturas del adjunto")
+
+    class Meta:
+        verbose_name = "Visitas diarias"
+        verbose_name_plural = "Visitas diarias"
+        constraints = [
+            models.UniqueConstraint(fields=['documento', 'fecha'], name='visita_diaria_unica'),
+        ]
+        indexes = [
+            # Ranking de "más leídas" de los últimos días
+            models.Index(fields=['fecha', 'documento'], name='visita_fecha_documento_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.documento_id} el {self.fecha}: {self.vistas} vistas, {self.descargas} descargas'
+
+
+class VisitanteDiario(models.Model):
+    """
+    Visitantes que ya contaron hoy para cada documento y tipo de visita (un
+    hash de su sesión, o de su IP y navegador). Con ella se descartan las
+    visitas repetidas al volcar el búfer de lecturas/visitas.py, aunque
+    lleguen por workers o instancias distintas. Solo se guardan los dos
+    últimos días.
+    """
+    documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='+')
+    fecha = models.DateField()
+    tipo = models.CharField(max_length=10)
+    visitante = models.CharField(max_length=32)
+
+    class Meta:
+        verbose_name = "Visitante diario"
+        verbose_name_plural = "Visitantes diarios"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['documento', 'fecha', 'tipo', 'visitante'], name='visitante_diario_unico',
+            ),
+        ]
+        indexes = [
+            # Limpieza de los días anteriores
+            models.Index(fields=['fecha'], name='visitante_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.visitante} en {self.documento_id} el {self.fecha} ({self.tipo})'
+
+
+class DocumentoSimilar(models.Model):
+    """
+    Vecinos precalculados de cada documento para "Lecturas similares".
+    Los reconstruye `manage.py calcular_recomendaciones` (ver lecturas/recomendaciones.py).
+    """
+    ORIGENES = [
+        ('calificaciones', 'Calificaciones de los usuarios'),
+        ('contenido', 'Géneros y grado'),
+    ]
+
+    documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='recomendaciones')
+    similar = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='recomendado_en')
+    posicion = models.PositiveSmallIntegerField()
+    puntuacion = models.FloatField()
+    origen = models.CharField(max_length=15, choices=ORIGENES)
+
+    class Meta:
+        verbose_name = "Documento similar"
+        verbose_name_plural = "Documentos similares"
+        ordering = ['documento', 'posicion']
+        constraints = [
+            # También es el índice de la consulta del detalle (documento, posición)
+            models.UniqueConstraint(fields=['documento', 'posicion'], name='documento_similar_posicion_unica'),
+        ]
+
     def __str__(self):
-        return f'{self.usuario.username} calificó "{self.documento.titulo}" con {self.puntuacion} estrellas'
\ No newline at end of file
+        return f'{self.documento_id} -> {self.similar_id} ({self.puntuacion:.2f}, {self.origen})'
@@ -0,0 +1,219 @@
+"""
+"Lecturas similares" precalculadas por lotes.
+
+`calcular_recomendaciones()` (lo usa `manage.py calcular_recomendaciones`)
+calcula con NumPy la similitud del coseno ítem-ítem entre las filas de la
+matriz documento x usuario de Calificacion, por bloques de filas:
+
+    similitud = R_bloque · Rᵀ   (con las filas de R normalizadas)
+
+R no se construye nunca en denso: las calificaciones se guardan dispersas por
+usuario (formato CSC: para cada usuario, los documentos que calificó) y cada
+bloque solo recorre los pares de calificaciones de un mismo usuario. La
+memoria es O(calificaciones) más O(TAMANIO_BLOQUE x documentos) por las
+matrices de cada bloque, y los pares se procesan en tandas de LIMITE_PARES.
+
+Para cada documento se guardan los `vecinos` más parecidos en DocumentoSimilar:
+
+1. primero los de las calificaciones (al menos MINIMO_COINCIDENCIAS lectores
+   en común, para no fiarse de un solo voto);
+2. si no llegan (documentos nuevos o sin votos), se completan por contenido:
+   mismo idioma, parecido de géneros (Jaccard) y mismo grado. Las visitas de
+   los últimos días (VisitaDiaria) desempatan a favor de las más leídas.
+
+Las visitas no se usan en la matriz porque se cuentan de forma anónima
+(no hay usuario por visita). El detalle del documento solo lee las filas
+guardadas, con una consulta por el índice (documento, posicion).
+"""
+import datetime
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Calificacion, Documento, DocumentoSimilar, VisitaDiaria
+
+logger = logging.getLogger(__name__)
+
+VECINOS = 8
+MINIMO_COINCIDENCIAS = 2
+TAMANIO_BLOQUE = 512
+# Pares (calificación del bloque, calificación del mismo usuario) por tanda
+LIMITE_PARES = 1 << 22
+# Peso de cada parte de la similitud por contenido
+PESO_GENEROS = 0.7
+PESO_GRADO = 0.3
+PESO_POPULARIDAD = 0.01
+DIAS_POPULARIDAD = 30
+
+
+def _indices(valores):
+    """Array con el índice de cada valor en la lista de valores distintos."""
+    posiciones = {}
+    return np.array([posiciones.setdefault(valor, len(posiciones)) for valor in valores], dtype=np.int32)
+
+
+def _calificaciones_por_usuario(pks):
+    """
+    Calificaciones en formato disperso por columnas: (inicio, usuarios,
+    documentos, valores), ordenadas por usuario, de modo que las del usuario
+    u ocupan [inicio[u], inicio[u + 1]). `documentos` son posiciones en `pks`
+    (ordenado) y `valores` las puntuaciones divididas por la norma de la fila
+    de su documento.
+    """
+    filas = np.array(
+        list(Calificacion.objects.values_list('usuario_id', 'documento_id', 'puntuacion')), dtype=np.int64,
+    ).reshape(-1, 3)
+    return _dispersa(filas, pks)
+
+
+def _dispersa(filas, pks):
+    # Se ignoran las calificaciones de documentos creados después de leer `pks`
+    posiciones = np.minimum(np.searchsorted(pks, filas[:, 1]), max(len(pks) - 1, 0))
+    filas = filas[pks[posiciones] == filas[:, 1]] if len(pks) else filas[:0]
+    documentos = np.searchsorted(pks, filas[:, 1])
+    usuarios = np.unique(filas[:, 0], return_inverse=True)[1].ravel()
+    puntuaciones = filas[:, 2].astype(np.float64)
+    normas = np.sqrt(np.bincount(documentos, weights=puntuaciones ** 2, minlength=len(pks)))
+    valores = puntuaciones / np.where(normas > 0, normas, 1)[documentos]
+
+    orden = np.lexsort((documentos, usuarios))
+    inicio = np.zeros(len(np.unique(usuarios)) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(usuarios), out=inicio[1:])
+    return inicio, usuarios[orden], documentos[orden], valores[orden]
+
+
+def _similitud_bloque(calificaciones, desde, hasta, num_documentos):
+    """
+    (coseno, lectores en común) entre los documentos [desde, hasta) y todos,
+    recorriendo solo los pares de calificaciones de un mismo usuario.
+    """
+    inicio, usuarios, documentos, valores = calificaciones
+    filas = hasta - desde
+    coseno = np.zeros(filas * num_documentos, dtype=np.float64)
+    coincidencias = np.zeros(filas * num_documentos, dtype=np.int64)
+
+    propias = np.flatnonzero((documentos >= desde) & (documentos < hasta))
+    companeras = inicio[usuarios[propias] + 1] - inicio[usuarios[propias]]
+    # Tandas de como mucho LIMITE_PARES pares (o de una sola calificación si tiene más)
+    acumulado = np.cumsum(companeras)
+    total = int(acumulado[-1]) if len(acumulado) else 0
+    cortes = np.searchsorted(acumulado, np.arange(LIMITE_PARES, total, LIMITE_PARES), side='right')
+    for tanda, cuantas in zip(np.split(propias, cortes), np.split(companeras, cortes)):
+        pares = int(cuantas.sum())
+        if not pares:
+            continue
+        # Cada calificación del bloque con todas las del mismo usuario
+        izquierda = np.repeat(tanda, cuantas)
+        desplazamiento = np.arange(pares) - np.repeat(np.cumsum(cuantas) - cuantas, cuantas)
+        derecha = np.repeat(inicio[usuarios[tanda]], cuantas) + desplazamiento
+        celdas = (documentos[izquierda] - desde) * num_documentos + documentos[derecha]
+        coseno += np.bincount(celdas, weights=valores[izquierda] * valores[derecha], minlength=len(coseno))
+        coincidencias += np.bincount(celdas, minlength=len(coincidencias))
+    return (
+        coseno.astype(np.float32).reshape(filas, num_documentos),
+        coincidencias.reshape(filas, num_documentos),
+    )
+
+
+def _matriz_generos(pks, posicion_documento):
+    filas = list(
+        Documento.generos.through.objects.filter(documento_id__in=pks).values_list('documento_id', 'genero_id')
+    )
+    posicion_genero = {genero: i for i, genero in enumerate(sorted({g for _, g in filas}))}
+    matriz = np.zeros((len(pks), len(posicion_genero)), dtype=np.float32)
+    for documento, genero in filas:
+        matriz[posicion_documento[documento], posicion_genero[genero]] = 1
+    return matriz
+
+
+def _popularidad(pks, posicion_documento):
+    """Visitas recientes de cada documento, normalizadas a [0, 1]."""
+    desde = timezone.localdate() - datetime.timedelta(days=DIAS_POPULARIDAD)
+    popularidad = np.zeros(len(pks), dtype=np.float32)
+    for documento, total in (
+        VisitaDiaria.objects.filter(fecha__gte=desde).values('documento')
+        .annotate(total=Sum('vistas') + Sum('descargas')).values_list('documento', 'total')
+    ):
+        if documento in posicion_documento:
+            popularidad[posicion_documento[documento]] = total
+    maximo = popularidad.max() if len(popularidad) else 0
+    return popularidad / maximo if maximo else popularidad
+
+
+def calcular_recomendaciones(vecinos=VECINOS, tamanio_bloque=TAMANIO_BLOQUE):
+    """
+    Devuelve (lista de DocumentoSimilar sin guardar, resumen) con los
+    `vecinos` más parecidos de cada documento.
+    """
+    documentos = list(Documento.objects.order_by('pk').values_list('pk', 'idioma', 'grado'))
+    resumen = {'documentos': len(documentos), 'calificaciones': 0, 'contenido': 0, 'sin_vecinos': 0}
+    if len(documentos) < 2:
+        return [], resumen
+
+    pks = np.array([pk for pk, _, _ in documentos])
+    posicion_documento = {pk: i for i, pk in enumerate(pks.tolist())}
+    idiomas = _indices([idioma for _, idioma, _ in documentos])
+    grados = _indices([grado for _, _, grado in documentos])
+
+    calificaciones = _calificaciones_por_usuario(pks)
+
+    generos = _matriz_generos(pks.tolist(), posicion_documento)
+    num_generos = generos.sum(axis=1)
+    popularidad = _popularidad(pks.tolist(), posicion_documento)
+
+    vecinos = min(vecinos, len(documentos) - 1)
+    resultado = []
+    for inicio in range(0, len(documentos), tamanio_bloque):
+        bloque = slice(inicio, inicio + tamanio_bloque)
+        filas = np.arange(inicio, min(inicio + tamanio_bloque, len(documentos)))
+
+        # Filtrado colaborativo: coseno entre filas de la matriz de calificaciones
+        coseno, coincidencias = _similitud_bloque(calificaciones, inicio, filas[-1] + 1, len(documentos))
+        colaborativo = (coseno > 0) & (coincidencias >= MINIMO_COINCIDENCIAS)
+
+        # Contenido: Jaccard de géneros y mismo grado, solo dentro del mismo idioma
+        interseccion = generos[bloque] @ generos.T
+        union = num_generos[bloque, None] + num_generos[None, :] - interseccion
+        jaccard = np.divide(interseccion, union, out=np.zeros_like(interseccion), where=union > 0)
+        contenido = (
+            PESO_GENEROS * jaccard
+            + PESO_GRADO * (grados[bloque, None] == grados[None, :])
+            + PESO_POPULARIDAD * popularidad[None, :]
+        ) * (idiomas[bloque, None] == idiomas[None, :])
+
+        # Las vecinas por calificaciones van siempre por delante (puntuación > 1)
+        puntuacion = np.where(colaborativo, 1 + coseno, contenido)
+        puntuacion[np.arange(len(filas)), filas] = 0
+
+        mejores = np.argpartition(-puntuacion, vecinos - 1, axis=1)[:, :vecinos]
+        for fila, candidatos in zip(range(len(filas)), mejores):
+            candidatos = candidatos[np.argsort(-puntuacion[fila, candidatos], kind='stable')]
+            posicion = 0
+            for candidato in candidatos:
+                valor = float(puntuacion[fila, candidato])
+                if valor <= 0:
+                    break
+                origen = 'calificaciones' if colaborativo[fila, candidato] else 'contenido'
+                resumen[origen] += 1
+                resultado.append(DocumentoSimilar(
+                    documento_id=int(pks[filas[fila]]),
+                    similar_id=int(pks[candidato]),
+                    posicion=posicion,
+                    puntuacion=valor - 1 if origen == 'calificaciones' else valor,
+                    origen=origen,
+                ))
+                posicion += 1
+            if not posicion:
+                resumen['sin_vecinos'] += 1
+    return resultado, resumen
+
+
+def guardar_recomendaciones(recomendaciones, tamanio_lote=1000):
+    """Sustituye todas las filas de DocumentoSimilar en una transacción."""
+    with transaction.atomic():
+        DocumentoSimilar.objects.all().delete()
+        DocumentoSimilar.objects.bulk_create(recomendaciones, batch_size=tamanio_lote)
+    logger.info(f"Recomendaciones guardadas: {len(recomendaciones)} fila(s)")
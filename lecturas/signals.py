@@ -0,0 +1,159 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Documento, Comentario, Calificacion, Autor, Genero
+from .busqueda import actualizar_vector_busqueda
+from .imagenes import programar_derivados, programar_borrado_derivados
+from .extraccion import programar_extraccion
+from . import autocompletado, facetas
+
+
+@receiver(pre_save, sender=Calificacion)
+def recordar_puntuacion_anterior(sender, instance, **kwargs):
+    """
+    Si la calificación no se cargó desde la BD (p. ej. se construyó a mano con su pk),
+    leemos la puntuación guardada para poder calcular la diferencia.
+    """
+    if instance.pk and not hasattr(instance, '_puntuacion_guardada'):
+        instance._puntuacion_guardada = (
+            Calificacion.objects.filter(pk=instance.pk)
+            .values_list('puntuacion', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Calificacion)
+def actualizar_agregados_al_guardar(sender, instance, created, **kwargs):
+    """
+    Mantiene la suma, el total y el histograma de estrellas del documento
+    dentro de la misma transacción en la que se guarda la calificación.
+    """
+    anterior = None if created else getattr(instance, '_puntuacion_guardada', None)
+    Documento.ajustar_calificaciones(instance.documento_id, anterior, instance.puntuacion)
+    instance._puntuacion_guardada = instance.puntuacion
+
+
+@receiver(post_delete, sender=Calificacion)
+def actualizar_agregados_al_borrar(sender, instance, **kwargs):
+    anterior = getattr(instance, '_puntuacion_guardada', instance.puntuacion)
+    Documento.ajustar_calificaciones(instance.documento_id, anterior, None)
+
+
+@receiver(post_save, sender=Documento)
+def actualizar_busqueda_documento(sender, instance, update_fields=None, **kwargs):
+    """Recalcula el search_vector cuando cambia algún campo indexado."""
+    if update_fields is not None and not set(update_fields) & set(Documento.CAMPOS_BUSQUEDA):
+        return
+    actualizar_vector_busqueda([instance.pk])
+
+
+@receiver(m2m_changed, sender=Documento.generos.through)
+def actualizar_busqueda_generos(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # En un clear desde el Género, Django no informa de los documentos afectados
+        instance._documentos_afectados = list(instance.documentos.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        actualizar_vector_busqueda([instance.pk])
+    elif action == 'post_clear':
+        actualizar_vector_busqueda(getattr(instance, '_documentos_afectados', []))
+    else:
+        actualizar_vector_busqueda(pk_set)
+
+
+@receiver(post_save, sender=Autor)
+def actualizar_busqueda_autor(sender, instance, created, **kwargs):
+    if not created:
+        actualizar_vector_busqueda(instance.documentos.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Genero)
+def actualizar_busqueda_genero(sender, instance, created, **kwargs):
+    if not created:
+        actualizar_vector_busqueda(instance.documentos.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Documento)
+@receiver(post_save, sender=Comentario)
+def generar_derivados_imagen(sender, instance, **kwargs):
+    """Genera en segundo plano las versiones responsive de la imagen si cambió."""
+    programar_derivados(instance)
+
+
+@receiver(post_delete, sender=Documento)
+@receiver(post_delete, sender=Comentario)
+def borrar_derivados_imagen(sender, instance, **kwargs):
+    programar_borrado_derivados(instance)
+
+
+@receiver(post_save, sender=Documento)
+def extraer_texto_adjunto(sender, instance, update_fields=None, **kwargs):
+    """
+    Extrae en segundo plano el texto del adjunto. Cubre subir_documento,
+    DocumentoUpdateView, subir_archivo_ajax y el admin.
+    """
+    programar_extraccion(instance, update_fields)
+
+
+@receiver(pre_save, sender=Documento)
+def recordar_celda_faceta(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and (update_fields is None or set(update_fields) & set(facetas.CAMPOS_FACETA)):
+        instance._celda_faceta = facetas.celda_documento(instance.pk)
+
+
+@receiver(post_save, sender=Documento)
+def actualizar_facetas_documento(sender, instance, created, **kwargs):
+    """Invalida el cubo de facetas si el documento cambió de idioma, grado o nivel."""
+    if created:
+        # Los géneros se asignan después y llegan por m2m_changed
+        facetas.ajustar([(None, facetas.celda_desde(instance))])
+        return
+    anterior = getattr(instance, '_celda_faceta', None)
+    if anterior is not None:
+        facetas.ajustar([(anterior, facetas.celda_desde(instance, anterior[3]))])
+        instance._celda_faceta = None
+
+
+@receiver(pre_delete, sender=Documento)
+def recordar_celda_faceta_al_borrar(sender, instance, **kwargs):
+    # Antes de borrar, mientras siguen existiendo sus filas de géneros
+    instance._celda_faceta = facetas.celda_documento(instance.pk)
+
+
+@receiver(post_delete, sender=Documento)
+def actualizar_facetas_al_borrar(sender, instance, **kwargs):
+    facetas.ajustar([(getattr(instance, '_celda_faceta', None), None)])
+
+
+@receiver(m2m_changed, sender=Documento.generos.through)
+def actualizar_facetas_generos(sender, instance, action, reverse, **kwargs):
+    if reverse:
+        # Desde el Género pueden cambiar muchos documentos a la vez
+        if action.startswith('post_'):
+            facetas.invalidar()
+        return
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        instance._celda_faceta_generos = facetas.celda_documento(instance.pk)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        facetas.ajustar([
+            (getattr(instance, '_celda_faceta_generos', None), facetas.celda_documento(instance.pk)),
+        ])
+
+
+@receiver(post_delete, sender=Genero)
+def actualizar_facetas_al_borrar_genero(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no envía m2m_changed
+    facetas.invalidar()
+
+
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+def invalidar_autocompletado_autores(sender, **kwargs):
+    autocompletado.invalidar('autor')
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+def invalidar_autocompletado_generos(sender, **kwargs):
+    autocompletado.invalidar('genero')
@@ -0,0 +1,29 @@
+"""
+Ejecución en segundo plano de los trabajos pesados de lecturas (derivados de
+imágenes, extracción de texto de adjuntos...).
+
+El proyecto no usa una cola de tareas: los trabajos se envían a un pool de
+hilos del propio proceso, normalmente desde transaction.on_commit para que
+vean los datos ya confirmados.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='lecturas')
+
+
+def en_segundo_plano(funcion, *args, **kwargs):
+    """Encola funcion(*args, **kwargs) en el pool; los errores se registran en el log."""
+    def tarea():
+        try:
+            funcion(*args, **kwargs)
+        except Exception:
+            logger.exception(f"Error en la tarea en segundo plano {funcion.__name__}{args}")
+        finally:
+            # Cada hilo del pool abre su propia conexión a la BD
+            connection.close()
+    return _ejecutor.submit(tarea)
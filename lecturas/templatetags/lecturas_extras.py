@@ -1,24 +1,44 @@
 from django import template
+from django.core.cache import cache
 from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
 
+from imago.postgres import resaltar
+from lecturas.imagenes import FORMATOS
+
 register = template.Library()
 
+# El HTML final se cachea por documento y versión de contenido; al editar el
+# documento cambia Documento.version_contenido y con ello la clave. Súbase
+# VERSION_RENDER si cambian _attachment_viewer.html, el marcador o el saneado.
+VERSION_RENDER = 1
+TIEMPO_CACHE_CONTENIDO = 60 * 60 * 24
+
+
+def clave_contenido(documento):
+    return f'lecturas:contenido:{VERSION_RENDER}:{documento.pk}:{documento.version_contenido}'
+
+
 @register.simple_tag(takes_context=True)
 def render_content_with_attachment(context, documento):
     """
     Renderiza el contenido del documento, insertando el adjunto si se encuentra un placeholder.
     Si no, muestra el adjunto al final.
     """
+    clave = clave_contenido(documento)
+    cacheado = cache.get(clave)
+    if cacheado is not None:
+        return mark_safe(cacheado)
+
     placeholder = '[ADJUNTO_AQUI]'
-    content = documento.descripcion
+    content = documento.descripcion_html
     attachment_html = ""
     attachment_inserted = False
 
     # Primero, renderizamos el HTML del adjunto para tenerlo listo
     if documento.adjunto:
         attachment_html = render_to_string(
-            'lecturas/_attachment_viewer.html', 
+            'lecturas/_attachment_viewer.html',
             {'documento': documento, 'request': context['request']}
         )
 
@@ -26,12 +46,35 @@ def render_content_with_attachment(context, documento):
     if placeholder in content and documento.adjunto:
         content = content.replace(placeholder, attachment_html)
         attachment_inserted = True
-    
+
     # Marcamos el contenido como seguro para que se renderice el HTML
     final_content = mark_safe(content)
-    
+
     # Si el adjunto existe pero NO fue insertado, lo añadimos al final
     if documento.adjunto and not attachment_inserted:
         final_content += mark_safe(attachment_html)
 
-    return final_content
\ No newline at end of file
+    cache.set(clave, str(final_content), TIEMPO_CACHE_CONTENIDO)
+    return final_content
+
+
+@register.filter
+def fuentes_srcset(derivados):
+    """
+    Convierte `imagen_derivados` en una lista de (tipo MIME, srcset) para
+    los <source> de un <picture>, en orden de preferencia.
+    """
+    formatos = (derivados or {}).get('formatos', {})
+    fuentes = []
+    for formato in FORMATOS:
+        entradas = formatos.get(formato)
+        if entradas:
+            srcset = ', '.join(f"{entrada['url']} {entrada['ancho']}w" for entrada in entradas)
+            fuentes.append((f'image/{formato}', srcset))
+    return fuentes
+
+
+@register.filter
+def resaltado(fragmento):
+    """Fragmento de una búsqueda escapado, con las coincidencias en <mark>."""
+    return resaltar(fragmento)
@@ -1,3 +1,197 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import unittest
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from imago.texto_enriquecido import rellenar
+from . import visitas
+from .descargas import calcular_etag, parsear_rango, servir_archivo_local
+from .models import Calificacion, Documento, VisitaDiaria
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "El upsert de calificaciones usa SQL de PostgreSQL")
+class CalificacionConcurrenteTests(TransactionTestCase):
+    """
+    Muchas calificaciones simultáneas sobre un mismo documento (a través de la
+    vista) deben dejar los agregados igual que si se recalculasen desde cero.
+    """
+    HILOS = 12
+
+    def setUp(self):
+        self.usuarios = [User.objects.create(username=f'lector{i}') for i in range(self.HILOS)]
+        self.documento = Documento.objects.create(titulo='Concurrente', grado='general', author=self.usuarios[0])
+        self.url = reverse('lecturas:calificar_documento_ajax', kwargs={'pk': self.documento.pk})
+
+    def calificar_en_paralelo(self, votos):
+        """`votos` es una lista de (usuario, puntuación); cada uno se envía desde un hilo."""
+        barrera = threading.Barrier(len(votos))
+        errores = []
+
+        def votar(usuario, puntuacion):
+            try:
+                cliente = Client(HTTP_HOST='localhost')
+                cliente.force_login(usuario)
+                barrera.wait()
+                response = cliente.post(self.url, {'puntuacion': puntuacion})
+                if response.status_code != 200:
+                    errores.append(response.status_code)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=votar, args=voto) for voto in votos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+
+    def assertAgregadosCoherentes(self):
+        self.documento.refresh_from_db()
+        reales = Calificacion.objects.filter(documento=self.documento).aggregate(
+            suma=Sum('puntuacion'), total=Count('pk'),
+        )
+        self.assertEqual(self.documento.suma_calificaciones, reales['suma'])
+        self.assertEqual(self.documento.total_calificaciones, reales['total'])
+        for estrellas in range(1, 6):
+            self.assertEqual(
+                getattr(self.documento, f'estrellas_{estrellas}'),
+                Calificacion.objects.filter(documento=self.documento, puntuacion=estrellas).count(),
+            )
+
+    def test_usuarios_distintos(self):
+        self.calificar_en_paralelo([(usuario, i % 5 + 1) for i, usuario in enumerate(self.usuarios)])
+        self.assertEqual(Calificacion.objects.filter(documento=self.documento).count(), self.HILOS)
+        self.assertAgregadosCoherentes()
+
+    def test_mismo_usuario(self):
+        # Varios votos simultáneos del mismo usuario cuentan como uno solo
+        usuario = self.usuarios[1]
+        self.calificar_en_paralelo([(usuario, i % 5 + 1) for i in range(self.HILOS)])
+        self.assertEqual(Calificacion.objects.filter(documento=self.documento).count(), 1)
+        self.assertAgregadosCoherentes()
+
+    def test_respuesta_con_agregados(self):
+        cliente = Client(HTTP_HOST='localhost')
+        cliente.force_login(self.usuarios[0])
+        cliente.post(self.url, {'puntuacion': 4})
+        datos = cliente.post(self.url, {'puntuacion': 2}).json()
+        self.assertEqual(datos['num_calificaciones'], 1)
+        self.assertEqual(datos['nuevo_promedio'], 2)
+        self.assertEqual(cliente.post(reverse('lecturas:calificar_documento_ajax', kwargs={'pk': 0}), {'puntuacion': 3}).status_code, 404)
+
+
+class VisitasTests(TestCase):
+    """Cada visitante cuenta una vez al día aunque sus visitas lleguen en volcados distintos."""
+
+    def setUp(self):
+        autor = User.objects.create(username='autor')
+        self.documento = Documento.objects.create(titulo='Visitado', grado='general', author=autor)
+        self.factory = RequestFactory()
+
+    def visitar(self, ip, tipo=visitas.VISTA):
+        visitas.registrar_visita(self.factory.get('/', REMOTE_ADDR=ip, HTTP_USER_AGENT='Mozilla'), self.documento.pk, tipo)
+
+    def test_deduplicacion_entre_volcados(self):
+        self.visitar('10.0.0.1')
+        self.visitar('10.0.0.1')
+        self.visitar('10.0.0.2')
+        self.visitar('10.0.0.1', visitas.DESCARGA)
+        visitas.volcar()
+        # Como si llegasen por otro worker: mismos visitantes y uno nuevo
+        self.visitar('10.0.0.1')
+        self.visitar('10.0.0.3')
+        visitas.volcar()
+        fila = VisitaDiaria.objects.get(documento=self.documento)
+        self.assertEqual((fila.vistas, fila.descargas), (3, 1))
+
+
+@override_settings(ATTACHMENT_DELIVERY='stream')
+class DescargasTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, 'cuento.pdf')
+        with open(self.ruta, 'wb') as archivo:
+            archivo.write(b'0123456789')
+        self.etag = calcular_etag(os.stat(self.ruta))
+        self.factory = RequestFactory()
+
+    def servir(self, **cabeceras):
+        request = self.factory.get('/', headers=cabeceras)
+        response = servir_archivo_local(request, self.ruta, 'lecturas/cuento.pdf', 'application/pdf')
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_parsear_rango(self):
+        self.assertIsNone(parsear_rango(None, 10))
+        self.assertIsNone(parsear_rango('bytes=0-1,4-5', 10))
+        self.assertEqual(parsear_rango('bytes=2-', 10), (2, 9))
+        self.assertEqual(parsear_rango('bytes=2-50', 10), (2, 9))
+        self.assertEqual(parsear_rango('bytes=-3', 10), (7, 9))
+        self.assertEqual(parsear_rango('bytes=-50', 10), (0, 9))
+        for cabecera, tamanio in [('bytes=10-', 10), ('bytes=5-2', 10), ('bytes=-0', 10), ('bytes=-5', 0), ('bytes=0-', 0)]:
+            with self.assertRaises(ValueError, msg=cabecera):
+                parsear_rango(cabecera, tamanio)
+
+    def test_completo(self):
+        response, contenido = self.servir()
+        self.assertEqual((response.status_code, contenido), (200, b'0123456789'))
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_rango(self):
+        response, contenido = self.servir(Range='bytes=2-4')
+        self.assertEqual((response.status_code, contenido), (206, b'234'))
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(response['Content-Length'], '3')
+
+    def test_sufijo(self):
+        response, contenido = self.servir(Range='bytes=-3')
+        self.assertEqual((response.status_code, contenido), (206, b'789'))
+        self.assertEqual(response['Content-Range'], 'bytes 7-9/10')
+
+    def test_if_range(self):
+        response, _ = self.servir(Range='bytes=2-4', **{'If-Range': self.etag})
+        self.assertEqual(response.status_code, 206)
+        # Si el archivo cambió, se envía completo
+        response, contenido = self.servir(Range='bytes=2-4', **{'If-Range': '"otro"'})
+        self.assertEqual((response.status_code, contenido), (200, b'0123456789'))
+
+    def test_no_modificado(self):
+        response, contenido = self.servir(**{'If-None-Match': self.etag})
+        self.assertEqual((response.status_code, contenido), (304, b''))
+
+    def test_rango_no_satisfacible(self):
+        response, _ = self.servir(Range='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        open(self.ruta, 'wb').close()
+        response, _ = self.servir(Range='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+
+class RellenarTextoEnriquecidoTests(TestCase):
+
+    def test_cambia_la_clave_del_contenido_cacheado(self):
+        autor = User.objects.create(username='autor')
+        documento = Documento.objects.create(titulo='Doc', grado='general', author=autor, descripcion='<p>hola</p>')
+        otro = Documento.objects.create(titulo='Otro', grado='general', author=autor, descripcion='<p>adiós</p>')
+        # HTML saneado con una lista blanca anterior
+        Documento.objects.filter(pk=documento.pk).update(descripcion_html='<p onclick="x()">hola</p>')
+        versiones = dict(Documento.objects.values_list('pk', 'version_contenido'))
+
+        self.assertEqual(rellenar(Documento, Documento.CAMPOS_TEXTO_ENRIQUECIDO), 1)
+        documento.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual(documento.descripcion_html, '<p>hola</p>')
+        self.assertEqual(documento.version_contenido, versiones[documento.pk] + 1)
+        self.assertEqual(otro.version_contenido, versiones[otro.pk])
@@ -1,23 +1,32 @@
 import os
 import logging
-import json
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, Http404, JsonResponse, HttpResponseForbidden
-from django.db.models import Q
+from django.http import Http404, JsonResponse, HttpResponseForbidden
 from django.views.generic import ListView, DetailView, UpdateView, DeleteView
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
 from django.urls import reverse_lazy
+from django.db.models.fields.json import KT
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.template.loader import render_to_string
 from django.core.exceptions import PermissionDenied
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
 
-from .models import Documento, Comentario, ELEGIR_GRADO, ELEGIR_IDIOMA, Calificacion, Autor, Genero
-from . import forms
+from .models import Documento, Comentario, ELEGIR_GRADO, ELEGIR_IDIOMA, Calificacion, Genero, TextoAdjunto
+from . import autocompletado, forms
 from .decorators import group_required
+from .busqueda import buscar_documentos, busqueda_disponible
+from .calificaciones import calificar
+from .comentarios import adjuntar_hijos, cargar_arbol_comentarios
+from .descargas import servir_archivo_local
+from .visitas import DESCARGA, estadisticas_documento, registrar_visita
+from .facetas import Facetas, obtener_cubo
 from .mixins import UserIsAuthorMixin
+from imago.autoguardado import EdicionVersionadaMixin
+from imago.paginacion import CursorPaginationMixin, CursorPaginator
 
 logger = logging.getLogger(__name__)
 
@@ -36,18 +45,13 @@ def serve_file(request, pk):
         logger.warning(f"Documento {pk} no tiene archivo adjunto")
         raise Http404("El documento no tiene un archivo adjunto.")
 
+    registrar_visita(request, documento.pk, DESCARGA)
+
     logger.info(f"Adjunto name: {documento.adjunto.name}")
     logger.info(f"Adjunto URL: {documento.adjunto.url}")
-    logger.info(f"Storage backend: {default_storage.__class__.__name__}")
+    logger.info(f"Storage backend: {getattr(default_storage, 'backend', default_storage).__class__.__name__}")
     logger.info(f"GS_BUCKET_NAME: {getattr(settings, 'GS_BUCKET_NAME', 'NO CONFIGURADO')}")
     
-    # Verificar si el archivo existe en storage
-    try:
-        exists = default_storage.exists(documento.adjunto.name)
-        logger.info(f"Archivo existe en storage: {exists}")
-    except Exception as e:
-        logger.error(f"Error verificando existencia: {e}")
-    
     # Determinar el tipo de contenido basado en la extensión
     file_name = documento.adjunto.name
     ext = os.path.splitext(file_name)[1].lower()
@@ -67,52 +71,73 @@ def serve_file(request, pk):
         logger.info(f"Redirigiendo a URL de Cloud Storage: {documento.adjunto.url}")
         return redirect(documento.adjunto.url)
     
-    # Para almacenamiento local (desarrollo)
+    # Para almacenamiento local: envío por bloques con soporte de Range y caché,
+    # o delegado al proxy según settings.ATTACHMENT_DELIVERY
     try:
         file_path = documento.adjunto.path
-        logger.info(f"Intentando servir desde path local: {file_path}")
-        
-        if not os.path.exists(file_path):
-            logger.error(f"Archivo no encontrado en: {file_path}")
-            raise Http404("El archivo no fue encontrado en el servidor.")
-        
-        with open(file_path, 'rb') as file:
-            response = HttpResponse(file.read(), content_type=content_type)
-            response['X-Frame-Options'] = 'SAMEORIGIN'
-            response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_name)}"'
-            logger.info("Archivo servido exitosamente desde almacenamiento local")
-            return response
-            
     except (ValueError, NotImplementedError, AttributeError) as e:
         logger.warning(f"No se puede acceder a .path: {e}. Redirigiendo a URL")
         return redirect(documento.adjunto.url)
 
+    logger.info(f"Intentando servir desde path local: {file_path}")
+    versionada = request.GET.get('v') == documento.version_adjunto
+    try:
+        response = servir_archivo_local(request, file_path, file_name, content_type, versionada=versionada)
+    except FileNotFoundError:
+        logger.error(f"Archivo no encontrado en: {file_path}")
+        raise Http404("El archivo no fue encontrado en el servidor.")
 
-class DocumentoListView(ListView):
+    logger.info(f"Archivo servido desde almacenamiento local (status {response.status_code})")
+    return response
+
+
+class DocumentoListView(CursorPaginationMixin, ListView):
     model = Documento
     template_name = 'lecturas/lista_documentos.html'
     context_object_name = 'documentos'
     ordering = ['-date']
     paginate_by = 16
+    # Paginación por cursor sobre (date, pk): sin OFFSET ni COUNT(*) del listado filtrado
+    cursor_ordering = ('-date', '-pk')
+    estimar_total = True
+
+    def get_cursor_ordering(self):
+        # Con búsqueda de texto completo se mantiene el orden por relevancia
+        if self.request.GET.get('q') and busqueda_disponible(Documento.objects.db):
+            return ('-rank', '-date', '-pk')
+        return self.cursor_ordering
     
     def get_queryset(self):
-        # ... (esta función no cambia, la dejamos como está)
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().defer('search_vector')
         if 'idioma' in self.kwargs:
             queryset = queryset.filter(idioma=self.kwargs['idioma'])
         if 'grado' in self.kwargs:
             queryset = queryset.filter(grado=self.kwargs['grado'])
         
+        nivel = self.request.GET.get('nivel')
+        if nivel:
+            queryset = queryset.filter(nivel_dificultad=nivel)
+        genero = self.request.GET.get('genero')
+        if genero and genero.isdigit():
+            queryset = queryset.filter(generos=genero)
+
         query = self.request.GET.get('q')
         
         if query:
-            queryset = queryset.filter(
-                Q(titulo__icontains=query) |
-                Q(autor_principal__nombre__icontains=query) |
-                Q(generos__nombre__icontains=query)
-            ).distinct()
+            # Búsqueda de texto completo ordenada por relevancia (icontains fuera de PostgreSQL)
+            queryset = buscar_documentos(queryset, query)
             
         return queryset
+
+    def get_facetas(self):
+        """
+        Conteos de la barra lateral. Con búsqueda se cuentan solo los resultados
+        (en todos los idiomas y grados, para ver dónde hay coincidencias).
+        """
+        query = self.request.GET.get('q')
+        if query:
+            return Facetas(obtener_cubo(buscar_documentos(Documento.objects.all(), query), clave=query))
+        return Facetas(obtener_cubo())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -151,7 +176,51 @@ class DocumentoListView(ListView):
 
         context['structured_grados'] = structured_grados
         # --- FIN DE LA LÓGICA ---
-        
+
+        # Conteos por faceta: una consulta agrupada (cacheada) para toda la barra
+        genero = self.request.GET.get('genero')
+        filtros = {
+            'idioma': self.kwargs.get('idioma'),
+            'grado': self.kwargs.get('grado'),
+            'nivel_dificultad': self.request.GET.get('nivel'),
+            'genero': genero if genero and genero.isdigit() else None,
+        }
+        facetas = self.get_facetas()
+        por_idioma = facetas.contar('idioma', **filtros)
+        por_idioma_grado = facetas.contar_pares('idioma', 'grado', **filtros)
+        context['arbol_idiomas'] = [
+            {
+                'code': code,
+                'name': name,
+                'total': por_idioma.get(code, 0),
+                'grupos': [
+                    {
+                        'group_name': group['group_name'],
+                        'grades': [
+                            (grado_code, grado_name, por_idioma_grado.get((code, grado_code), 0))
+                            for grado_code, grado_name in group['grades']
+                        ],
+                    }
+                    for group in structured_grados
+                ],
+            }
+            for code, name in ELEGIR_IDIOMA
+        ]
+        por_nivel = facetas.contar('nivel_dificultad', **filtros)
+        context['facetas_nivel'] = [
+            (code, name, por_nivel.get(code, 0)) for code, name in Documento.NIVEL_DIFICULTAD
+        ]
+        por_genero = facetas.contar('genero', **filtros)
+        nombres_generos = dict(Genero.objects.filter(pk__in=por_genero).values_list('pk', 'nombre'))
+        context['facetas_genero'] = sorted(
+            [(pk, nombres_generos[pk], total) for pk, total in por_genero.items() if pk in nombres_generos],
+            key=lambda genero: (-genero[2], genero[1]),
+        )
+        # Filtros actuales para conservarlos en los enlaces de idioma y grado
+        parametros = self.request.GET.copy()
+        parametros.pop(self.cursor_kwarg, None)
+        context['parametros_filtro'] = parametros.urlencode()
+
         context['current_idioma'] = self.kwargs.get('idioma')
         context['current_grado'] = self.kwargs.get('grado')
         return context
@@ -162,11 +231,25 @@ class DocumentoDetailView(DetailView):
     template_name = 'lecturas/detalle_documento.html'
     context_object_name = 'documento'
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Se acumula en memoria y se escribe en lote (lecturas/visitas.py)
+        registrar_visita(request, self.object.pk)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Log info del documento
-        doc = self.get_object()
+        doc = self.object
+        context['estadisticas'] = estadisticas_documento(doc.pk)
+        # Precalculadas por `manage.py calcular_recomendaciones`: una consulta por índice
+        context['similares'] = (
+            Documento.objects.filter(recomendado_en__documento=doc)
+            .select_related('autor_principal', 'author')
+            .defer('search_vector')
+            .order_by('recomendado_en__posicion')
+        )
         user_rating = None
         if self.request.user.is_authenticated:
             try:
@@ -183,18 +266,58 @@ class DocumentoDetailView(DetailView):
             logger.info(f"Adjunto name: {doc.adjunto.name}")
             logger.info(f"Adjunto URL: {doc.adjunto.url}")
         
-        comentarios_list = doc.comentarios.filter(parent__isnull=True).order_by('-fecha_creacion')
-        paginator = Paginator(comentarios_list, 10)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        # Solo pk y fecha de los principales: el hilo completo se carga después
+        comentarios_list = doc.comentarios.filter(parent__isnull=True).only('pk', 'fecha_creacion')
+        paginator = CursorPaginator(comentarios_list, 10, ('-fecha_creacion', '-pk'))
+        page_obj = paginator.get_page(self.request.GET.get('cursor'))
+        # Página de comentarios + todas sus respuestas, autores y perfiles en una consulta
+        page_obj.object_list = cargar_arbol_comentarios(page_obj.object_list)
         
         context['comentarios_page'] = page_obj
         context['is_paginated'] = page_obj.has_other_pages()
         context['page_obj'] = page_obj
         context['comentario_form'] = forms.ComentarioForm()
+        # Páginas del modo lector, si ya se extrajo el texto del adjunto actual
+        context['paginas_lector'] = 0
+        if doc.adjunto:
+            context['paginas_lector'] = TextoAdjunto.objects.filter(
+                documento=doc, origen=doc.adjunto.name, estado=TextoAdjunto.ESTADO_LISTO
+            ).values_list('num_paginas', flat=True).first() or 0
         return context
 
 
+def lector_documento(request, pk):
+    """
+    Modo lector: muestra una página del HTML extraído del adjunto sin
+    necesidad de descargar el archivo. Solo se lee de la BD la página pedida.
+    """
+    documento = get_object_or_404(Documento.objects.only('pk', 'titulo', 'adjunto'), pk=pk)
+    if not documento.adjunto:
+        raise Http404("Este documento no tiene adjunto.")
+    # Solo el texto del adjunto actual: si se reemplazó, el anterior ya no vale
+    textos = TextoAdjunto.objects.filter(
+        documento=documento, origen=documento.adjunto.name, estado=TextoAdjunto.ESTADO_LISTO
+    )
+    texto_adjunto = textos.filter(num_paginas__gt=0).values('num_paginas').first()
+    if texto_adjunto is None:
+        raise Http404("El texto de este documento aún no está disponible.")
+
+    # Paginator sobre los números de página, para reutilizar partials/pagination.html
+    paginator = Paginator(range(texto_adjunto['num_paginas']), 1)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    indice = page_obj.number - 1
+    contenido = textos.values_list(
+        KT(f'paginas__{indice}'), flat=True
+    ).first()
+
+    return render(request, 'lecturas/lector_documento.html', {
+        'documento': documento,
+        'contenido_pagina': contenido or '',
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+    })
+
+
 @login_required
 @group_required(['Profesor', 'Administrativo'])
 def subir_documento(request):
@@ -224,28 +347,17 @@ def subir_documento(request):
     else:
         form = forms.DocumentoForm()
     
-    # Pasar autores y géneros existentes para el autocompletado
-    context = {
-        'form': form,
-        'autores_existentes': Autor.objects.all().order_by('nombre'),
-        'generos_existentes': Genero.objects.all().order_by('nombre')
-    }
+    # Autores y géneros se buscan con lecturas:autocompletar a medida que se escribe
+    context = {'form': form}
     
     return render(request, 'lecturas/documento_form.html', context)
 
 
-class DocumentoUpdateView(LoginRequiredMixin, UserIsAuthorMixin, UpdateView):
+class DocumentoUpdateView(LoginRequiredMixin, UserIsAuthorMixin, EdicionVersionadaMixin, UpdateView):
     model = Documento
     form_class = forms.DocumentoForm
     template_name = 'lecturas/documento_form.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # Agregar autores y géneros para el autocompletado
-        context['autores_existentes'] = Autor.objects.all().order_by('nombre')
-        context['generos_existentes'] = Genero.objects.all().order_by('nombre')
-        return context
-    
     def get_success_url(self):
         return reverse_lazy('lecturas:detalle_documento', kwargs={'pk': self.object.pk})
     
@@ -255,6 +367,21 @@ class DocumentoDeleteView(LoginRequiredMixin, UserIsAuthorMixin, DeleteView):
     template_name = 'lecturas/documento_confirm_delete.html' 
     success_url = reverse_lazy('lecturas:lista_documentos_base')
 
+
+@login_required
+@require_GET
+def autocompletar(request, tipo):
+    """
+    Sugerencias de autores o géneros para los selectores del formulario
+    (formato de Select2). El término llega en ?term=, como lo envía django_select2.js.
+    """
+    if tipo not in autocompletado.MODELOS:
+        raise Http404("Tipo de autocompletado no válido.")
+    termino = request.GET.get('term', '')[:100]
+    response = JsonResponse(autocompletado.resultados(tipo, termino))
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
 @login_required
 def anadir_comentario(request, pk):
     documento = get_object_or_404(Documento, pk=pk)
@@ -277,6 +404,7 @@ def anadir_comentario(request, pk):
                 # CREAR NUEVO FORMULARIO LIMPIO
                 nuevo_form = forms.ComentarioForm()
                 
+                adjuntar_hijos(comentario, [])
                 html = render_to_string('lecturas/_comentario_item.html', {
                     'comentario': comentario,
                     'user': request.user,
@@ -411,8 +539,6 @@ def borrar_comentario_ajax(request, pk):
 @login_required
 def calificar_documento_ajax(request, pk):
     if request.method == 'POST':
-        documento = get_object_or_404(Documento, pk=pk)
-        
         try:
             puntuacion = int(request.POST.get('puntuacion'))
             if not 1 <= puntuacion <= 5:
@@ -420,84 +546,22 @@ def calificar_documento_ajax(request, pk):
         except (ValueError, TypeError):
             return JsonResponse({'success': False, 'error': 'Puntuación inválida'}, status=400)
 
-        # Usamos update_or_create para crear o actualizar la calificación en una sola operación
-        calificacion, created = Calificacion.objects.update_or_create(
-            documento=documento,
-            usuario=request.user,
-            defaults={'puntuacion': puntuacion}
-        )
+        # Upsert de la calificación y ajuste de los agregados en una sola sentencia,
+        # que devuelve ya los agregados nuevos (ver lecturas/calificaciones.py)
+        documento = calificar(pk, request.user, puntuacion)
+        if documento is None:
+            raise Http404("El documento no existe.")
         
         # Devolvemos los nuevos datos para actualizar la UI
         return JsonResponse({
             'success': True,
             'nuevo_promedio': documento.calificacion_promedio,
-            'num_calificaciones': documento.num_calificaciones
+            'num_calificaciones': documento.num_calificaciones,
+            'histograma': documento.histograma_calificaciones,
         })
     
     return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
-@login_required
-def guardar_documento_ajax(request, pk):
-    """
-    Vista AJAX para el autoguardado de campos del formulario de Documento.
-    Ahora maneja la creación de nuevas etiquetas para campos Select2.
-    """
-    try:
-        documento = DocumentoUpdateView().get_queryset().get(pk=pk)
-    except Documento.DoesNotExist:
-        return HttpResponseForbidden("No tienes permiso para editar este documento o no existe.")
-    except Exception as e:
-        logger.error(f"Error inesperado al obtener documento {pk} para autoguardado: {e}")
-        return JsonResponse({'success': False, 'error': 'Error interno del servidor.'}, status=500)
-
-    if request.method == 'PUT':
-        try:
-            data = json.loads(request.body)
-            field_name, value = next(iter(data.items()))
-
-            # --- LÓGICA MEJORADA PARA MANEJAR STRINGS O IDs ---
-
-            if field_name == 'autor_principal':
-                # Si el valor no es un número, es un nuevo autor.
-                if value and isinstance(value, str) and not value.isdigit():
-                    autor, _ = Autor.objects.get_or_create(nombre=value)
-                    documento.autor_principal = autor
-                elif value:
-                    documento.autor_principal_id = value
-                else:
-                    documento.autor_principal = None
-                documento.save(update_fields=['autor_principal'])
-
-            elif field_name == 'generos':
-                final_pks = []
-                if isinstance(value, list):
-                    for item in value:
-                        # Si el item no es un número, es un nuevo género.
-                        if item and isinstance(item, str) and not item.isdigit():
-                            genero, _ = Genero.objects.get_or_create(nombre=item)
-                            final_pks.append(genero.pk)
-                        elif item:
-                            final_pks.append(int(item))
-                documento.generos.set(final_pks)
-                # .set() guarda automáticamente, no necesita .save()
-
-            else: # Para campos normales (titulo, descripcion, etc.)
-                if hasattr(documento, field_name):
-                    setattr(documento, field_name, value)
-                    documento.save(update_fields=[field_name])
-                else:
-                    return JsonResponse({'success': False, 'error': f'El campo "{field_name}" no existe.'}, status=400)
-            
-            return JsonResponse({'success': True, 'message': f'Campo "{field_name}" guardado.'})
-
-        except (json.JSONDecodeError, StopIteration):
-            return JsonResponse({'success': False, 'error': 'Datos inválidos.'}, status=400)
-        except Exception as e:
-            logger.error(f"Error al autoguardar documento {pk} ({field_name}): {e}")
-            return JsonResponse({'success': False, 'error': f"Error al guardar: {e}"}, status=500)
-
-    return JsonResponse({'success': False, 'error': 'Método no permitido.'}, status=405)
-
 @login_required
 def subir_archivo_ajax(request, pk, field_name):
     """
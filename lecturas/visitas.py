@@ -0,0 +1,228 @@
+"""
+Contador de visitas de las lecturas (detalle del documento y apertura del adjunto).
+
+Escribir una fila por visita cargaría la BD justo en horas de clase, así que:
+
+- Las visitas se acumulan en un búfer del proceso
+  {(documento, fecha, tipo): {visitantes}}, donde el visitante es un hash de
+  la sesión (o de la IP y el navegador si no hay sesión). Repetir la visita,
+  recargar o las peticiones Range del visor de PDF no añaden nada al búfer.
+- El búfer se vuelca en lote cada INTERVALO_VOLCADO segundos o al llegar a
+  MAXIMO_PENDIENTES visitantes, en segundo plano, con una única sentencia: los
+  visitantes se insertan en VisitanteDiario con ON CONFLICT DO NOTHING y solo
+  los que entran por primera vez ese día se suman a las filas de
+  VisitaDiaria. Así la deduplicación vale entre workers e instancias sin una
+  consulta por visita. También se vuelca al terminar el proceso.
+
+Si el proceso muere sin volcar se pierden como mucho las visitas de ese
+intervalo, algo aceptable para unas estadísticas.
+"""
+import atexit
+import datetime
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Documento, VisitaDiaria, VisitanteDiario
+from .tareas import en_segundo_plano
+
+logger = logging.getLogger(__name__)
+
+VISTA = 'vistas'
+DESCARGA = 'descargas'
+INTERVALO_VOLCADO = 60
+MAXIMO_PENDIENTES = 500
+TIEMPO_CACHE_RANKING = 60 * 10
+TIEMPO_CACHE_ESTADISTICAS = 60 * 5
+DIAS_RANKING = 30
+
+PATRON_BOTS = re.compile(r'bot|crawl|spider|slurp|preview', re.IGNORECASE)
+
+_pendientes = {}
+_num_pendientes = 0
+_lock = threading.Lock()
+_ultimo_volcado = time.monotonic()
+_ultima_limpieza = None
+
+
+def _visitante(request):
+    """Hash de la sesión del visitante o, si no tiene, de su IP y navegador."""
+    if getattr(request, 'session', None) is not None and request.session.session_key:
+        origen = request.session.session_key
+    else:
+        origen = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    # La clave de sesión no se guarda tal cual en la BD
+    return hashlib.sha256(origen.encode('utf-8')).hexdigest()[:32]
+
+
+def registrar_visita(request, documento_id, tipo=VISTA):
+    """
+    Anota una visita de tipo VISTA o DESCARGA. Al volcar solo cuenta si es la
+    primera del visitante hoy; devuelve False si ya estaba en el búfer.
+    """
+    if PATRON_BOTS.search(request.META.get('HTTP_USER_AGENT', '')):
+        return False
+    clave = (documento_id, timezone.localdate(), tipo)
+    visitante = _visitante(request)
+
+    global _num_pendientes, _ultimo_volcado
+    with _lock:
+        visitantes = _pendientes.setdefault(clave, set())
+        if visitante in visitantes:
+            return False
+        visitantes.add(visitante)
+        _num_pendientes += 1
+        ahora = time.monotonic()
+        toca_volcar = _num_pendientes >= MAXIMO_PENDIENTES or ahora - _ultimo_volcado >= INTERVALO_VOLCADO
+        if toca_volcar:
+            _ultimo_volcado = ahora
+    if toca_volcar:
+        en_segundo_plano(volcar)
+    return True
+
+
+def volcar():
+    """Escribe en la BD las visitas acumuladas. Devuelve el número de filas afectadas."""
+    global _pendientes, _num_pendientes
+    with _lock:
+        lote, _pendientes, _num_pendientes = _pendientes, {}, 0
+    if not lote:
+        return 0
+    try:
+        filas = _escribir(lote)
+    except Exception:
+        # Se devuelven al búfer para el siguiente volcado
+        with _lock:
+            for clave, visitantes in lote.items():
+                actuales = _pendientes.setdefault(clave, set())
+                _num_pendientes += len(visitantes - actuales)
+                actuales |= visitantes
+        logger.exception(f"No se pudieron volcar {len(lote)} contador(es) de visitas")
+        return 0
+    _limpiar_visitantes()
+    return filas
+
+
+def _limpiar_visitantes():
+    """Borra, una vez al día por proceso, los visitantes de antes de ayer."""
+    global _ultima_limpieza
+    hoy = timezone.localdate()
+    if _ultima_limpieza == hoy:
+        return
+    _ultima_limpieza = hoy
+    # Se conserva ayer por las visitas de antes de medianoche que aún estén en otros búferes
+    VisitanteDiario.objects.filter(fecha__lt=hoy - datetime.timedelta(days=1)).delete()
+
+
+def _escribir(lote):
+    connection = connections[VisitaDiaria.objects.db]
+    if connection.vendor != 'postgresql':
+        with transaction.atomic():
+            existentes = set(Documento.objects.filter(pk__in={pk for pk, _, _ in lote}).values_list('pk', flat=True))
+            contadores = {}
+            for (documento_id, fecha, tipo), visitantes in lote.items():
+                if documento_id not in existentes:
+                    continue
+                anteriores = VisitanteDiario.objects.filter(
+                    documento_id=documento_id, fecha=fecha, tipo=tipo, visitante__in=visitantes,
+                ).values_list('visitante', flat=True)
+                nuevos = visitantes - set(anteriores)
+                VisitanteDiario.objects.bulk_create([
+                    VisitanteDiario(documento_id=documento_id, fecha=fecha, tipo=tipo, visitante=visitante)
+                    for visitante in nuevos
+                ])
+                contadores.setdefault((documento_id, fecha), {VISTA: 0, DESCARGA: 0})[tipo] += len(nuevos)
+            for (documento_id, fecha), nuevas in contadores.items():
+                VisitaDiaria.objects.get_or_create(documento_id=documento_id, fecha=fecha)
+                VisitaDiaria.objects.filter(documento_id=documento_id, fecha=fecha).update(
+                    vistas=F('vistas') + nuevas[VISTA],
+                    descargas=F('descargas') + nuevas[DESCARGA],
+                )
+        return len(contadores)
+
+    tabla = VisitaDiaria._meta.db_table
+    filas = [
+        (documento_id, fecha, tipo, visitante)
+        for (documento_id, fecha, tipo), visitantes in lote.items()
+        for visitante in visitantes
+    ]
+    valores = ', '.join(['(%s::bigint, %s::date, %s, %s)'] * len(filas))
+    parametros = [valor for fila in filas for valor in fila] + [VISTA, DESCARGA]
+    with connection.cursor() as cursor:
+        # Solo suman los visitantes que no estaban ya registrados ese día; los
+        # documentos borrados mientras tanto se descartan en lugar de romper el lote
+        cursor.execute(f"""
+            WITH nuevos AS (
+                INSERT INTO {VisitanteDiario._meta.db_table} (documento_id, fecha, tipo, visitante)
+                SELECT v.documento_id, v.fecha, v.tipo, v.visitante
+                FROM (VALUES {valores}) AS v (documento_id, fecha, tipo, visitante)
+                WHERE EXISTS (SELECT 1 FROM {Documento._meta.db_table} d WHERE d.id = v.documento_id)
+                ON CONFLICT (documento_id, fecha, tipo, visitante) DO NOTHING
+                RETURNING documento_id, fecha, tipo
+            )
+            INSERT INTO {tabla} (documento_id, fecha, vistas, descargas)
+            SELECT documento_id, fecha,
+                   COUNT(*) FILTER (WHERE tipo = %s), COUNT(*) FILTER (WHERE tipo = %s)
+            FROM nuevos
+            GROUP BY documento_id, fecha
+            ON CONFLICT (documento_id, fecha) DO UPDATE SET
+                vistas = {tabla}.vistas + EXCLUDED.vistas,
+                descargas = {tabla}.descargas + EXCLUDED.descargas
+        """, parametros)
+        return cursor.rowcount
+
+
+atexit.register(volcar)
+
+
+def mas_leidas(limite=8, dias=DIAS_RANKING):
+    """Documentos con más vistas y aperturas en los últimos `dias`, en orden."""
+    clave = f'lecturas:visitas:mas_leidas:{dias}:{limite}'
+    ranking = cache.get(clave)
+    if ranking is None:
+        desde = timezone.localdate() - datetime.timedelta(days=dias)
+        ranking = list(
+            VisitaDiaria.objects.filter(fecha__gte=desde)
+            .values('documento')
+            .annotate(total=Sum(F('vistas') + F('descargas')))
+            .order_by('-total', '-documento')
+            .values_list('documento', 'total')[:limite]
+        )
+        cache.set(clave, ranking, TIEMPO_CACHE_RANKING)
+    documentos = Documento.objects.select_related('autor_principal', 'author').in_bulk([pk for pk, _ in ranking])
+    resultado = []
+    for pk, total in ranking:
+        if pk in documentos:
+            documentos[pk].lecturas_recientes = total
+            resultado.append(documentos[pk])
+    return resultado
+
+
+def estadisticas_documento(documento_id, dias=DIAS_RANKING):
+    """Vistas y aperturas del adjunto, totales y de los últimos `dias`, en una consulta."""
+    clave = f'lecturas:visitas:estadisticas:{documento_id}:{dias}'
+    estadisticas = cache.get(clave)
+    if estadisticas is None:
+        periodo = Q(fecha__gte=timezone.localdate() - datetime.timedelta(days=dias))
+        totales = VisitaDiaria.objects.filter(documento_id=documento_id).aggregate(
+            total_vistas=Sum('vistas'),
+            total_descargas=Sum('descargas'),
+            vistas_periodo=Sum('vistas', filter=periodo),
+            descargas_periodo=Sum('descargas', filter=periodo),
+        )
+        estadisticas = {
+            'vistas': totales['total_vistas'] or 0,
+            'descargas': totales['total_descargas'] or 0,
+            'vistas_periodo': totales['vistas_periodo'] or 0,
+            'descargas_periodo': totales['descargas_periodo'] or 0,
+            'dias': dias,
+        }
+        cache.set(clave, estadisticas, TIEMPO_CACHE_ESTADISTICAS)
+    return estadisticas
@@ -3,11 +3,11 @@ from .models import Categoria, Tema, Respuesta
 
 # Register your models here.
 class CategoriaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'descripcion')
+    list_display = ('nombre', 'descripcion', 'num_temas', 'num_respuestas', 'ultima_actividad')
     prepopulated_fields = {'slug': ('nombre',)}
 
 class TemaAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'categoria', 'autor', 'fecha_creacion')
+    list_display = ('titulo', 'categoria', 'autor', 'fecha_creacion', 'num_respuestas', 'ultima_actividad')
     list_filter = ('categoria', 'autor')
 
 admin.site.register(Categoria, CategoriaAdmin)
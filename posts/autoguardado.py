@@ -0,0 +1,23 @@
+from imago.autoguardado import Autoguardable, registrar
+from .busqueda import CAMPOS_BUSQUEDA_TEMA, actualizar_vector_tema
+from .models import Tema
+
+
+class TemaAutoguardable(Autoguardable):
+    modelo = Tema
+
+    def tiene_permiso(self, user, tema):
+        # Mismo criterio que UserIsAuthorMixin en TemaUpdateView
+        return (
+            tema.autor_id == user.pk
+            or user.is_superuser
+            or user.groups.filter(name='Administrativo').exists()
+        )
+
+    def despues_de_guardar(self, tema, cambios):
+        # El UPDATE del autoguardado no dispara post_save
+        if set(cambios) & set(CAMPOS_BUSQUEDA_TEMA):
+            actualizar_vector_tema([tema.pk])
+
+
+registrar('tema', TemaAutoguardable)
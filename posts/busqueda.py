@@ -0,0 +1,141 @@
+"""
+Búsqueda de texto completo en los foros (temas y respuestas).
+
+En PostgreSQL Tema y Respuesta guardan un `search_vector` (tsvector, índice
+GIN) con el texto sin etiquetas del HTML de CKEditor: título (A) y contenido
+(B) del tema, y contenido (C) de cada respuesta. Se recalcula con un UPDATE al
+guardar (señales de posts/signals.py y autoguardado del tema).
+
+Los resultados se agrupan por tema: un tema aparece si coincide él mismo o
+alguna de sus respuestas, con la relevancia de ambos sumada, un fragmento
+resaltado del tema y las RESPUESTAS_POR_TEMA respuestas que mejor coinciden.
+La lista se pagina por cursor sobre (rank, pk).
+
+En otros motores se recurre a icontains, sin relevancia ni fragmentos.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Count, F, FloatField, Max, OuterRef, Q, Subquery, TextField, Value, Window
+from django.db.models.functions import Cast, Coalesce, RowNumber
+
+from imago.postgres import Fragmento, TextoPlano
+from lecturas.busqueda import busqueda_disponible
+from .models import Respuesta, Tema
+
+CONFIGURACION = 'spanish'
+# Campos que alimentan el search_vector del tema
+CAMPOS_BUSQUEDA_TEMA = ['titulo', 'contenido']
+RESPUESTAS_POR_TEMA = 3
+
+
+def _vector(*fuentes):
+    vector = None
+    for fuente, peso in fuentes:
+        parcial = SearchVector(
+            Coalesce(fuente, Value(''), output_field=TextField()), weight=peso, config=CONFIGURACION
+        )
+        vector = parcial if vector is None else vector + parcial
+    return vector
+
+
+def _actualizar(modelo, vector, ids):
+    if not busqueda_disponible(modelo.objects.db):
+        return 0
+    queryset = modelo.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=list(ids))
+    return queryset.update(search_vector=vector)
+
+
+def actualizar_vector_tema(tema_ids=None, tema_model=None):
+    """Recalcula el search_vector de los temas indicados (o de todos) con un único UPDATE."""
+    tema_model = tema_model or Tema
+    return _actualizar(tema_model, _vector((F('titulo'), 'A'), (TextoPlano('contenido'), 'B')), tema_ids)
+
+
+def actualizar_vector_respuesta(respuesta_ids=None, respuesta_model=None):
+    """Igual que actualizar_vector_tema() para las respuestas."""
+    respuesta_model = respuesta_model or Respuesta
+    return _actualizar(respuesta_model, _vector((TextoPlano('contenido'), 'C')), respuesta_ids)
+
+
+def _consulta(texto):
+    return SearchQuery(texto, config=CONFIGURACION, search_type='websearch')
+
+
+def _fragmento(query):
+    # Sobre el HTML saneado, que no deja texto de scripts; el resultado se
+    # escapa al pintarlo (filtro `resaltado`)
+    return Fragmento(
+        TextoPlano('contenido_html'), query,
+        config=CONFIGURACION,
+        max_words=30, min_words=15,
+    )
+
+
+def buscar_temas(texto):
+    """
+    Temas que coinciden con `texto` por sí mismos o por alguna respuesta.
+
+    En PostgreSQL anota `rank`, `num_coincidencias` (respuestas que coinciden)
+    y `fragmento`; ordénese por ('-rank', '-pk') para paginar por cursor.
+    """
+    texto = (texto or '').strip()
+    temas = Tema.objects.select_related('categoria', 'autor')
+    if not busqueda_disponible(Tema.objects.db):
+        return temas.filter(
+            Q(titulo__icontains=texto) |
+            Q(contenido__icontains=texto) |
+            Q(respuestas__contenido__icontains=texto)
+        ).distinct().order_by('-fecha_creacion')
+
+    query = _consulta(texto)
+    respuestas = Respuesta.objects.filter(search_vector=query)
+    por_tema = respuestas.filter(tema=OuterRef('pk')).order_by().values('tema')
+    return (
+        temas.filter(Q(search_vector=query) | Q(pk__in=respuestas.values('tema')))
+        .annotate(
+            # Como en el catálogo: double precision para que sirva de clave del cursor
+            rank=Cast(
+                Coalesce(SearchRank(F('search_vector'), query), 0.0)
+                + Coalesce(Subquery(por_tema.annotate(mejor=Max(SearchRank(F('search_vector'), query))).values('mejor')), 0.0),
+                FloatField(),
+            ),
+            num_coincidencias=Coalesce(Subquery(por_tema.annotate(total=Count('pk')).values('total')), 0),
+            fragmento=_fragmento(query),
+        )
+    )
+
+
+def adjuntar_respuestas(temas, texto, por_tema=RESPUESTAS_POR_TEMA):
+    """
+    Añade a cada tema de la página `respuestas_encontradas`: sus `por_tema`
+    respuestas más relevantes con su fragmento resaltado. Dos consultas en total.
+    """
+    for tema in temas:
+        tema.respuestas_encontradas = []
+    texto = (texto or '').strip()
+    if not temas or not texto or not busqueda_disponible(Respuesta.objects.db):
+        return temas
+
+    query = _consulta(texto)
+    # Primero las mejores de cada tema (sin fragmento) y luego solo esas con fragmento
+    mejores = (
+        Respuesta.objects.filter(tema__in=[tema.pk for tema in temas], search_vector=query)
+        .annotate(posicion=Window(
+            RowNumber(),
+            partition_by=F('tema'),
+            order_by=[SearchRank(F('search_vector'), query).desc(), F('pk').desc()],
+        ))
+        .filter(posicion__lte=por_tema)
+        .values_list('pk', flat=True)
+    )
+    respuestas = (
+        Respuesta.objects.filter(pk__in=list(mejores))
+        .select_related('autor')
+        .annotate(rank=SearchRank(F('search_vector'), query), fragmento=_fragmento(query))
+        .order_by('-rank', '-pk')
+    )
+    por_pk = {tema.pk: tema for tema in temas}
+    for respuesta in respuestas:
+        por_pk[respuesta.tema_id].respuestas_encontradas.append(respuesta)
+    return temas
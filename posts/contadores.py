@@ -0,0 +1,136 @@
+"""
+Contadores desnormalizados del foro.
+
+Categoria guarda num_temas, num_respuestas y ultima_actividad; Tema guarda
+num_respuestas y ultima_actividad. Las listas de foros y temas (y el bloque
+"Foros más activos" de la portada) los leen directamente en lugar de contar
+filas por cada tarjeta.
+
+Las señales de posts/signals.py llaman a estas funciones al crear o borrar
+temas y respuestas. Cada ajuste es un UPDATE con expresiones F(), así que dos
+respuestas simultáneas no se pisan. Al borrar, la última actividad se vuelve a
+calcular con una subconsulta en el mismo UPDATE.
+
+`reconciliar()` (lo usa `manage.py reconciliar_contadores_foro`) recalcula
+todo desde las tablas y corrige las diferencias.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Categoria, Respuesta, Tema
+
+
+def _mas_reciente(campo, fecha):
+    return Greatest(Coalesce(F(campo), Value(fecha)), Value(fecha))
+
+
+def _restar(campo, cantidad=1):
+    # Nunca por debajo de cero, aunque el contador ya estuviese desajustado
+    return Greatest(F(campo) - cantidad, 0)
+
+
+def _ultima_respuesta_tema():
+    return Subquery(
+        Respuesta.objects.filter(tema=OuterRef('pk')).order_by()
+        .values('tema').annotate(ultima=Max('fecha_creacion')).values('ultima')
+    )
+
+
+def _ultima_actividad_categoria():
+    return Subquery(
+        Tema.objects.filter(categoria=OuterRef('pk')).order_by()
+        .values('categoria').annotate(ultima=Max('ultima_actividad')).values('ultima')
+    )
+
+
+def tema_creado(tema):
+    Tema.objects.filter(pk=tema.pk).update(ultima_actividad=F('fecha_creacion'))
+    Categoria.objects.filter(pk=tema.categoria_id).update(
+        num_temas=F('num_temas') + 1,
+        ultima_actividad=_mas_reciente('ultima_actividad', tema.fecha_creacion),
+    )
+
+
+def tema_borrado(tema, num_respuestas):
+    Categoria.objects.filter(pk=tema.categoria_id).update(
+        num_temas=_restar('num_temas'),
+        num_respuestas=_restar('num_respuestas', num_respuestas),
+        ultima_actividad=_ultima_actividad_categoria(),
+    )
+
+
+def tema_movido(tema, categoria_anterior_id):
+    """El tema pasó (desde el admin) de `categoria_anterior_id` a su categoría actual."""
+    num_respuestas = tema.respuestas.count()
+    Categoria.objects.filter(pk=categoria_anterior_id).update(
+        num_temas=_restar('num_temas'),
+        num_respuestas=_restar('num_respuestas', num_respuestas),
+        ultima_actividad=_ultima_actividad_categoria(),
+    )
+    Categoria.objects.filter(pk=tema.categoria_id).update(
+        num_temas=F('num_temas') + 1,
+        num_respuestas=F('num_respuestas') + num_respuestas,
+        ultima_actividad=_ultima_actividad_categoria(),
+    )
+
+
+def respuesta_creada(respuesta):
+    fecha = respuesta.fecha_creacion
+    Tema.objects.filter(pk=respuesta.tema_id).update(
+        num_respuestas=F('num_respuestas') + 1,
+        ultima_actividad=_mas_reciente('ultima_actividad', fecha),
+    )
+    Categoria.objects.filter(temas=respuesta.tema_id).update(
+        num_respuestas=F('num_respuestas') + 1,
+        ultima_actividad=_mas_reciente('ultima_actividad', fecha),
+    )
+
+
+def respuesta_borrada(respuesta):
+    Tema.objects.filter(pk=respuesta.tema_id).update(
+        num_respuestas=_restar('num_respuestas'),
+        ultima_actividad=Coalesce(_ultima_respuesta_tema(), F('fecha_creacion')),
+    )
+    Categoria.objects.filter(temas=respuesta.tema_id).update(
+        num_respuestas=_restar('num_respuestas'),
+        ultima_actividad=_ultima_actividad_categoria(),
+    )
+
+
+def reconciliar(dry_run=False, batch_size=500):
+    """
+    Recalcula los contadores de todos los temas y categorías y guarda los que
+    no coinciden. Devuelve (temas corregidos, categorías corregidas).
+    """
+    temas = list(
+        Tema.objects.annotate(
+            total_respuestas=Count('respuestas'),
+            ultima_respuesta=Max('respuestas__fecha_creacion'),
+        ).only('pk', 'categoria_id', 'fecha_creacion', *Tema.CAMPOS_CONTADORES).order_by()
+    )
+    por_categoria = {}
+    temas_desajustados = []
+    for tema in temas:
+        esperado = (tema.total_respuestas, max(filter(None, [tema.fecha_creacion, tema.ultima_respuesta])))
+        if (tema.num_respuestas, tema.ultima_actividad) != esperado:
+            tema.num_respuestas, tema.ultima_actividad = esperado
+            temas_desajustados.append(tema)
+        totales = por_categoria.setdefault(tema.categoria_id, [0, 0, None])
+        totales[0] += 1
+        totales[1] += tema.num_respuestas
+        if totales[2] is None or tema.ultima_actividad > totales[2]:
+            totales[2] = tema.ultima_actividad
+
+    categorias_desajustadas = []
+    for categoria in Categoria.objects.only('pk', *Categoria.CAMPOS_CONTADORES):
+        esperado = tuple(por_categoria.get(categoria.pk, (0, 0, None)))
+        if (categoria.num_temas, categoria.num_respuestas, categoria.ultima_actividad) != esperado:
+            categoria.num_temas, categoria.num_respuestas, categoria.ultima_actividad = esperado
+            categorias_desajustadas.append(categoria)
+
+    if not dry_run:
+        with transaction.atomic():
+            Tema.objects.bulk_update(temas_desajustados, Tema.CAMPOS_CONTADORES, batch_size=batch_size)
+            Categoria.objects.bulk_update(categorias_desajustadas, Categoria.CAMPOS_CONTADORES, batch_size=batch_size)
+    return temas_desajustados, categorias_desajustadas
@@ -1,4 +1,5 @@
 from django import forms
+from imago.autoguardado import FormularioVersionadoMixin
 from users.forms import validate_file
 from . import models
 
@@ -7,7 +8,7 @@ class CategoriaForm(forms.ModelForm):
         model = models.Categoria
         fields = ['nombre', 'descripcion']
 
-class TemaForm(forms.ModelForm):
+class TemaForm(FormularioVersionadoMixin, forms.ModelForm):
     class Meta:
         model = models.Tema
         fields = ['titulo', 'contenido', 'banner']
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts.contadores import reconciliar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores almacenados del foro (temas y respuestas por categoría, "
+        "respuestas por tema y última actividad) y corrige las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa de los temas y categorías desajustados, sin guardar cambios.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de filas por cada bulk_update (por defecto 500).',
+        )
+
+    def handle(self, *args, **options):
+        temas, categorias = reconciliar(dry_run=options['dry_run'], batch_size=options['batch_size'])
+
+        if options['dry_run']:
+            for categoria in categorias:
+                self.stdout.write(f"  Categoría {categoria.pk}: desajustada")
+            for tema in temas:
+                self.stdout.write(f"  Tema {tema.pk}: desajustado")
+            self.stdout.write(self.style.WARNING(
+                f"{len(categorias)} categoría(s) y {len(temas)} tema(s) desajustados (dry-run, sin cambios)."
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Contadores del foro reconciliados: {len(categorias)} categoría(s) y {len(temas)} tema(s) corregidos."
+        ))
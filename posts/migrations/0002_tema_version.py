@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tema',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
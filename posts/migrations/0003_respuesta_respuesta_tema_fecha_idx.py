@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_tema_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='respuesta',
+            index=models.Index(fields=['tema', 'fecha_creacion', 'id'], name='respuesta_tema_fecha_idx'),
+        ),
+    ]
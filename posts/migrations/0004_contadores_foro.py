@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:56
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def poblar_contadores(apps, schema_editor):
+    Categoria = apps.get_model('posts', 'Categoria')
+    Tema = apps.get_model('posts', 'Tema')
+    Respuesta = apps.get_model('posts', 'Respuesta')
+
+    respuestas = Respuesta.objects.filter(tema=OuterRef('pk')).order_by().values('tema')
+    Tema.objects.update(
+        num_respuestas=Coalesce(Subquery(respuestas.annotate(total=Count('pk')).values('total')), 0),
+        ultima_actividad=Coalesce(
+            Subquery(respuestas.annotate(ultima=Max('fecha_creacion')).values('ultima')),
+            'fecha_creacion',
+        ),
+    )
+    temas = Tema.objects.filter(categoria=OuterRef('pk')).order_by().values('categoria')
+    Categoria.objects.update(
+        num_temas=Coalesce(Subquery(temas.annotate(total=Count('pk')).values('total')), 0),
+        num_respuestas=Coalesce(Subquery(temas.annotate(total=Sum('num_respuestas')).values('total')), 0),
+        ultima_actividad=Subquery(temas.annotate(ultima=Max('ultima_actividad')).values('ultima')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_respuesta_respuesta_tema_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='num_respuestas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='num_temas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='ultima_actividad',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tema',
+            name='num_respuestas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tema',
+            name='ultima_actividad',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_contadores_foro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='respuesta',
+            index=models.Index(fields=['parent', 'fecha_creacion', 'id'], name='respuesta_parent_fecha_idx'),
+        ),
+    ]
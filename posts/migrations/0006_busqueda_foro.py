@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import imago.postgres
+from django.conf import settings
+from django.db import migrations
+
+
+def poblar_search_vector(apps, schema_editor):
+    from posts.busqueda import actualizar_vector_respuesta, actualizar_vector_tema
+    actualizar_vector_tema(tema_model=apps.get_model('posts', 'Tema'))
+    actualizar_vector_respuesta(respuesta_model=apps.get_model('posts', 'Respuesta'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_respuesta_parent_fecha_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respuesta',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tema',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        imago.postgres.AddIndexSoloPostgres(
+            model_name='respuesta',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='respuesta_search_vector_gin'),
+        ),
+        imago.postgres.AddIndexSoloPostgres(
+            model_name='tema',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='tema_search_vector_gin'),
+        ),
+        migrations.RunPython(poblar_search_vector, migrations.RunPython.noop),
+    ]
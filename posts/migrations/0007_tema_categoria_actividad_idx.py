@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_busqueda_foro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tema',
+            index=models.Index(fields=['categoria', 'ultima_actividad', 'id'], name='tema_categoria_actividad_idx'),
+        ),
+    ]
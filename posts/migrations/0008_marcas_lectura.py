@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_tema_categoria_actividad_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaLecturaCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leido_hasta', models.DateTimeField()),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='marcas_lectura', to='posts.categoria')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='marcas_lectura_categorias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Marca de lectura de categoría',
+                'verbose_name_plural': 'Marcas de lectura de categorías',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'categoria'), name='marca_lectura_categoria_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MarcaLecturaTema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leido_hasta', models.DateTimeField()),
+                ('tema', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='marcas_lectura', to='posts.tema')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='marcas_lectura_temas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Marca de lectura de tema',
+                'verbose_name_plural': 'Marcas de lectura de temas',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'tema'), name='marca_lectura_tema_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+def rellenar_texto_enriquecido(apps, schema_editor):
+    from imago.texto_enriquecido import rellenar
+    rellenar(apps.get_model('posts', 'Tema'), ['contenido'])
+    rellenar(apps.get_model('posts', 'Respuesta'), ['contenido'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_marcas_lectura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respuesta',
+            name='contenido_extracto',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='respuesta',
+            name='contenido_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='respuesta',
+            name='contenido_palabras',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tema',
+            name='contenido_extracto',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='tema',
+            name='contenido_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='tema',
+            name='contenido_palabras',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rellenar_texto_enriquecido, migrations.RunPython.noop),
+    ]
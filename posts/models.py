@@ -1,8 +1,13 @@
 import os
 import uuid
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django_ckeditor_5.fields import CKEditor5Field
+from imago.autoguardado import VersionadoMixin
+from imago.texto_enriquecido import TextoEnriquecidoMixin
 
 # Create your models here.
 def ruta_banner_tema(instance, filename):
@@ -23,11 +28,39 @@ def ruta_banner_respuesta(instance, filename):
     nombre_unico = f"{uuid.uuid4()}{extension}"
     return f'forum/{categoria.slug}/{tema.pk}/replies/{nombre_unico}'
 
-class Categoria(models.Model):
+class ContadoresMixin(models.Model):
+    """
+    Los contadores desnormalizados (CAMPOS_CONTADORES) solo se escriben con
+    UPDATE ... F() desde posts/contadores.py. Un save() completo de una fila ya
+    existente los deja fuera para no pisarlos con valores leídos antes.
+    """
+    CAMPOS_CONTADORES = []
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+
+class Categoria(ContadoresMixin, models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
 
+    # Contadores desnormalizados. Se mantienen desde las señales de Tema y Respuesta
+    # y se reconstruyen con `manage.py reconciliar_contadores_foro`.
+    num_temas = models.PositiveIntegerField(default=0, editable=False)
+    num_respuestas = models.PositiveIntegerField(default=0, editable=False)
+    ultima_actividad = models.DateTimeField(null=True, blank=True, editable=False)
+
+    CAMPOS_CONTADORES = ['num_temas', 'num_respuestas', 'ultima_actividad']
+
     def __str__(self):
         return self.nombre
 
@@ -35,13 +68,36 @@ class Categoria(models.Model):
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
 
-class Tema(models.Model):
+class Tema(TextoEnriquecidoMixin, ContadoresMixin, VersionadoMixin, models.Model):
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='temas')
     titulo = models.CharField(max_length=200)
     contenido = CKEditor5Field(config_name='default', blank=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     banner = models.ImageField(blank=True, upload_to=ruta_banner_tema)
     autor = models.ForeignKey(User, on_delete=models.CASCADE, default=None)
+    # Versiones precalculadas de `contenido` (imago/texto_enriquecido.py)
+    contenido_html = models.TextField(blank=True, default='', editable=False)
+    contenido_extracto = models.CharField(max_length=300, blank=True, default='', editable=False)
+    contenido_palabras = models.PositiveIntegerField(default=0, editable=False)
+
+    # Igual que en Categoria: respuestas del tema y fecha del último mensaje
+    # (la creación del tema si aún no tiene respuestas)
+    num_respuestas = models.PositiveIntegerField(default=0, editable=False)
+    ultima_actividad = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # tsvector del título y el texto del contenido para la búsqueda del foro (posts/busqueda.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    CAMPOS_AUTOGUARDADO = ['titulo', 'contenido']
+    CAMPOS_CONTADORES = ['num_respuestas', 'ultima_actividad']
+    CAMPOS_TEXTO_ENRIQUECIDO = ['contenido']
+
+    def save(self, *args, **kwargs):
+        # Provisional hasta que post_save la iguale a fecha_creacion: así nunca
+        # es NULL y el orden por actividad (con su cursor) no tiene huecos
+        if self._state.adding and self.ultima_actividad is None:
+            self.ultima_actividad = timezone.now()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.titulo
@@ -50,14 +106,26 @@ class Tema(models.Model):
         verbose_name = "Tema"
         verbose_name_plural = "Temas"
         ordering = ['-fecha_creacion']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='tema_search_vector_gin'),
+            # Orden por actividad de lista_temas (se recorre hacia atrás para el DESC)
+            models.Index(fields=['categoria', 'ultima_actividad', 'id'], name='tema_categoria_actividad_idx'),
+        ]
 
-class Respuesta(models.Model):
+class Respuesta(TextoEnriquecidoMixin, models.Model):
     tema = models.ForeignKey(Tema, on_delete=models.CASCADE, related_name='respuestas')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='hijos')
     contenido = CKEditor5Field(config_name='comments')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     autor = models.ForeignKey(User, on_delete=models.CASCADE)
     banner = models.ImageField(blank=True, upload_to=ruta_banner_respuesta)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Versiones precalculadas de `contenido` (imago/texto_enriquecido.py)
+    contenido_html = models.TextField(blank=True, default='', editable=False)
+    contenido_extracto = models.CharField(max_length=300, blank=True, default='', editable=False)
+    contenido_palabras = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_TEXTO_ENRIQUECIDO = ['contenido']
 
     def __str__(self):
         return f"Respuesta de {self.autor.username} en '{self.tema.titulo}'"
@@ -65,4 +133,49 @@ class Respuesta(models.Model):
     class Meta:
         verbose_name = "Respuesta"
         verbose_name_plural = "Respuestas"
-        ordering = ['fecha_creacion']
\ No newline at end of file
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['tema', 'fecha_creacion', 'id'], name='respuesta_tema_fecha_idx'),
+            # Lotes de hijos por cursor y su recuento (posts/respuestas.py)
+            models.Index(fields=['parent', 'fecha_creacion', 'id'], name='respuesta_parent_fecha_idx'),
+            GinIndex(fields=['search_vector'], name='respuesta_search_vector_gin'),
+        ]
+
+class MarcaLecturaTema(models.Model):
+    """
+    Hasta dónde ha leído un usuario un tema: una fila por usuario y tema
+    visitado (no por respuesta). Ver posts/no_leidos.py.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='marcas_lectura_temas')
+    tema = models.ForeignKey(Tema, on_delete=models.CASCADE, related_name='marcas_lectura')
+    leido_hasta = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Marca de lectura de tema"
+        verbose_name_plural = "Marcas de lectura de temas"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'tema'], name='marca_lectura_tema_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.usuario_id} leyó el tema {self.tema_id} hasta {self.leido_hasta}'
+
+
+class MarcaLecturaCategoria(models.Model):
+    """
+    "Marcar todo como leído": todo lo de la categoría con actividad anterior a
+    `leido_hasta` cuenta como leído para el usuario.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='marcas_lectura_categorias')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='marcas_lectura')
+    leido_hasta = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Marca de lectura de categoría"
+        verbose_name_plural = "Marcas de lectura de categorías"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'categoria'], name='marca_lectura_categoria_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.usuario_id} leyó la categoría {self.categoria_id} hasta {self.leido_hasta}'
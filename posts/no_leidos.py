@@ -0,0 +1,126 @@
+"""
+Temas con respuestas no leídas.
+
+En lugar de una fila por usuario y respuesta leída se guardan solo marcas
+de agua:
+
+- MarcaLecturaTema: una por usuario y tema visitado, con la fecha de la última
+  actividad que vio (se adelanta al abrir el tema o responder en él).
+- MarcaLecturaCategoria: "marcar todo como leído" de una categoría (o de todas).
+
+Lo leído de un tema es lo anterior a la más reciente de las dos marcas (o a la
+fecha de alta del usuario si no hay ninguna). `anotar_no_leidos()` lo resuelve
+en la misma consulta del listado, con un JOIN a cada marca del usuario contra
+Tema.ultima_actividad, y solo cuenta respuestas nuevas (por el índice
+(tema, fecha_creacion, id)) en los temas que de verdad tienen novedades.
+
+Marcar todo como leído es una sola sentencia: un upsert de la marca de cada
+categoría que además borra las marcas de tema que quedan cubiertas.
+"""
+from django.db import connections, transaction
+from django.db.models import (
+    BooleanField, Case, Count, ExpressionWrapper, F, FilteredRelation, OuterRef, Q, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Categoria, MarcaLecturaCategoria, MarcaLecturaTema, Respuesta, Tema
+
+
+def anotar_no_leidos(queryset, usuario):
+    """
+    Añade a un queryset de Tema `no_leido` (bool) y `respuestas_nuevas` para
+    `usuario`. Con usuarios anónimos devuelve el queryset sin cambios.
+    """
+    if not usuario.is_authenticated:
+        return queryset
+    alta = Value(usuario.date_joined)
+    nuevas = (
+        Respuesta.objects.filter(tema=OuterRef('pk'), fecha_creacion__gt=OuterRef('marca_lectura'))
+        .order_by().values('tema').annotate(total=Count('pk')).values('total')
+    )
+    return (
+        queryset.annotate(
+            marca_tema=FilteredRelation('marcas_lectura', condition=Q(marcas_lectura__usuario=usuario)),
+            marca_categoria=FilteredRelation(
+                'categoria__marcas_lectura', condition=Q(categoria__marcas_lectura__usuario=usuario),
+            ),
+        )
+        .annotate(marca_lectura=Greatest(
+            Coalesce(F('marca_tema__leido_hasta'), alta),
+            Coalesce(F('marca_categoria__leido_hasta'), alta),
+        ))
+        .annotate(no_leido=ExpressionWrapper(Q(ultima_actividad__gt=F('marca_lectura')), output_field=BooleanField()))
+        .annotate(respuestas_nuevas=Case(
+            # El recuento solo se hace en los temas con novedades
+            When(no_leido=True, then=Coalesce(Subquery(nuevas), 0)),
+            default=Value(0),
+        ))
+    )
+
+
+def marcar_tema_leido(usuario, tema_id, using='default'):
+    """Adelanta la marca del usuario hasta la última actividad actual del tema."""
+    if not usuario.is_authenticated:
+        return
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        with transaction.atomic(using=using):
+            ultima = Tema.objects.using(using).filter(pk=tema_id).values_list('ultima_actividad', flat=True).first()
+            if ultima is None:
+                return
+            marca, creada = MarcaLecturaTema.objects.using(using).get_or_create(
+                usuario=usuario, tema_id=tema_id, defaults={'leido_hasta': ultima},
+            )
+            if not creada:
+                MarcaLecturaTema.objects.using(using).filter(pk=marca.pk, leido_hasta__lt=ultima).update(leido_hasta=ultima)
+        return
+
+    tabla = MarcaLecturaTema._meta.db_table
+    with connection.cursor() as cursor:
+        # El WHERE del DO UPDATE evita reescribir la fila si ya estaba al día
+        cursor.execute(f"""
+            INSERT INTO {tabla} (usuario_id, tema_id, leido_hasta)
+            SELECT %s, t.id, t.ultima_actividad FROM {Tema._meta.db_table} t
+            WHERE t.id = %s AND t.ultima_actividad IS NOT NULL
+            ON CONFLICT (usuario_id, tema_id) DO UPDATE SET leido_hasta = EXCLUDED.leido_hasta
+            WHERE {tabla}.leido_hasta < EXCLUDED.leido_hasta
+        """, [usuario.pk, tema_id])
+
+
+def marcar_todo_leido(usuario, categoria_id=None, using='default'):
+    """Marca como leído todo lo de una categoría (o de todas si no se indica)."""
+    ahora = timezone.now()
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        with transaction.atomic(using=using):
+            categorias = Categoria.objects.using(using).all()
+            temas = MarcaLecturaTema.objects.using(using).filter(usuario=usuario)
+            if categoria_id is not None:
+                categorias = categorias.filter(pk=categoria_id)
+                temas = temas.filter(tema__categoria_id=categoria_id)
+            temas.filter(leido_hasta__lte=ahora).delete()
+            for pk in categorias.values_list('pk', flat=True):
+                MarcaLecturaCategoria.objects.using(using).update_or_create(
+                    usuario=usuario, categoria_id=pk, defaults={'leido_hasta': ahora},
+                )
+        return
+
+    marcas = MarcaLecturaCategoria._meta.db_table
+    filtro_tema = filtro_categoria = ''
+    parametros = {'usuario': usuario.pk, 'ahora': ahora, 'categoria': categoria_id}
+    if categoria_id is not None:
+        filtro_tema = 'AND t.categoria_id = %(categoria)s'
+        filtro_categoria = 'WHERE c.id = %(categoria)s'
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH cubiertas AS (
+                DELETE FROM {MarcaLecturaTema._meta.db_table} m
+                USING {Tema._meta.db_table} t
+                WHERE m.tema_id = t.id AND m.usuario_id = %(usuario)s
+                  AND m.leido_hasta <= %(ahora)s {filtro_tema}
+            )
+            INSERT INTO {marcas} (usuario_id, categoria_id, leido_hasta)
+            SELECT %(usuario)s, c.id, %(ahora)s FROM {Categoria._meta.db_table} c {filtro_categoria}
+            ON CONFLICT (usuario_id, categoria_id) DO UPDATE SET leido_hasta = EXCLUDED.leido_hasta
+        """, parametros)
@@ -0,0 +1,37 @@
+"""
+Listados de respuestas del foro con el número de hijos precalculado.
+
+`con_num_hijos()` añade a cada respuesta `num_hijos` (una subconsulta COUNT
+sobre el índice (parent, fecha_creacion, id)) y carga autor y perfil en la
+misma consulta, así que _respuesta_tree.html no consulta nada por respuesta.
+
+Los hijos de una respuesta no se pintan con la página: se piden bajo demanda
+por lotes de HIJOS_POR_PAGINA con paginación por cursor (imago/paginacion.py),
+de modo que abrir o desplegar un hilo enorme cuesta lo mismo que uno pequeño.
+"""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from imago.paginacion import CursorPaginator
+from .models import Respuesta
+
+HIJOS_POR_PAGINA = 10
+MAXIMO_HIJOS_POR_PAGINA = 50
+ORDEN_HIJOS = ('fecha_creacion', 'pk')
+
+
+def con_num_hijos(queryset):
+    hijos = (
+        Respuesta.objects.filter(parent=OuterRef('pk')).order_by()
+        .values('parent').annotate(total=Count('pk')).values('total')
+    )
+    return queryset.select_related('autor__profile').annotate(num_hijos=Coalesce(Subquery(hijos), 0))
+
+
+def pagina_hijos(parent_id, cursor=None, por_pagina=HIJOS_POR_PAGINA):
+    """Página (CursorPage) de hijos directos de una respuesta, del más antiguo al más reciente."""
+    por_pagina = max(1, min(por_pagina, MAXIMO_HIJOS_POR_PAGINA))
+    paginator = CursorPaginator(
+        con_num_hijos(Respuesta.objects.filter(parent_id=parent_id)), por_pagina, ORDEN_HIJOS,
+    )
+    return paginator.get_page(cursor)
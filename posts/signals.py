@@ -0,0 +1,89 @@
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Categoria, Tema, Respuesta
+from .busqueda import CAMPOS_BUSQUEDA_TEMA, actualizar_vector_respuesta, actualizar_vector_tema
+from . import contadores
+
+
+def _borrado_en_cascada(origin, *modelos):
+    """True si el borrado lo inició una instancia (o queryset) de alguno de `modelos`."""
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return modelo in modelos
+
+
+def _temas_en_borrado(origin):
+    """
+    pks de los temas que caen en el mismo borrado que inició `origin` (un tema,
+    una categoría, un usuario...). Se guardan en el propio `origin`, que es el
+    mismo objeto en todas las señales de ese borrado; los pre_delete llegan
+    todos antes que cualquier post_delete.
+    """
+    if origin is None:
+        return set()
+    return origin.__dict__.setdefault('_temas_en_borrado', set())
+
+
+@receiver(pre_save, sender=Tema)
+def recordar_categoria_anterior(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and 'categoria' not in update_fields):
+        return
+    instance._categoria_guardada = (
+        Tema.objects.filter(pk=instance.pk).values_list('categoria_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Tema)
+def actualizar_contadores_tema(sender, instance, created, **kwargs):
+    if created:
+        contadores.tema_creado(instance)
+        return
+    anterior = getattr(instance, '_categoria_guardada', None)
+    if anterior is not None and anterior != instance.categoria_id:
+        contadores.tema_movido(instance, anterior)
+    instance._categoria_guardada = instance.categoria_id
+
+
+@receiver(pre_delete, sender=Tema)
+def contar_respuestas_tema(sender, instance, origin=None, **kwargs):
+    # Sus respuestas se borran en cascada sin tocar los contadores (ver más abajo),
+    # así que se descuentan todas de golpe de la categoría
+    _temas_en_borrado(origin).add(instance.pk)
+    if not _borrado_en_cascada(origin, Categoria):
+        instance._respuestas_borradas = instance.respuestas.count()
+
+
+@receiver(post_delete, sender=Tema)
+def descontar_tema(sender, instance, origin=None, **kwargs):
+    if not _borrado_en_cascada(origin, Categoria):
+        contadores.tema_borrado(instance, getattr(instance, '_respuestas_borradas', 0))
+
+
+@receiver(post_save, sender=Respuesta)
+def contar_respuesta(sender, instance, created, **kwargs):
+    if created:
+        contadores.respuesta_creada(instance)
+
+
+@receiver(post_delete, sender=Respuesta)
+def descontar_respuesta(sender, instance, origin=None, **kwargs):
+    # Las de un tema que también se borra ya las descuenta descontar_tema(),
+    # venga de donde venga la cascada (p. ej. al borrar el usuario autor)
+    if instance.tema_id not in _temas_en_borrado(origin):
+        contadores.respuesta_borrada(instance)
+
+
+@receiver(post_save, sender=Tema)
+def actualizar_busqueda_tema(sender, instance, update_fields=None, **kwargs):
+    """Recalcula el search_vector cuando cambia el título o el contenido."""
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_BUSQUEDA_TEMA):
+        return
+    actualizar_vector_tema([instance.pk])
+
+
+@receiver(post_save, sender=Respuesta)
+def actualizar_busqueda_respuesta(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'contenido' not in update_fields:
+        return
+    actualizar_vector_respuesta([instance.pk])
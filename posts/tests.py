@@ -1,3 +1,254 @@
-from django.test import TestCase
+import datetime
+import unittest
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import signing
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Mod
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from imago.paginacion import SALT_CURSOR, CursorPaginator
+from imago.postgres import FIN_RESALTADO, INICIO_RESALTADO, resaltar
+from . import contadores
+from .no_leidos import anotar_no_leidos, marcar_tema_leido, marcar_todo_leido
+from .models import Categoria, MarcaLecturaCategoria, MarcaLecturaTema, Respuesta, Tema
+
+# Las plantillas se renderizan sin haber ejecutado collectstatic
+SIN_MANIFIESTO = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class ResaltarTests(SimpleTestCase):
+
+    def test_escapa_todo_salvo_las_marcas(self):
+        fragmento = f' {INICIO_RESALTADO}hola{FIN_RESALTADO} mundo <img src=x onerror=alert(1) '
+        self.assertEqual(resaltar(fragmento), ' <mark>hola</mark> mundo &lt;img src=x onerror=alert(1) ')
+
+    def test_entidades_y_delimitadores_sueltos(self):
+        fragmento = f'a&amp;b &lt;script&gt; {INICIO_RESALTADO}x{INICIO_RESALTADO}y{FIN_RESALTADO} z{FIN_RESALTADO}'
+        self.assertEqual(resaltar(fragmento), 'a&amp;b &lt;script&gt; x<mark>y</mark> z')
+
+
+@override_settings(STORAGES=SIN_MANIFIESTO)
+@unittest.skipUnless(connection.vendor == 'postgresql', "La búsqueda del foro usa texto completo de PostgreSQL")
+class BusquedaForoTests(TestCase):
+
+    def setUp(self):
+        self.autor = User.objects.create(username='autor')
+        categoria = Categoria.objects.create(nombre='General', descripcion='General')
+        self.tema = Tema.objects.create(
+            categoria=categoria, autor=self.autor, titulo='Saludo',
+            contenido='<p>hola mundo</p><img src=x onerror=alert(1) ',
+        )
+        Respuesta.objects.create(
+            tema=self.tema, autor=self.autor, contenido='<p>hola <b onmouseover=alert(2)>otra vez</p><script',
+        )
+
+    def test_fragmentos_sin_marcado_del_usuario(self):
+        cliente = Client(HTTP_HOST='localhost')
+        cliente.force_login(self.autor)
+        response = cliente.get(reverse('posts:buscar'), {'q': 'hola'})
+        self.assertEqual(response.status_code, 200)
+        contenido = response.content.decode()
+        self.assertIn('<mark>hola</mark> mundo', contenido)
+        self.assertNotIn('onerror', contenido)
+        self.assertNotIn('onmouseover', contenido)
+
+
+class ContadoresBorradoTests(TestCase):
+    """Los contadores tienen que quedar como si se recalculasen desde cero."""
+
+    def setUp(self):
+        self.a = User.objects.create(username='a')
+        self.b = User.objects.create(username='b')
+        self.categoria = Categoria.objects.create(nombre='General', descripcion='General')
+        self.t1 = Tema.objects.create(categoria=self.categoria, autor=self.a, titulo='t1', contenido='<p>uno</p>')
+        self.t2 = Tema.objects.create(categoria=self.categoria, autor=self.b, titulo='t2', contenido='<p>dos</p>')
+        for _ in range(3):
+            Respuesta.objects.create(tema=self.t1, autor=self.b, contenido='<p>r</p>')
+        Respuesta.objects.create(tema=self.t2, autor=self.b, contenido='<p>r</p>')
+        Respuesta.objects.create(tema=self.t2, autor=self.a, contenido='<p>r</p>')
+
+    def assertContadores(self, num_temas, num_respuestas):
+        self.categoria.refresh_from_db()
+        self.assertEqual((self.categoria.num_temas, self.categoria.num_respuestas), (num_temas, num_respuestas))
+        self.assertEqual(contadores.reconciliar(dry_run=True), ([], []))
+
+    def test_borrar_tema(self):
+        self.t1.delete()
+        self.assertContadores(1, 2)
+
+    def test_borrar_usuario(self):
+        # Se van t1 con sus 3 respuestas y la respuesta de `a` en t2
+        self.a.delete()
+        self.assertContadores(1, 1)
+        self.t2.refresh_from_db()
+        self.assertEqual(self.t2.num_respuestas, 1)
+
+    def test_borrar_respuestas_de_un_usuario(self):
+        Respuesta.objects.filter(autor=self.b).delete()
+        self.assertContadores(2, 1)
+
+
+class NoLeidosTests(TestCase):
+
+    def setUp(self):
+        self.autor = User.objects.create(username='autor')
+        self.lector = User.objects.create(
+            username='lector', date_joined=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+        self.categoria = Categoria.objects.create(nombre='General', slug='general', descripcion='General')
+        self.otra = Categoria.objects.create(nombre='Otra', slug='otra', descripcion='Otra')
+        self.t1 = self.crear_tema(self.categoria, 't1')
+        self.t2 = self.crear_tema(self.categoria, 't2')
+        self.t3 = self.crear_tema(self.otra, 't3')
+        for _ in range(2):
+            self.responder(self.t1)
+
+    def crear_tema(self, categoria, titulo):
+        return Tema.objects.create(categoria=categoria, autor=self.autor, titulo=titulo, contenido='<p>t</p>')
+
+    def responder(self, tema):
+        Respuesta.objects.create(tema=tema, autor=self.autor, contenido='<p>r</p>')
+
+    def estado(self):
+        """{titulo: (no_leido, respuestas_nuevas)} para el lector."""
+        temas = anotar_no_leidos(Tema.objects.all(), self.lector)
+        return {t.titulo: (t.no_leido, t.respuestas_nuevas) for t in temas}
+
+    def test_anonimo_sin_anotaciones(self):
+        self.assertFalse(hasattr(anotar_no_leidos(Tema.objects.all(), AnonymousUser()).first(), 'no_leido'))
+
+    def test_tema_leido_y_respuesta_nueva(self):
+        self.assertEqual(self.estado(), {'t1': (True, 2), 't2': (True, 0), 't3': (True, 0)})
+
+        marcar_tema_leido(self.lector, self.t1.pk)
+        marcar_tema_leido(self.lector, self.t1.pk)
+        self.assertEqual(self.estado(), {'t1': (False, 0), 't2': (True, 0), 't3': (True, 0)})
+        self.assertEqual(MarcaLecturaTema.objects.filter(usuario=self.lector).count(), 1)
+
+        self.responder(self.t1)
+        self.assertEqual(self.estado()['t1'], (True, 1))
+        # El upsert adelanta la marca existente
+        marcar_tema_leido(self.lector, self.t1.pk)
+        self.assertEqual(self.estado()['t1'], (False, 0))
+
+    def test_marcar_categoria_leida(self):
+        marcar_tema_leido(self.lector, self.t1.pk)
+        marcar_tema_leido(self.lector, self.t3.pk)
+        marcar_todo_leido(self.lector, self.categoria.pk)
+        self.assertEqual(self.estado(), {'t1': (False, 0), 't2': (False, 0), 't3': (False, 0)})
+        # Las marcas de tema cubiertas por la de la categoría se borran; las de otras categorías no
+        self.assertEqual(list(MarcaLecturaTema.objects.values_list('tema__titulo', flat=True)), ['t3'])
+        self.assertEqual(list(MarcaLecturaCategoria.objects.values_list('categoria_id', flat=True)), [self.categoria.pk])
+
+        self.responder(self.t2)
+        self.crear_tema(self.categoria, 't4')
+        self.assertEqual(self.estado(), {'t1': (False, 0), 't2': (True, 1), 't3': (False, 0), 't4': (True, 0)})
+
+    def test_marcar_todo_leido(self):
+        marcar_todo_leido(self.lector)
+        marcar_todo_leido(self.lector)
+        self.assertEqual(set(self.estado().values()), {(False, 0)})
+        self.assertEqual(MarcaLecturaCategoria.objects.filter(usuario=self.lector).count(), 2)
+        self.assertFalse(MarcaLecturaTema.objects.exists())
+
+
+@override_settings(STORAGES=SIN_MANIFIESTO)
+class EdicionVersionadaTests(TestCase):
+
+    def setUp(self):
+        self.autor = User.objects.create(username='autor')
+        categoria = Categoria.objects.create(nombre='General', descripcion='General')
+        self.tema = Tema.objects.create(categoria=categoria, autor=self.autor, titulo='Original', contenido='<p>a</p>')
+        self.cliente = Client(HTTP_HOST='localhost')
+        self.cliente.force_login(self.autor)
+        self.url = reverse('posts:editar_tema', kwargs={'pk': self.tema.pk})
+
+    def editar(self, titulo, version):
+        return self.cliente.post(self.url, {'titulo': titulo, 'contenido': '<p>b</p>', 'version': version})
+
+    def test_save_incrementa_en_la_bd(self):
+        otra = Tema.objects.get(pk=self.tema.pk)
+        otra.save()
+        self.tema.save()
+        self.assertEqual(self.tema.version, 3)
+
+    def test_guardar_con_la_version_actual(self):
+        response = self.editar('Nuevo', self.tema.version)
+        self.assertEqual(response.status_code, 302)
+        self.tema.refresh_from_db()
+        self.assertEqual((self.tema.titulo, self.tema.version), ('Nuevo', 2))
+
+    def test_conflicto_con_otro_guardado(self):
+        Tema.objects.filter(pk=self.tema.pk).update(titulo='De otra pestaña', version=5)
+        response = self.editar('Nuevo', 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.tema.refresh_from_db()
+        self.assertEqual((self.tema.titulo, self.tema.version), ('De otra pestaña', 5))
+        # El formulario vuelve con la versión actual: un segundo envío sobrescribe
+        self.assertIn('name="version" value="5"', response.content.decode())
+        self.assertEqual(self.editar('Nuevo', 5).status_code, 302)
+
+
+class CursorPaginatorTests(TestCase):
+    """Listados con empates en la clave de orden: ni filas repetidas ni perdidas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        autor = User.objects.create(username='autor')
+        categoria = Categoria.objects.create(nombre='General', descripcion='General')
+        temas = [
+            Tema.objects.create(categoria=categoria, autor=autor, titulo=f't{i}', contenido='<p>t</p>')
+            for i in range(7)
+        ]
+        # Solo dos fechas distintas
+        fecha = datetime.datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        for i, tema in enumerate(temas):
+            Tema.objects.filter(pk=tema.pk).update(fecha_creacion=fecha + datetime.timedelta(days=i % 2))
+        cls.queryset = Tema.objects.all()
+
+    def recorrer(self, paginator):
+        """Páginas hacia delante y, desde la última, de vuelta hacia atrás."""
+        paginas = [paginator.get_page()]
+        while paginas[-1].has_next():
+            paginas.append(paginator.get_page(paginas[-1].next_cursor))
+        hacia_atras = [paginas[-1]]
+        while hacia_atras[-1].has_previous():
+            hacia_atras.append(paginator.get_page(hacia_atras[-1].previous_cursor))
+        return [[t.pk for t in p] for p in paginas], [[t.pk for t in p] for p in reversed(hacia_atras)]
+
+    def assertRecorrido(self, paginator, esperado):
+        adelante, atras = self.recorrer(paginator)
+        self.assertEqual([pk for pagina in adelante for pk in pagina], esperado)
+        self.assertEqual([len(pagina) for pagina in adelante], [3, 3, 1])
+        self.assertEqual(atras, adelante)
+
+    def test_empates_en_la_fecha(self):
+        esperado = list(self.queryset.order_by('-fecha_creacion', '-pk').values_list('pk', flat=True))
+        self.assertRecorrido(CursorPaginator(self.queryset, 3, ('-fecha_creacion', '-pk')), esperado)
+
+    def test_empates_en_una_anotacion_decimal(self):
+        # Como el rank de la búsqueda del foro: un float anotado, con empates
+        queryset = self.queryset.annotate(rank=Cast(Mod('pk', 3), FloatField()) * Value(0.1))
+        esperado = list(queryset.order_by('-rank', 'pk').values_list('pk', flat=True))
+        self.assertRecorrido(CursorPaginator(queryset, 3, ('-rank', 'pk')), esperado)
+
+    def test_cursor_no_valido(self):
+        paginator = CursorPaginator(self.queryset, 3, ('-fecha_creacion', '-pk'))
+        primera = [t.pk for t in paginator.get_page()]
+        cursor = paginator.get_page().next_cursor
+        otra_firma = signing.dumps(['siguiente', ['2025-01-01', 1]], salt='otra')
+        for manipulado in [cursor[:-2] + ('AA' if cursor[-2:] != 'AA' else 'BB'), otra_firma, 'basura', '']:
+            pagina = paginator.get_page(manipulado)
+            self.assertEqual([t.pk for t in pagina], primera, manipulado)
+            self.assertFalse(pagina.has_previous())
+        # Firmado, pero con una dirección o un número de valores que no corresponden
+        for contenido in [['atras', ['2025-01-01T00:00:00', 1]], ['siguiente', [1]]]:
+            self.assertIsNone(paginator.decodificar(signing.dumps(contenido, salt=SALT_CURSOR)))
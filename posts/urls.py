@@ -6,14 +6,16 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.lista_categorias, name='lista_categorias'),
     path('crear-categoria/', views.CategoriaCreateView.as_view(), name='crear_categoria'),
+    path('buscar/', views.buscar_foro, name='buscar'),
+    path('marcar-leidos/', views.marcar_leidos, name='marcar_leidos'),
     path('<slug:slug_categoria>/', views.lista_temas, name='lista_temas'),
     path('<slug:slug_categoria>/nuevo-tema/', views.crear_tema, name='crear_tema'),
+    path('<slug:slug_categoria>/marcar-leidos/', views.marcar_leidos, name='marcar_leidos_categoria'),
     path('tema/<int:pk>/', views.detalle_tema, name='detalle_tema'),
     path('tema/<int:pk>/editar/', views.TemaUpdateView.as_view(), name='editar_tema'),
     path('tema/<int:pk>/borrar/', views.TemaDeleteView.as_view(), name='borrar_tema'),
-    path('respuesta/<int:pk_parent>/get-hijos/', views.get_hijos_respuesta_ajax, name='get_hijos_respuesta'),
+    path('respuesta/<int:pk_parent>/hijos/', views.hijos_respuesta_ajax, name='hijos_respuesta'),
     path('ajax/respuesta/<int:pk>/editar/', views.editar_respuesta_ajax, name='editar_respuesta_ajax'),
     path('ajax/respuesta/<int:pk>/borrar/', views.borrar_respuesta_ajax, name='borrar_respuesta_ajax'),
-    path('ajax/tema/<int:pk>/guardar/', views.guardar_tema_ajax, name='guardar_tema_ajax'),
     path('ajax/tema/<int:pk>/subir-banner/', views.subir_banner_ajax, name='subir_banner_ajax'),
 ]
\ No newline at end of file
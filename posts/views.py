@@ -1,19 +1,26 @@
-import json
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.generic import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
+from django.utils.http import urlencode
 from django.utils.text import slugify
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
 from django.template.loader import render_to_string
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, Http404
 from django.db.models import Q
+from django.views.decorators.http import require_GET, require_POST
 
 from .models import Categoria, Tema, Respuesta
 from .forms import TemaForm, RespuestaForm, CategoriaForm, RespuestaEditForm
 from users.mixins import GroupRequiredMixin
 from .mixins import UserIsAuthorMixin
+from imago.autoguardado import EdicionVersionadaMixin
+from imago.paginacion import CursorPaginator
+from .respuestas import HIJOS_POR_PAGINA, con_num_hijos, pagina_hijos
+from .busqueda import adjuntar_respuestas, buscar_temas
+from .no_leidos import anotar_no_leidos, marcar_tema_leido, marcar_todo_leido
+from lecturas.busqueda import busqueda_disponible
 
 def lista_categorias(request):
     """Muestra la lista de todos los subforos, con búsqueda y paginación."""
@@ -36,24 +43,65 @@ def lista_categorias(request):
         'page_obj': page_obj
     })
 
+# Modos de orden de lista_temas -> columnas del cursor
+ORDENES_TEMAS = {
+    'recientes': ('-fecha_creacion', '-pk'),
+    # Temas "reflotados": la última respuesta los sube. Recorre el índice
+    # (categoria, ultima_actividad, id) sin ordenar ni contar.
+    'actividad': ('-ultima_actividad', '-pk'),
+}
+
 def lista_temas(request, slug_categoria):
     """Muestra los temas dentro de una categoría específica y maneja la búsqueda."""
     categoria = get_object_or_404(Categoria, slug=slug_categoria)
     # Empezamos con la lista de temas de la categoría
-    temas_list = Tema.objects.filter(categoria=categoria).order_by('-fecha_creacion')
+    # La tarjeta solo usa el extracto precalculado: el HTML completo no se carga
+    temas_list = (
+        Tema.objects.filter(categoria=categoria).select_related('autor__profile')
+        .defer('contenido', 'contenido_html', 'search_vector')
+    )
+    # Temas con novedades y respuestas nuevas del usuario, en la misma consulta
+    temas_list = anotar_no_leidos(temas_list, request.user)
 
     query = request.GET.get('q')
     if query:
         temas_list = temas_list.filter(
             Q(titulo__icontains=query) |
             Q(autor__username__icontains=query)
-        ).distinct()
-    paginator = Paginator(temas_list, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        )
+    orden = request.GET.get('orden')
+    if orden not in ORDENES_TEMAS:
+        orden = 'recientes'
+    paginator = CursorPaginator(temas_list, 20, ORDENES_TEMAS[orden])
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'posts/lista_temas.html', {
         'categoria': categoria, 
+        'orden': orden,
+        'temas_page': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'page_obj': page_obj
+    })
+
+def buscar_foro(request):
+    """
+    Búsqueda en todos los foros (títulos y contenido de temas y respuestas),
+    con los resultados agrupados por tema y paginados por cursor.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return render(request, 'posts/buscar.html', {'query': query})
+
+    if busqueda_disponible(Tema.objects.db):
+        orden = ('-rank', '-pk')
+    else:
+        orden = ('-fecha_creacion', '-pk')
+    paginator = CursorPaginator(buscar_temas(query), 20, orden)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    adjuntar_respuestas(page_obj.object_list, query)
+
+    return render(request, 'posts/buscar.html', {
+        'query': query,
         'temas_page': page_obj,
         'is_paginated': page_obj.has_other_pages(),
         'page_obj': page_obj
@@ -64,11 +112,11 @@ def detalle_tema(request, pk):
     Muestra un tema, sus respuestas, y maneja la creación de nuevas respuestas.
     """
     tema = get_object_or_404(Tema, pk=pk)
-    respuestas_list = Respuesta.objects.filter(tema=tema, parent__isnull=True).order_by('-fecha_creacion')
+    # Autor, perfil y número de hijos de cada respuesta en la misma consulta de la página
+    respuestas_list = con_num_hijos(Respuesta.objects.filter(tema=tema, parent__isnull=True))
     
-    paginator = Paginator(respuestas_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(respuestas_list, 10, ('-fecha_creacion', '-pk'))
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     if request.method == 'POST':
         if not request.user.is_authenticated:
@@ -82,6 +130,8 @@ def detalle_tema(request, pk):
             nueva_respuesta.tema = tema
             nueva_respuesta.autor = request.user
             nueva_respuesta.save()
+            # Quien responde ya ha visto el tema hasta su propia respuesta
+            marcar_tema_leido(request.user, tema.pk)
             
             # Para respuestas AJAX, devolvemos información para actualizar la UI
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -102,11 +152,11 @@ def detalle_tema(request, pk):
                 })
             
             # Redirección normal para no-AJAX
-            current_page = request.POST.get('current_page') or request.GET.get('page') or '1'
+            current_cursor = request.POST.get('current_cursor') or request.GET.get('cursor')
             url_base = reverse('posts:detalle_tema', kwargs={'pk': tema.pk})
             
-            if current_page and current_page != '1':
-                url_con_pagina = f'{url_base}?page={current_page}'
+            if current_cursor:
+                url_con_pagina = f'{url_base}?{urlencode({"cursor": current_cursor})}'
             else:
                 url_con_pagina = url_base
                 
@@ -119,6 +169,7 @@ def detalle_tema(request, pk):
     
     else:
         respuesta_form = RespuestaForm()
+        marcar_tema_leido(request.user, tema.pk)
 
     return render(request, 'posts/detalle_tema.html', {
         'tema': tema,
@@ -128,6 +179,21 @@ def detalle_tema(request, pk):
         'respuesta_form': respuesta_form
     })
 
+@login_required
+@require_POST
+def marcar_leidos(request, slug_categoria=None):
+    """Marca como leídos todos los temas de una categoría, o de todos los foros."""
+    categoria = None
+    if slug_categoria is not None:
+        categoria = get_object_or_404(Categoria, slug=slug_categoria)
+    marcar_todo_leido(request.user, categoria.pk if categoria else None)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'success': True})
+    if categoria:
+        return redirect('posts:lista_temas', slug_categoria=categoria.slug)
+    return redirect('posts:lista_categorias')
+
 @login_required(login_url="/users/login/")
 def crear_tema(request, slug_categoria):
     """Crea un nuevo tema dentro de una categoría."""
@@ -160,7 +226,7 @@ class CategoriaCreateView(GroupRequiredMixin, CreateView):
         form.instance.slug = slugify(form.cleaned_data['nombre'])
         
         return super().form_valid(form)    
-class TemaUpdateView(LoginRequiredMixin, UserIsAuthorMixin, UpdateView):
+class TemaUpdateView(LoginRequiredMixin, UserIsAuthorMixin, EdicionVersionadaMixin, UpdateView):
     model = Tema
     form_class = TemaForm
     template_name = 'posts/form_tema.html'
@@ -176,7 +242,7 @@ class TemaDeleteView(LoginRequiredMixin, UserIsAuthorMixin, DeleteView):
 
 @login_required
 def editar_respuesta_ajax(request, pk):
-    respuesta = get_object_or_404(Respuesta, pk=pk)
+    respuesta = get_object_or_404(con_num_hijos(Respuesta.objects.all()), pk=pk)
 
     # Comprobación de permisos manual
     is_author = request.user == respuesta.autor
@@ -223,50 +289,32 @@ def borrar_respuesta_ajax(request, pk):
     
     return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
     
-def get_hijos_respuesta_ajax(request, pk_parent):
-    # Obtenemos la respuesta "padre"
-    parent_respuesta = get_object_or_404(Respuesta, pk=pk_parent)
-    
-    # Obtenemos todos sus hijos directos
-    hijos = parent_respuesta.hijos.all()
-    
-    # Preparamos el contexto para la plantilla parcial
-    context = {
-        'respuestas': hijos,
+@require_GET
+def hijos_respuesta_ajax(request, pk_parent):
+    """
+    Devuelve un lote de hijos directos de una respuesta (?cursor=...&n=...)
+    y la URL del siguiente lote, o null si no quedan más.
+    """
+    try:
+        por_pagina = int(request.GET.get('n', HIJOS_POR_PAGINA))
+    except ValueError:
+        por_pagina = HIJOS_POR_PAGINA
+    cursor = request.GET.get('cursor')
+    page = pagina_hijos(pk_parent, cursor, por_pagina)
+    if not page.object_list and not cursor and not Respuesta.objects.filter(pk=pk_parent).exists():
+        raise Http404("La respuesta no existe.")
+
+    html = render_to_string('posts/_hijos_list.html', {
+        'respuestas': page,
         'respuesta_form': RespuestaForm(), # Para los formularios de respuesta anidados
         'user': request.user
-    }
-    
-    # Renderizamos el HTML de los hijos usando una plantilla parcial
-    html = render_to_string('posts/_hijos_list.html', context, request=request)
-    
-    # Devolvemos el HTML como una respuesta JSON
-    return JsonResponse({'html': html})
-
-@login_required
-def guardar_tema_ajax(request, pk):
-    """ Vista AJAX para el autoguardado de los campos de texto de un Tema. """
-    # --- CORRECCIÓN DE PERMISOS ---
-    # Obtenemos el objeto y LUEGO verificamos el permiso manualmente.
-    tema = get_object_or_404(Tema, pk=pk)
-    if tema.autor != request.user and not request.user.is_superuser:
-        return HttpResponseForbidden("No tienes permiso para editar este tema.")
-    # --- FIN CORRECCIÓN ---
-
-    if request.method == 'PUT':
-        try:
-            data = json.loads(request.body)
-            for field_name, value in data.items():
-                if hasattr(tema, field_name):
-                    setattr(tema, field_name, value)
-            
-            tema.save(update_fields=data.keys())
-            return JsonResponse({'success': True, 'message': 'Cambios guardados.'})
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)}, status=500)
-
-    return JsonResponse({'success': False, 'error': 'Método no permitido.'}, status=405)
+    }, request=request)
 
+    siguiente = None
+    if page.has_next():
+        url = reverse('posts:hijos_respuesta', kwargs={'pk_parent': pk_parent})
+        siguiente = f'{url}?{urlencode({"cursor": page.next_cursor, "n": page.paginator.per_page})}'
+    return JsonResponse({'html': html, 'siguiente': siguiente})
 
 @login_required
 def subir_banner_ajax(request, pk):
@@ -0,0 +1,83 @@
+// static/js/autoguardado.js - Autoguardado versionado (ver imago/autoguardado.py)
+//
+// Acumula los cambios de varios campos y los envía juntos en un único PATCH
+// {version, campos} tras un periodo sin cambios. Las peticiones se envían de una
+// en una para que cada una lleve la versión devuelta por la anterior. Si el
+// servidor responde 409 otra pestaña o usuario guardó antes: se deja de guardar
+// y se pide recargar en lugar de sobrescribir sus cambios.
+//
+// `campoVersion` es el input oculto `version` del formulario completo: se
+// actualiza con cada guardado para que el envío del formulario no choque con
+// los autoguardados de la propia página.
+
+class Autoguardado {
+    constructor({ url, version, csrfToken, campoVersion = null, delay = 1500, onEstado = () => {} }) {
+        this.url = url;
+        this.version = parseInt(campoVersion ? campoVersion.value : version, 10);
+        this.campoVersion = campoVersion;
+        this.csrfToken = csrfToken;
+        this.delay = delay;
+        this.onEstado = onEstado;
+        this.pendientes = {};
+        this.timeout = null;
+        this.enCurso = null;
+        this.conflicto = false;
+    }
+
+    programar(campos) {
+        if (this.conflicto) return;
+        Object.assign(this.pendientes, campos);
+        this.onEstado('saving', 'Guardando...');
+        clearTimeout(this.timeout);
+        this.timeout = setTimeout(() => this.guardar(), this.delay);
+    }
+
+    async guardar() {
+        clearTimeout(this.timeout);
+        // Si hay un guardado en curso, se espera y se envía lo acumulado después
+        if (this.enCurso) {
+            await this.enCurso;
+        }
+        if (this.conflicto || Object.keys(this.pendientes).length === 0) return;
+
+        const campos = this.pendientes;
+        this.pendientes = {};
+        this.enCurso = this.enviar(campos);
+        try {
+            await this.enCurso;
+        } finally {
+            this.enCurso = null;
+        }
+    }
+
+    async enviar(campos) {
+        try {
+            const response = await fetch(this.url, {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': this.csrfToken
+                },
+                body: JSON.stringify({ version: this.version, campos: campos })
+            });
+            const result = await response.json();
+
+            if (response.status === 409) {
+                this.conflicto = true;
+                this.onEstado('error', 'Otra sesión modificó este contenido. Recarga la página para ver los cambios.');
+                return;
+            }
+            if (!response.ok) {
+                const errores = result.errores ? Object.values(result.errores).flat().join(' ') : '';
+                throw new Error(errores || result.error || 'Error del servidor');
+            }
+
+            this.version = result.version;
+            if (this.campoVersion) this.campoVersion.value = result.version;
+            this.onEstado('saved', 'Cambios guardados');
+        } catch (error) {
+            console.error('Error en autoguardado:', error);
+            this.onEstado('error', `Error: ${error.message}`);
+        }
+    }
+}
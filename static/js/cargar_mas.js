@@ -0,0 +1,46 @@
+// static/js/cargar_mas.js - Botón "Cargar más" de partials/pagination.html
+//
+// Sin JavaScript el botón es un enlace normal a la página siguiente (?cursor=...).
+// Con JavaScript se pide esa página, se añaden sus elementos al contenedor
+// indicado en data-contenedor y el botón pasa a apuntar al siguiente cursor.
+
+if (!window.cargarMasIniciado) {
+    window.cargarMasIniciado = true;
+
+    document.addEventListener('click', async (e) => {
+        const boton = e.target.closest('.load-more-btn[data-contenedor]');
+        if (!boton) return;
+        const contenedor = document.querySelector(boton.dataset.contenedor);
+        if (!contenedor) return;
+
+        e.preventDefault();
+        if (boton.classList.contains('cargando')) return;
+        boton.classList.add('cargando');
+        const textoOriginal = boton.innerHTML;
+        boton.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Cargando...';
+
+        try {
+            const response = await fetch(boton.href, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+            if (!response.ok) throw new Error(`Error ${response.status}`);
+            const doc = new DOMParser().parseFromString(await response.text(), 'text/html');
+
+            const nuevos = doc.querySelector(boton.dataset.contenedor);
+            if (nuevos) {
+                Array.from(nuevos.children).forEach(elemento => contenedor.appendChild(document.adoptNode(elemento)));
+            }
+
+            const siguiente = doc.querySelector('.load-more-btn');
+            if (siguiente) {
+                boton.href = siguiente.href;
+                boton.innerHTML = textoOriginal;
+            } else {
+                boton.closest('.page-item').remove();
+            }
+        } catch (error) {
+            console.error('Error al cargar más elementos:', error);
+            boton.innerHTML = textoOriginal;
+        } finally {
+            boton.classList.remove('cargando');
+        }
+    });
+}
@@ -1,5 +1,4 @@
 from django import template
-from django.contrib.auth.models import Group
 
 register = template.Library()
 
@@ -10,12 +9,11 @@ def has_group(user, group_name):
     Uso en la plantilla: {{ user|has_group:"NombreDelGrupo" }}
     """
     if user.is_authenticated:
-        try:
-            group = Group.objects.get(name=group_name)
-        except Group.DoesNotExist:
-            return False
-        
-        return group in user.groups.all()
+        # Los nombres de grupo se consultan una sola vez por usuario y petición,
+        # porque el filtro se evalúa en cada comentario o respuesta de un hilo.
+        if not hasattr(user, '_nombres_grupos'):
+            user._nombres_grupos = set(user.groups.values_list('name', flat=True))
+        return group_name in user._nombres_grupos
     
     return False
 